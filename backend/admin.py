@@ -0,0 +1,67 @@
+"""
+Admin-only endpoints, enabled by setting ADMIN_TOKEN.
+
+Requests must send the token in the X-Admin-Token header. Without ADMIN_TOKEN
+configured every admin endpoint answers 503.
+"""
+import os
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from metrics import TimedRoute
+from slow_queries import get_slow_queries, clear_slow_queries
+from profiling import list_profiles, get_profile, get_collapsed_stacks
+
+
+def admin_token_valid(token):
+    """True if token matches the configured ADMIN_TOKEN."""
+    admin_token = os.environ.get("ADMIN_TOKEN")
+    return bool(admin_token and token and hmac.compare_digest(token, admin_token))
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not os.environ.get("ADMIN_TOKEN"):
+        raise HTTPException(status_code=503, detail="Admin endpoints not configured: ADMIN_TOKEN not set")
+    if not admin_token_valid(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)], route_class=TimedRoute)
+
+
+@router.get("/slow-queries")
+async def slow_queries():
+    """Recent statements above SLOW_QUERY_THRESHOLD_MS, with EXPLAIN plans when captured"""
+    return {"queries": get_slow_queries()}
+
+
+@router.delete("/slow-queries")
+async def reset_slow_queries():
+    """Empty the slow-query ring buffer"""
+    clear_slow_queries()
+    return {"success": True}
+
+
+@router.get("/profiles")
+async def profiles():
+    """Stored request profiles, most recent first"""
+    return {"profiles": list_profiles()}
+
+
+@router.get("/profiles/{profile_id}")
+async def profile_detail(profile_id: str):
+    """Profile summary with peak memory and top functions by self/inclusive samples"""
+    profile = get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@router.get("/profiles/{profile_id}/collapsed", response_class=PlainTextResponse)
+async def profile_collapsed(profile_id: str):
+    """Collapsed stacks for flamegraph.pl or speedscope"""
+    stacks = get_collapsed_stacks(profile_id)
+    if stacks is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(stacks)
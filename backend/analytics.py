@@ -0,0 +1,446 @@
+"""
+Optional embedded DuckDB analytics over Parquet snapshots of closed months.
+
+Closed months rarely change, yet yearly and multi-year views re-read them row
+by row from Postgres. With ANALYTICS_ENABLED=true a background thread in each
+worker keeps one Parquet file per closed month of transactions_view under
+ANALYTICS_DIR (month=YYYY-MM/data.parquet, plus manifest.json), and queries
+that span history run on DuckDB over those files. Rows for the open month,
+and for any month whose snapshot is missing or out of date, are read from
+Postgres and unioned in, so results always match the live database.
+
+A month's snapshot goes stale when its data version moves (a recategorization
+or import through this API, or any write announced by the change feed); the
+snapshot thread re-writes it. A per-month fingerprint of the transactions
+table, checked every ANALYTICS_RECONCILE_SECONDS and at startup, catches
+writes made while no worker was listening. Workers share the files; an
+exclusive file lock makes sure only one of them writes at a time.
+
+Only queries that read nothing but budget_app.transactions_view are eligible.
+The same SQL runs on DuckDB after a few dialect substitutions (%s -> ?,
+TO_CHAR -> strftime); query() returns None whenever the caller should run it
+on Postgres instead.
+
+    python analytics.py            # snapshot every closed month that needs it
+    python analytics.py --rebuild  # re-snapshot everything
+"""
+import os
+import re
+import json
+import time
+import fcntl
+import argparse
+import threading
+from datetime import date
+
+import data_versions
+import change_feed
+from db_pool import connection
+from db_routing import read_config
+from storage import DB_CONFIG, STORAGE_ENGINE
+
+# Snapshots read Postgres and queries are translated from its SQL
+ANALYTICS_ENABLED = (
+    os.environ.get("ANALYTICS_ENABLED", "false").lower() == "true"
+    and STORAGE_ENGINE == "postgres"
+)
+ANALYTICS_DIR = os.environ.get(
+    "ANALYTICS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "analytics_snapshots")
+)
+ANALYTICS_INTERVAL_SECONDS = float(os.environ.get("ANALYTICS_INTERVAL_SECONDS", "30"))
+ANALYTICS_RECONCILE_SECONDS = float(os.environ.get("ANALYTICS_RECONCILE_SECONDS", "3600"))
+
+COLUMNS = ("id", "transaction_date", "merchant_name", "amount", "person",
+           "spending_category", "account_type", "merchant_id", "merchant")
+
+# transactions_view's columns plus the canonical merchant (migrations/003)
+ROWS_QUERY = """
+    SELECT id, transaction_date, merchant_name, amount::float8 AS amount, person,
+           spending_category, account_type, merchant_id, merchant
+    FROM budget_app.transactions_merchant_view
+    WHERE {where}
+"""
+
+# Changes whenever any row of the month is inserted, deleted or edited, or a
+# person, category or merchant name its snapshot rows carry is renamed
+FINGERPRINT_QUERY = """
+    SELECT TO_CHAR(DATE_TRUNC('month', t.transaction_date), 'YYYY-MM') AS month,
+           COUNT(*) || ':' || COALESCE(SUM(hashtext(concat_ws('|', t.id, t.transaction_date, t.merchant_name, t.amount,
+                                                              p.name, c.category_name, t.account_type,
+                                                              t.merchant_id, m.name))::bigint), 0)
+    FROM budget_app.transactions t
+    LEFT JOIN budget_app.persons p ON p.id = t.person_id
+    LEFT JOIN budget_app.spending_categories c ON c.id = t.category_id
+    LEFT JOIN budget_app.merchants m ON m.id = t.merchant_id
+    WHERE {where}
+    GROUP BY 1
+"""
+
+_PROCESS_STARTED = time.time()
+
+
+def _month_start(month):
+    return date(int(month[:4]), int(month[5:7]), 1)
+
+
+def _next_month(month):
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year + 1}-01" if number == 12 else f"{year}-{number + 1:02d}"
+
+
+def _current_month():
+    return date.today().strftime("%Y-%m")
+
+
+def _parquet_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("id", pa.int64()),
+        ("transaction_date", pa.date32()),
+        ("merchant_name", pa.string()),
+        ("amount", pa.float64()),
+        ("person", pa.string()),
+        ("spending_category", pa.string()),
+        ("account_type", pa.string()),
+        ("merchant_id", pa.int64()),
+        ("merchant", pa.string()),
+    ])
+
+
+def _to_arrow(rows):
+    import pyarrow as pa
+    columns = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+    return pa.table({name: list(values) for name, values in zip(COLUMNS, columns)}, schema=_parquet_schema())
+
+
+class SnapshotStore:
+    """Parquet month snapshots on disk plus this process's view of which are current."""
+
+    def __init__(self, directory, db_config):
+        self.directory = directory
+        self.db_config = db_config
+        self.snapshots_written = 0
+        self._manifest = {"months": {}}
+        self._manifest_mtime = None
+        # month -> wall-clock time this process learned its data changed
+        self._dirty = {}
+        self._seen_versions = {}
+        self._lock = threading.Lock()
+
+    # Manifest
+
+    @property
+    def _manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    def _month_path(self, month):
+        return os.path.join(self.directory, f"month={month}", "data.parquet")
+
+    def manifest(self):
+        """The shared manifest, re-read when another process has rewritten it."""
+        try:
+            mtime = os.stat(self._manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return self._manifest
+        if mtime != self._manifest_mtime:
+            with open(self._manifest_path) as f:
+                self._manifest = json.load(f)
+            self._manifest_mtime = mtime
+        return self._manifest
+
+    def _save_manifest(self, manifest):
+        tmp = self._manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, self._manifest_path)
+        self._manifest = manifest
+
+    # Staleness
+
+    def note_changes(self):
+        """Mark months whose data version moved since the last call as dirty."""
+        current = data_versions.month_versions()
+        now = time.time()
+        with self._lock:
+            for month, version in current.items():
+                if self._seen_versions.get(month) != version:
+                    self._dirty[month] = now
+            self._seen_versions = current
+
+    def mark_all_dirty(self):
+        now = time.time()
+        with self._lock:
+            for month in self.manifest()["months"]:
+                self._dirty[month] = now
+
+    def clean_months(self):
+        """{month: entry} of closed months whose snapshot reflects every change this process knows of."""
+        self.note_changes()
+        manifest = self.manifest()
+        # Until a reconcile has run since this process started, writes made while
+        # nothing was listening could be missing from the files
+        if manifest.get("reconciled_at", 0) < _PROCESS_STARTED:
+            return {}
+        current = _current_month()
+        with self._lock:
+            return {
+                month: entry for month, entry in manifest["months"].items()
+                if month < current and entry["snapshot_at"] > self._dirty.get(month, 0)
+            }
+
+    # Snapshotting
+
+    def _fingerprints(self, cursor, month=None):
+        if month is None:
+            cursor.execute(FINGERPRINT_QUERY.format(where="transaction_date < %s::date"), (_month_start(_current_month()),))
+        else:
+            cursor.execute(
+                FINGERPRINT_QUERY.format(where="transaction_date >= %s::date AND transaction_date < %s::date"),
+                (_month_start(month), _month_start(_next_month(month)))
+            )
+        return dict(cursor.fetchall())
+
+    def _snapshot_month(self, manifest, month):
+        started = time.time()
+        with connection(self.db_config) as conn:
+            with conn.cursor() as cursor:
+                # Rows and fingerprint from the same snapshot of the database
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cursor.execute(
+                    ROWS_QUERY.format(where="transaction_date >= %s::date AND transaction_date < %s::date"),
+                    (_month_start(month), _month_start(_next_month(month)))
+                )
+                rows = cursor.fetchall()
+                fingerprint = self._fingerprints(cursor, month).get(month)
+
+        path = self._month_path(month)
+        if rows:
+            import pyarrow.parquet as pq
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            pq.write_table(_to_arrow(rows), path + ".tmp")
+            os.replace(path + ".tmp", path)
+        elif os.path.exists(path):
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+        manifest["months"][month] = {"snapshot_at": started, "rows": len(rows), "fingerprint": fingerprint}
+        self.snapshots_written += 1
+
+    def run_once(self, rebuild=False):
+        """Bring the snapshots up to date; returns the months written, or None if another process holds the lock."""
+        self.note_changes()
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+
+            self._manifest_mtime = None
+            # Work on a copy; readers keep using the current manifest until it is replaced
+            manifest = json.loads(json.dumps(self.manifest()))
+            manifest.setdefault("months", {})
+            now = time.time()
+            current = _current_month()
+            todo = set()
+
+            reconciled_at = manifest.get("reconciled_at", 0)
+            if rebuild or reconciled_at < _PROCESS_STARTED or now - reconciled_at > ANALYTICS_RECONCILE_SECONDS:
+                with connection(self.db_config) as conn:
+                    with conn.cursor() as cursor:
+                        fingerprints = self._fingerprints(cursor)
+                for month, fingerprint in fingerprints.items():
+                    entry = manifest["months"].get(month)
+                    if rebuild or entry is None or entry["fingerprint"] != fingerprint:
+                        todo.add(month)
+                for month in set(manifest["months"]) - set(fingerprints):
+                    # Every row of the month was deleted or moved
+                    todo.add(month)
+                reconciled_at = now
+
+            with self._lock:
+                for month, changed_at in self._dirty.items():
+                    entry = manifest["months"].get(month)
+                    if month < current and (entry is None or entry["snapshot_at"] <= changed_at):
+                        todo.add(month)
+
+            for month in sorted(todo):
+                self._snapshot_month(manifest, month)
+                if not manifest["months"][month]["rows"]:
+                    del manifest["months"][month]
+            manifest["reconciled_at"] = reconciled_at
+            self._save_manifest(manifest)
+            return sorted(todo)
+
+    # Queries
+
+    def _live_rows(self, clean, start, end):
+        """Rows in [start, end) of months without a current snapshot, from Postgres."""
+        query = ROWS_QUERY.format(
+            where="transaction_date >= %s::date AND transaction_date < %s::date"
+                  " AND NOT (DATE_TRUNC('month', transaction_date)::date = ANY(%s::date[]))"
+        )
+        params = (start or date.min, end or date.max, [_month_start(month) for month in clean])
+        with connection(read_config(self.db_config)) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+
+    def execute(self, query, params, start, end):
+        """(column names, rows) of a transactions_view query on DuckDB, or None if nothing in range is snapshotted."""
+        import duckdb
+
+        clean = {
+            month: entry for month, entry in self.clean_months().items()
+            if (end is None or _month_start(month) < end)
+            and (start is None or _month_start(_next_month(month)) > start)
+        }
+        files = [self._month_path(month) for month, entry in sorted(clean.items()) if entry["rows"]]
+        if not files:
+            return None
+
+        live = _to_arrow(self._live_rows(clean, start, end))
+        con = duckdb.connect()
+        try:
+            con.register("live_rows", live)
+            file_list = ", ".join("'" + path.replace("'", "''") + "'" for path in files)
+            con.execute("CREATE SCHEMA budget_app")
+            con.execute(f"""
+                CREATE VIEW budget_app.transactions_view AS
+                SELECT * FROM read_parquet([{file_list}])
+                UNION ALL BY NAME
+                SELECT * FROM live_rows
+            """)
+            con.execute(_to_duckdb(query), list(params))
+            columns = [column[0] for column in con.description]
+            return columns, con.fetchall()
+        finally:
+            con.close()
+
+
+def _to_duckdb(query):
+    """The few Postgres-isms the dashboard queries use, in DuckDB's dialect."""
+    query = query.replace("%s", "?")
+    return query.replace("TO_CHAR(", "strftime(").replace("'YYYY-MM'", "'%Y-%m'")
+
+
+def _eligible(query):
+    return set(re.findall(r"budget_app\.(\w+)", query)) == {"transactions_view"}
+
+
+_store = None
+_store_lock = threading.Lock()
+_job = None
+
+
+def _on_change(event):
+    # Month-scoped events arrive as data version bumps; unknown scope means all months.
+    # Snapshots carry category names, so a rename or delete can touch any month
+    if change_feed.renames_categories(event) and _store is not None:
+        _store.mark_all_dirty()
+
+
+def get_store():
+    """This process's snapshot store, or None when disabled."""
+    global _store
+    if not ANALYTICS_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            # Snapshots come from the primary so they never capture replica lag
+            _store = SnapshotStore(ANALYTICS_DIR, DB_CONFIG)
+            change_feed.subscribe(_on_change)
+        return _store
+
+
+def query(sql, params, start=None, end=None):
+    """
+    Run a transactions_view query over snapshots plus live rows.
+
+    start/end (dates, end exclusive, None for unbounded) must cover every row
+    the query can match. Returns (column names, rows) or None when the query
+    should run on Postgres: analytics disabled, the query reads other tables,
+    nothing in range is snapshotted yet, or DuckDB failed.
+    """
+    store = get_store()
+    if store is None or not _eligible(sql):
+        return None
+    try:
+        return store.execute(sql, params, start, end)
+    except Exception as e:
+        print(f"Analytics query failed, using Postgres: {e}")
+        return None
+
+
+def query_records(sql, params, start=None, end=None):
+    """query() as a list of dicts, like queries._run_query."""
+    result = query(sql, params, start, end)
+    if result is None:
+        return None
+    columns, rows = result
+    return [dict(zip(columns, row)) for row in rows]
+
+
+class SnapshotJob(threading.Thread):
+    def __init__(self, store):
+        super().__init__(name="analytics-snapshots", daemon=True)
+        self.store = store
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.store.run_once()
+            except Exception as e:
+                print(f"Analytics snapshot failed: {e}")
+            self._stop_event.wait(ANALYTICS_INTERVAL_SECONDS)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start():
+    """Start this process's snapshot thread (no-op when disabled or already running)."""
+    global _job
+    store = get_store()
+    if store is None or (_job is not None and _job.is_alive()):
+        return
+    _job = SnapshotJob(store)
+    _job.start()
+
+
+def stop():
+    if _job is not None:
+        _job.stop()
+
+
+def status():
+    """Snapshot coverage for /ready."""
+    store = get_store()
+    if store is None:
+        return {"enabled": False}
+    manifest = store.manifest()
+    return {
+        "enabled": True,
+        "snapshot_months": len(manifest.get("months", {})),
+        "current_months": len(store.clean_months()),
+        "reconciled_at": manifest.get("reconciled_at"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write Parquet snapshots of closed months for analytics mode.")
+    parser.add_argument("--rebuild", action="store_true", help="Re-snapshot every closed month")
+    args = parser.parse_args()
+
+    store = SnapshotStore(ANALYTICS_DIR, DB_CONFIG)
+    written = store.run_once(rebuild=args.rebuild)
+    if written is None:
+        print("Another process is writing snapshots; try again shortly")
+        return 1
+    print(f"Snapshotted {len(written)} months into {ANALYTICS_DIR}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
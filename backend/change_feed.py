@@ -0,0 +1,167 @@
+"""
+Change feed: turns Postgres NOTIFY events into in-process invalidation events.
+
+Triggers from migrations/005_change_feed.sql send a JSON payload on the
+budget_app_changes channel for every statement that writes transactions or
+spending_categories, whichever client made it. Each worker runs one listener
+thread on its own connection which:
+
+  - bumps data_versions for the affected months (or everything, for category
+    changes), so every VersionedCache and the column store notice, and
+  - hands the event to subscribers registered with subscribe().
+
+Events look like:
+
+    {"table": "transactions", "operation": "UPDATE",
+     "months": ["2026-02"], "persons": ["Alex"], "categories": ["Groceries"]}
+
+Category events carry "renamed": true when an UPDATE changed a category name.
+
+"all": true means the scope is unknown (payload too large, or the listener
+reconnected and may have missed events); subscribers should drop everything.
+"""
+import os
+import json
+import select
+import threading
+
+import psycopg2
+import psycopg2.extensions
+
+import data_versions
+from storage import DB_CONFIG, STORAGE_ENGINE
+
+CHANNEL = "budget_app_changes"
+# LISTEN/NOTIFY needs Postgres; other engines only see this process's writes
+CHANGE_FEED_ENABLED = (
+    os.environ.get("CHANGE_FEED_ENABLED", "true").lower() == "true"
+    and STORAGE_ENGINE == "postgres"
+)
+RECONNECT_SECONDS = 5
+
+_subscribers = []
+_subscribers_lock = threading.Lock()
+_listener = None
+
+
+def subscribe(callback):
+    """Call callback(event) for every change event. Callbacks run on the listener thread."""
+    with _subscribers_lock:
+        _subscribers.append(callback)
+
+
+def unsubscribe(callback):
+    with _subscribers_lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+
+def renames_categories(event):
+    """
+    True when the event may change the category name of existing transactions.
+
+    Renames and deletes do; new categories and limit edits don't, so stores that
+    hold category names per month can ignore them.
+    """
+    if event.get("all"):
+        return True
+    return event.get("table") == "spending_categories" and (
+        event.get("operation") == "DELETE" or bool(event.get("renamed"))
+    )
+
+
+def publish(event):
+    """Apply an event to the data versions and fan it out to subscribers."""
+    if event.get("all") or event.get("table") == "spending_categories":
+        data_versions.bump_all()
+    for month in event.get("months") or []:
+        data_versions.bump_month(month)
+
+    with _subscribers_lock:
+        callbacks = list(_subscribers)
+    for callback in callbacks:
+        try:
+            callback(event)
+        except Exception as e:
+            print(f"Change feed subscriber failed: {e}")
+
+
+def _parse(payload):
+    try:
+        event = json.loads(payload)
+    except ValueError:
+        return {"all": True, "reason": "unparseable payload"}
+    return event if isinstance(event, dict) else {"all": True, "reason": "unparseable payload"}
+
+
+class ChangeListener(threading.Thread):
+    """LISTENs on CHANNEL and publishes events, reconnecting on connection loss."""
+
+    def __init__(self, db_config):
+        super().__init__(name="change-feed", daemon=True)
+        self.db_config = db_config
+        self.connected = False
+        self.events_received = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        first_connection = True
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.db_config)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                self.connected = True
+                if not first_connection:
+                    # Anything written while we were disconnected went unannounced
+                    publish({"all": True, "reason": "listener reconnected"})
+                first_connection = False
+                self._listen(conn)
+            except psycopg2.Error as e:
+                print(f"Change feed connection lost: {e}")
+            finally:
+                self.connected = False
+                if conn is not None:
+                    conn.close()
+            self._stop_event.wait(RECONNECT_SECONDS)
+
+    def _listen(self, conn):
+        while not self._stop_event.is_set():
+            # Short timeout so stop() is noticed promptly
+            if select.select([conn], [], [], 1.0) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                self.events_received += 1
+                publish(_parse(notify.payload))
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start():
+    """Start this process's listener (no-op when disabled or already running)."""
+    global _listener
+    if not CHANGE_FEED_ENABLED or (_listener is not None and _listener.is_alive()):
+        return
+    _listener = ChangeListener(DB_CONFIG)
+    _listener.start()
+
+
+def stop():
+    if _listener is not None:
+        _listener.stop()
+
+
+def status():
+    """Listener state for /ready."""
+    if not CHANGE_FEED_ENABLED:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "connected": bool(_listener and _listener.connected),
+        "events_received": _listener.events_received if _listener else 0,
+    }
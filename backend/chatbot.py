@@ -1,4 +1,5 @@
 import os
+import re
 import json
 import decimal
 import datetime as dt
@@ -6,11 +7,72 @@ from dotenv import load_dotenv
 from anthropic import Anthropic
 from tools import TOOLS
 from queries import TOOL_HANDLERS
+import data_versions
+import query_control
 
 load_dotenv()
 
 client = Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
 
+# At most CHAT_MAX_CONCURRENT chats per worker talk to the model and the database at
+# once; CHAT_MAX_QUEUED more may wait up to CHAT_QUEUE_SECONDS, the rest get a 429
+chat_limiter = query_control.ConcurrencyLimiter(
+    limit=int(os.environ.get("CHAT_MAX_CONCURRENT", "2")),
+    max_waiting=int(os.environ.get("CHAT_MAX_QUEUED", "8")),
+    wait_seconds=float(os.environ.get("CHAT_QUEUE_SECONDS", "30"))
+)
+
+# Opt-in answer cache for repeated first questions
+CHAT_CACHE_ENABLED = os.environ.get("CHAT_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+CHAT_CACHE_TTL_SECONDS = int(os.environ.get("CHAT_CACHE_TTL_SECONDS", "600"))
+CHAT_CACHE_MAX_ENTRIES = int(os.environ.get("CHAT_CACHE_MAX_ENTRIES", "256"))
+
+# Entries snapshot the data versions of every period their tool calls read
+answer_cache = data_versions.VersionedCache(CHAT_CACHE_TTL_SECONDS, CHAT_CACHE_MAX_ENTRIES)
+
+
+def _answer_cache_key(message, filters):
+    """Normalize the question and dashboard filters into a cache key."""
+    normalized = re.sub(r"\s+", " ", message.strip().lower()).rstrip("?!. ")
+    filter_key = tuple(str(filters.get(name, "")).lower() for name in ("period", "year", "month", "user"))
+    # Relative questions ("this month") depend on today's date
+    return (normalized, filter_key, dt.date.today().isoformat())
+
+
+def _months_between(start_date, end_date):
+    """List 'YYYY-MM' scopes from start_date to end_date inclusive."""
+    year, month = int(start_date[:4]), int(start_date[5:7])
+    end_year, end_month = int(end_date[:4]), int(end_date[5:7])
+    months = []
+    while (year, month) <= (end_year, end_month):
+        months.append(f"{year}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _tool_scopes(tool_name, tool_args):
+    """Return the data version scopes a tool call reads."""
+    if tool_name == "lookup_users":
+        return {"*"}
+    if tool_name == "get_spending_comparison":
+        return {str(p) for p in tool_args.get("periods") or []} or {"*"}
+
+    start_date, end_date = tool_args.get("start_date"), tool_args.get("end_date")
+    if start_date or end_date:
+        if start_date and end_date:
+            try:
+                return set(_months_between(str(start_date), str(end_date)))
+            except ValueError:
+                return {"*"}
+        return {"*"}
+
+    today = dt.date.today()
+    if tool_args.get("period") == "yearly":
+        return {str(tool_args.get("year") or today.year)}
+    if tool_args.get("period") == "monthly" and tool_args.get("month"):
+        return {str(tool_args["month"])}
+    return {today.strftime("%Y-%m")}
+
 
 def _make_serializable(obj):
     """Convert Decimal and date types to JSON-safe primitives."""
@@ -36,7 +98,7 @@ def _apply_filter_defaults(tool_name, tool_args, filters):
     year = filters.get("year", "")
     user = filters.get("user", "all")
 
-    # Comparison tool uses month_a/month_b, don't inject defaults
+    # Comparison tool takes explicit periods, don't inject defaults
     if tool_name == "get_spending_comparison":
         if "user" not in tool_args and user and user.lower() != "all":
             tool_args["user"] = user
@@ -59,18 +121,37 @@ def _apply_filter_defaults(tool_name, tool_args, filters):
     return tool_args
 
 
-async def process_chat_message(message: str, conversation_history: list, filters: dict):
+async def process_chat_message(message: str, conversation_history: list, filters: dict, bypass_cache: bool = False):
     """
     Process a chat message using Claude with tool-calling.
 
+    The Anthropic client and the tool queries block, so the work runs in an executor
+    thread (within the /chat concurrency limit) instead of on the event loop.
+
     Args:
         message: The user's question
         conversation_history: List of prior messages [{role, content}, ...]
         filters: Current dashboard filters {period, year, month, user}
+        bypass_cache: Skip the answer cache lookup for this message
 
     Returns:
         dict with 'response' (text) and 'conversation_history' (updated list)
     """
+    # Only standalone questions are cacheable; follow-ups depend on the conversation
+    cache_key = None
+    if CHAT_CACHE_ENABLED and not conversation_history:
+        cache_key = _answer_cache_key(message, filters)
+        if not bypass_cache:
+            cached = answer_cache.get(cache_key)
+            if cached is not None:
+                # Cached answers skip the concurrency limit
+                return {**cached, "cached": True}
+
+    return await chat_limiter.run(answer_chat_message, message, conversation_history, filters, cache_key)
+
+
+def answer_chat_message(message, conversation_history, filters, cache_key=None):
+    """Blocking body of process_chat_message; stores the answer under cache_key when given."""
     period = filters.get("period", "monthly")
     month = filters.get("month", "")
     year = filters.get("year", "")
@@ -104,10 +185,21 @@ Keep responses concise and friendly. Use bullet points or short tables for lists
     # Build messages - cap at 20 messages to control tokens
     messages = list(conversation_history[-20:]) if conversation_history else []
     messages.append({"role": "user", "content": message})
+    # Version of each scope as of the first tool call that read it, so a write that
+    # lands while the answer is being built leaves the cached answer stale
+    versions = {}
+    # Only answers backed by tool data, none of it an error, are cached; otherwise
+    # nothing but the TTL would expire them once the data or the fault is fixed
+    tool_succeeded = False
+    tool_failed = False
 
     try:
         # Tool-calling loop (max 5 iterations)
         for _ in range(5):
+            if query_control.cancelled():
+                # The browser went away; don't spend more model calls or queries on it
+                return {"response": "", "conversation_history": conversation_history or []}
+
             response = client.messages.create(
                 model="claude-sonnet-4-6",
                 max_tokens=1024,
@@ -130,7 +222,13 @@ Keep responses concise and friendly. Use bullet points or short tables for lists
                         if handler:
                             # Inject dashboard filters as defaults
                             args = _apply_filter_defaults(block.name, dict(block.input), filters)
+                            for scope in _tool_scopes(block.name, args):
+                                versions.setdefault(scope, data_versions.scope_version(scope))
                             result = handler(args)
+                            if isinstance(result, dict) and "error" in result:
+                                tool_failed = True
+                            else:
+                                tool_succeeded = True
                             result = _make_serializable(result)
                             tool_results.append({
                                 "type": "tool_result",
@@ -138,6 +236,7 @@ Keep responses concise and friendly. Use bullet points or short tables for lists
                                 "content": json.dumps(result, default=str)
                             })
                         else:
+                            tool_failed = True
                             tool_results.append({
                                 "type": "tool_result",
                                 "tool_use_id": block.id,
@@ -160,10 +259,13 @@ Keep responses concise and friendly. Use bullet points or short tables for lists
                     if isinstance(msg.get("content"), str):
                         clean_history.append(msg)
 
-                return {
+                result = {
                     "response": text_response,
                     "conversation_history": messages[-20:]
                 }
+                if cache_key is not None and tool_succeeded and not tool_failed:
+                    answer_cache.put(cache_key, versions, result)
+                return result
 
         return {
             "response": "I had trouble processing that question. Could you try rephrasing it?",
@@ -0,0 +1,353 @@
+"""
+Optional in-memory columnar copy of transactions for the dashboard endpoints.
+
+With COLUMN_STORE_ENABLED=true each worker loads transactions_view into NumPy
+arrays once: int32 day numbers, float64 amounts and small-int dictionary codes
+for category, person, merchant and account type, sorted by day with per-month
+offsets. /transactions, /categories, /raw-transactions and
+/category-transactions are then answered with slices, vectorized masks and
+bincount instead of a Postgres round trip plus pandas.
+
+Months whose data version moved (see data_versions.py) are re-read from
+Postgres in a background thread and spliced in, so a write only reloads the
+months it touched; until they are back in, endpoints use the SQL path. Writes from other processes arrive through change_feed.py;
+COLUMN_STORE_MAX_AGE_SECONDS is the backstop when the feed is disabled.
+Full loads run in a background thread and the previous arrays keep serving
+until the new ones are swapped in; until the first load finishes, endpoints
+use the SQL path.
+"""
+import os
+import time
+import threading
+from datetime import date, datetime
+
+import numpy as np
+
+import data_versions
+import change_feed
+import query_control
+from storage import connection, write_target
+
+COLUMN_STORE_ENABLED = os.environ.get("COLUMN_STORE_ENABLED", "false").lower() == "true"
+COLUMN_STORE_MAX_AGE_SECONDS = int(os.environ.get("COLUMN_STORE_MAX_AGE_SECONDS", "3600"))
+
+EXCLUDED_CATEGORIES = ("Installment", "Payments", "Refunds & Returns")
+FETCH_BATCH_ROWS = 50_000
+
+_EPOCH = date(1970, 1, 1)
+
+
+def _day_number(d):
+    return (d - _EPOCH).days
+
+
+def _month_bounds(year, month):
+    """[first day, first day of next month) as day numbers."""
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return _day_number(date(year, month, 1)), _day_number(date(next_year, next_month, 1))
+
+
+class _Dictionary:
+    """Value <-> small integer code mapping for one string column."""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+        # A background load and a month refresh can add values at the same time
+        self._lock = threading.Lock()
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = len(self.values)
+                    self.values.append(value)
+                    self._codes[value] = code
+        return code
+
+    def codes_matching(self, value):
+        """Codes whose value equals `value` case-insensitively."""
+        value = value.lower()
+        return np.array([code for code, v in enumerate(self.values) if v is not None and v.lower() == value],
+                        dtype=np.int32)
+
+
+class ColumnStore:
+    """Transactions held as parallel NumPy arrays, sorted by day."""
+
+    COLUMNS = ("day", "amount", "category", "person", "merchant", "account_type")
+    DTYPES = {"day": np.int32, "amount": np.float64, "category": np.int16,
+              "person": np.int16, "merchant": np.int32, "account_type": np.int16}
+
+    def __init__(self, target):
+        self.target = target
+        self.dictionaries = {name: _Dictionary() for name in ("category", "person", "merchant", "account_type")}
+        # (columns, month_offsets) swapped as one tuple so readers never mix generations
+        self._state = ({name: np.empty(0, dtype=dtype) for name, dtype in self.DTYPES.items()}, {})
+        self.loaded_at = None
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._invalidated = False
+        self._running = set()
+
+    # Loading
+
+    def _fetch(self, start_day=None, end_day=None):
+        query = """
+            SELECT transaction_date, amount, spending_category, person, merchant_name, account_type
+            FROM budget_app.transactions_view
+        """
+        params = []
+        if start_day is not None:
+            query += " WHERE transaction_date >= %s AND transaction_date < %s"
+            params = [np.datetime64(int(start_day), "D").item(), np.datetime64(int(end_day), "D").item()]
+        query += " ORDER BY transaction_date"
+
+        chunks = {name: [] for name in self.COLUMNS}
+        encode = {name: self.dictionaries[name].code for name in self.dictionaries}
+        with connection(self.target) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(FETCH_BATCH_ROWS)
+                    if not rows:
+                        break
+                    chunks["day"].append(np.fromiter((_day_number(r[0]) for r in rows), np.int32, len(rows)))
+                    chunks["amount"].append(np.fromiter((r[1] for r in rows), np.float64, len(rows)))
+                    for index, name in ((2, "category"), (3, "person"), (4, "merchant"), (5, "account_type")):
+                        chunks[name].append(np.fromiter((encode[name](r[index]) for r in rows),
+                                                        self.DTYPES[name], len(rows)))
+        return {name: np.concatenate(parts) if parts else np.empty(0, dtype=self.DTYPES[name])
+                for name, parts in chunks.items()}
+
+    @staticmethod
+    def _month_offsets(days):
+        """{'YYYY-MM': (start, end)} row ranges of each month in the day-sorted arrays."""
+        offsets = {}
+        if len(days):
+            first = np.datetime64(int(days[0]), "D").astype("datetime64[M]")
+            last = np.datetime64(int(days[-1]), "D").astype("datetime64[M]")
+            months = np.arange(first, last + 1)
+            starts = np.searchsorted(days, months.astype("datetime64[D]").astype(np.int64))
+            ends = np.append(starts[1:], len(days))
+            for month, start, end in zip(months.astype(str), starts, ends):
+                if end > start:
+                    offsets[str(month)] = (int(start), int(end))
+        return offsets
+
+    def load(self):
+        """Full load of every transaction (blocking); readers keep the previous arrays until the swap."""
+        with self._load_lock:
+            # Changes invalidating the store from here on are not guaranteed to be in this load
+            self._invalidated = False
+            versions = data_versions.month_versions()
+            # A full scan of every transaction; not bounded by the per-request timeout
+            with query_control.statement_timeout(0):
+                columns = self._fetch()
+            offsets = self._month_offsets(columns["day"])
+            with self._lock:
+                # Months written during the scan keep older versions and are re-read by refresh()
+                self._state = (columns, offsets)
+                self._versions = versions
+                self.loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Schedule a full reload on the next refresh()."""
+        self._invalidated = True
+
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def current(self):
+        """True when loaded and every month's data version has been read."""
+        return self.loaded_at is not None and self._versions == data_versions.month_versions()
+
+    def _in_background(self, name, job):
+        """Run job in a thread unless one with this name is already running."""
+        with self._lock:
+            if name in self._running:
+                return
+            self._running.add(name)
+
+        def run():
+            try:
+                job()
+            except Exception as e:
+                print(f"Column store {name} failed: {e}")
+            finally:
+                with self._lock:
+                    self._running.discard(name)
+
+        threading.Thread(target=run, name=f"column-store-{name}", daemon=True).start()
+
+    def reload_in_background(self):
+        """Start load() in a thread unless one is already running."""
+        self._in_background("load", self.load)
+
+    def refresh(self):
+        """
+        Start background work for whatever is stale; never blocks.
+
+        Months whose data version changed are re-read in a thread, and a full
+        reload starts once the store is too old or invalidated. Until the months
+        are back in, current() is False.
+        """
+        if (self.loaded_at is None or self._invalidated
+                or time.monotonic() - self.loaded_at > COLUMN_STORE_MAX_AGE_SECONDS):
+            self.reload_in_background()
+        if self.loaded_at is not None and self._versions != data_versions.month_versions():
+            self._in_background("months", self.reload_changed_months)
+
+    def reload_changed_months(self):
+        """Re-read months whose data version changed (blocking); readers keep the previous arrays until the swap."""
+        with self._load_lock:
+            versions = data_versions.month_versions()
+            with self._lock:
+                changed = [month for month, version in versions.items() if self._versions.get(month) != version]
+            if not changed:
+                return
+            fresh = {month: self._fetch(*_month_bounds(int(month[:4]), int(month[5:7]))) for month in changed}
+            with self._lock:
+                columns = self._state[0]
+                for month, rows in fresh.items():
+                    columns = self._splice_month(columns, month, rows)
+                self._state = (columns, self._month_offsets(columns["day"]))
+                # Months written during the fetch keep older versions and are re-read next time
+                self._versions = versions
+
+    @staticmethod
+    def _splice_month(columns, month, fresh):
+        start_day, end_day = _month_bounds(int(month[:4]), int(month[5:7]))
+        days = columns["day"]
+        lo, hi = np.searchsorted(days, start_day), np.searchsorted(days, end_day)
+        return {name: np.concatenate((values[:lo], fresh[name], values[hi:])) for name, values in columns.items()}
+
+    # Queries
+
+    @staticmethod
+    def _period_rows(columns, offsets, period, year, month):
+        """Row range for a period, with the same semantics as database.get_transactions_data."""
+        if period == "monthly" and month:
+            return offsets.get(month[:7], (0, 0))
+        if period == "yearly" and year:
+            days = columns["day"]
+            start_day, end_day = _day_number(date(int(year), 1, 1)), _day_number(date(int(year) + 1, 1, 1))
+            return int(np.searchsorted(days, start_day)), int(np.searchsorted(days, end_day))
+        return offsets.get(datetime.now().strftime("%Y-%m"), (0, 0))
+
+    def select(self, user=None, period=None, year=None, month=None, category=None):
+        """Rows matching the dashboard filters, in day order."""
+        columns, offsets = self._state
+        lo, hi = self._period_rows(columns, offsets, period, year, month)
+
+        categories = self.dictionaries["category"].values
+        visible = np.array([c is not None and c not in EXCLUDED_CATEGORIES for c in categories], dtype=bool)
+        mask = visible[columns["category"][lo:hi]] if len(categories) else np.zeros(hi - lo, dtype=bool)
+
+        if user and user.lower() != "all":
+            mask &= np.isin(columns["person"][lo:hi], self.dictionaries["person"].codes_matching(user))
+        if category:
+            mask &= np.isin(columns["category"][lo:hi], self.dictionaries["category"].codes_matching(category))
+        return Selection(columns, self.dictionaries, lo + np.flatnonzero(mask))
+
+
+class Selection:
+    """Filtered rows of one consistent snapshot of the store's arrays."""
+
+    def __init__(self, columns, dictionaries, rows):
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def total(self, absolute=False):
+        amounts = self.columns["amount"][self.rows]
+        return float(np.abs(amounts).sum() if absolute else amounts.sum())
+
+    def category_aggregates(self):
+        """[(category, total, count)] ordered by category name."""
+        codes = self.columns["category"][self.rows]
+        names = self.dictionaries["category"].values
+        totals = np.bincount(codes, weights=self.columns["amount"][self.rows], minlength=len(names))
+        counts = np.bincount(codes, minlength=len(names))
+        return sorted((names[code], float(totals[code]), int(counts[code])) for code in np.flatnonzero(counts))
+
+    def records(self):
+        """Transaction dicts, most recent first."""
+        rows = self.rows[::-1]
+        columns = self.columns
+        dates = columns["day"][rows].astype("datetime64[D]").astype(str)
+        lookups = {name: dictionary.values for name, dictionary in self.dictionaries.items()}
+        return [
+            {
+                "amount": amount,
+                "merchant_name": lookups["merchant"][merchant],
+                "spending_category": lookups["category"][category],
+                "person": lookups["person"][person],
+                "transaction_date": day,
+                "account_type": lookups["account_type"][account_type],
+            }
+            for amount, merchant, category, person, day, account_type in zip(
+                columns["amount"][rows].tolist(),
+                columns["merchant"][rows].tolist(),
+                columns["category"][rows].tolist(),
+                columns["person"][rows].tolist(),
+                dates.tolist(),
+                columns["account_type"][rows].tolist(),
+            )
+        ]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _on_change(event):
+    # Month-scoped events arrive as data version bumps; unknown scope means reload everything.
+    # Category names are held in the dictionaries, so a rename or delete reloads too
+    if change_feed.renames_categories(event) and _store is not None:
+        _store.invalidate()
+
+
+def _get_or_create():
+    global _store
+    with _store_lock:
+        if _store is None:
+            # Always the primary: versions bumped by the change feed must not be
+            # recorded against months a lagging replica hasn't replayed yet
+            _store = ColumnStore(write_target())
+            change_feed.subscribe(_on_change)
+        return _store
+
+
+def get_store():
+    """
+    This process's up-to-date store, or None when disabled, unavailable, not loaded
+    yet or still re-reading months changed by a write (callers then use SQL).
+
+    Loads and month re-reads run in background threads, so it is safe to call
+    from the event loop.
+    """
+    if not COLUMN_STORE_ENABLED:
+        return None
+    try:
+        store = _get_or_create()
+        store.refresh()
+        return store if store.current() else None
+    except Exception as e:
+        # Fall back to the SQL path rather than failing the request
+        print(f"Column store unavailable: {e}")
+        return None
+
+
+def preload():
+    """Blocking first load for worker warm-up, so the store serves from the first request."""
+    if COLUMN_STORE_ENABLED:
+        store = _get_or_create()
+        if not store.loaded():
+            store.load()
@@ -0,0 +1,108 @@
+"""
+In-process data version counters.
+
+Every write that changes what a query could return bumps the version of the
+month it touched (and therefore its year). Caches record the versions of the
+scopes they depend on and treat an entry as stale as soon as any of them moves.
+
+Scopes are 'YYYY-MM' (month), 'YYYY' (year) or '*' (anything at all).
+"""
+import time
+import threading
+from collections import OrderedDict
+
+_lock = threading.Lock()
+_month_versions = {}
+_year_versions = {}
+_global_version = 0
+_any_version = 0
+_last_change = float("-inf")
+
+
+def bump_month(month):
+    """Record a data change in a 'YYYY-MM' month."""
+    global _any_version, _last_change
+    month = str(month)[:7]
+    with _lock:
+        _month_versions[month] = _month_versions.get(month, 0) + 1
+        _year_versions[month[:4]] = _year_versions.get(month[:4], 0) + 1
+        _any_version += 1
+        _last_change = time.monotonic()
+
+
+def bump_all():
+    """Record a change that affects every month (e.g. a category limit edit)."""
+    global _global_version, _any_version, _last_change
+    with _lock:
+        _global_version += 1
+        _any_version += 1
+        _last_change = time.monotonic()
+
+
+def scope_version(scope):
+    """Current version of a single scope, including changes that affect all scopes."""
+    with _lock:
+        if scope == "*":
+            return _any_version
+        if len(scope) == 4:
+            return (_global_version, _year_versions.get(scope, 0))
+        return (_global_version, _month_versions.get(scope, 0))
+
+
+def snapshot(scopes):
+    """Return a {scope: version} mapping for the given scopes."""
+    return {scope: scope_version(scope) for scope in scopes}
+
+
+def month_versions():
+    """Copy of every month's own change counter, for consumers that refresh month by month."""
+    with _lock:
+        return dict(_month_versions)
+
+
+def last_change():
+    """time.monotonic() of the most recent bump in this process."""
+    return _last_change
+
+
+def is_current(versions):
+    """True if none of the scopes in a snapshot have changed since it was taken."""
+    return all(scope_version(scope) == version for scope, version in versions.items())
+
+
+class VersionedCache:
+    """
+    LRU cache with a TTL whose entries also expire when their data changes.
+
+    put() stores a snapshot of the scopes the value was computed from; get()
+    drops the entry if the TTL passed or any of those scopes has been bumped.
+    """
+
+    def __init__(self, ttl_seconds, max_entries):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, versions, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds or not is_current(versions):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, versions, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), versions, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
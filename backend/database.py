@@ -1,18 +1,63 @@
 import os
+import calendar
+from datetime import date
 import pandas as pd
-import psycopg2
-from dotenv import load_dotenv
+import psycopg2.errors
+from data_versions import bump_month, bump_all, snapshot, scope_version, VersionedCache
+from db_routing import record_write
+from single_flight import SingleFlight
+from storage import (
+    EXCLUDED_CATEGORIES,
+    connection,
+    read_target,
+    write_target,
+    target_key,
+    read_frame,
+    execute,
+    Statement,
+    transaction_conditions,
+    transaction_params,
+    filters_user,
+    spans_year,
+    period_range,
+    dialect,
+    as_date
+)
+import analytics
 
-load_dotenv()
+# Trend windows that end before the current month only change on recategorization
+_trends_cache = VersionedCache(
+    ttl_seconds=int(os.environ.get("TRENDS_CACHE_TTL_SECONDS", "86400")),
+    max_entries=int(os.environ.get("TRENDS_CACHE_MAX_ENTRIES", "128"))
+)
 
-# Database configuration for remote server
-DB_CONFIG = {
-    "dbname": os.environ.get("DB_NAME"),
-    "user": os.environ.get("DB_USER"),
-    "password": os.environ.get("DB_PASSWORD"),
-    "host": os.environ.get("DB_HOST"),
-    "port": os.environ.get("DB_PORT"),
-    "options": "-c search_path=budget_app"
+# Identical concurrent dashboard reads share one query; each caller gets its own frame
+_transactions_flight = SingleFlight("transactions_data", share=lambda df: df.copy())
+
+_category_limit = Statement("category_limit", """
+        SELECT spending_limit
+        FROM budget_app.spending_categories
+        WHERE LOWER(category_name) = %s
+        LIMIT 1
+    """)
+
+# Period fetch by (yearly, for one user), users matching exactly; only the monthly
+# shapes are prepared (see Statement)
+_period_transactions = {
+    (yearly, by_user): Statement(f"period_transactions{'_year' if yearly else ''}{'_user' if by_user else ''}", f"""
+    SELECT 
+        amount,
+        merchant_name,
+        spending_category,
+        person,
+        transaction_date,
+        account_type
+    FROM budget_app.transactions_view
+    WHERE {transaction_conditions(by_user)}
+    ORDER BY transaction_date DESC
+    """, prepare=not yearly)
+    for yearly in (False, True)
+    for by_user in (False, True)
 }
 
 async def get_category_limit(category_name):
@@ -20,19 +65,11 @@ async def get_category_limit(category_name):
     if not category_name:
         return None
 
-    query = """
-        SELECT spending_limit
-        FROM budget_app.spending_categories
-        WHERE LOWER(category_name) = %s
-        LIMIT 1
-    """
-
-    conn = None
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        with conn.cursor() as cursor:
-            cursor.execute(query, (category_name.lower(),))
-            result = cursor.fetchone()
+        with connection(read_target()) as conn:
+            with conn.cursor() as cursor:
+                execute(cursor, _category_limit, (category_name.lower(),))
+                result = cursor.fetchone()
 
         if not result:
             return None
@@ -42,9 +79,6 @@ async def get_category_limit(category_name):
     except Exception as e:
         print(f"Database error fetching limit for {category_name}: {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
 
 async def get_transactions_data(
     user=None, 
@@ -64,131 +98,135 @@ async def get_transactions_data(
     Default behavior: Returns current month data if no parameters provided
     """
     
-    # Base query
-    base_query = """
-    SELECT 
-        amount,
-        merchant_name,
-        spending_category,
-        person,
-        transaction_date,
-        account_type
-    FROM budget_app.transactions_view
-    WHERE spending_category NOT IN ('Installment','Payments','Refunds & Returns')
-    """
-    
-    # Build WHERE conditions
-    conditions = []
-    params = []
-    
-    # User filter
-    if user and user.lower() != 'all':
-        conditions.append("LOWER(person) = %s")
-        params.append(user.lower())
-    
-    # Period filters - default to current month if nothing specified
-    if period == 'monthly' and month:
-        # Parse YYYY-MM format and create date range
-        # This ensures we only get transactions from the 1st through the last day of the month
-        conditions.append("transaction_date >= %s::date AND transaction_date < (%s::date + INTERVAL '1 month')")
-        params.extend([f"{month}-01", f"{month}-01"])
-        
-        
-    elif period == 'yearly' and year:
-        conditions.append("EXTRACT(YEAR FROM transaction_date) = %s")
-        params.append(int(year))
-        
-    elif period == 'yearly' and year:
-        conditions.append("EXTRACT(YEAR FROM transaction_date) = %s")
-        params.append(int(year))
-        
-    else:
-        # Default: current month only
-        from datetime import datetime
-        current_date = datetime.now()
-        conditions.append("EXTRACT(YEAR FROM transaction_date) = %s AND EXTRACT(MONTH FROM transaction_date) = %s")
-        params.extend([current_date.year, current_date.month])
+    # Period filter defaults to the current month when nothing is specified
+    params = transaction_params(period, month, year, user)
+    statement = _period_transactions[(spans_year(period, year), filters_user(user))]
     
-    # Combine conditions
-    if conditions:
-        base_query += " AND " + " AND ".join(conditions)
-    
-    # Add ordering
-    base_query += " ORDER BY transaction_date DESC"
+    # Date range of a selected period, so its closed months can come from analytics snapshots
+    bounds = None
+    if (period == 'monthly' and month) or (period == 'yearly' and year):
+        bounds = period_range(period, month, year)
     
+    # Same statement and params means the same rows; the data version keeps a caller
+    # that arrives after a write from joining a read that started before it
+    target = read_target()
+    key = (target_key(target), statement.name, tuple(params), scope_version("*"))
+    return await _transactions_flight.run(key, _read_transactions, target, statement, params, bounds)
+
+def _read_transactions(target, statement, params, bounds):
+    if bounds is not None:
+        result = analytics.query(statement.sql, params, *bounds)
+        if result is not None:
+            columns, rows = result
+            return pd.DataFrame.from_records(rows, columns=columns)
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        df = pd.read_sql(base_query, conn, params=params)
-        conn.close()
+        with connection(target) as conn:
+            df = read_frame(conn, statement, params)
         return df
     except Exception as e:
         print(f"Database error: {e}")
-        print(f"Query: {base_query}")
+        print(f"Query: {statement.sql}")
         print(f"Params: {params}")
         return pd.DataFrame()
 
 async def get_users_data():
     """
-    Fetch distinct users from the transactions_view
+    Fetch users that have transactions, from the trigger-maintained person catalog
     """
+    query = """
+    SELECT p.name
+    FROM budget_app.catalog_persons c
+    JOIN budget_app.persons p ON p.id = c.person_id
+    WHERE c.transaction_count > 0 AND p.name IS NOT NULL
+    ORDER BY p.name;
+    """
+    
+    try:
+        with connection(read_target()) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query)
+                return [row[0] for row in cursor.fetchall()]
+    except psycopg2.errors.UndefinedTable:
+        print("Catalog tables missing, falling back to a full scan (run backend/migrate.py)")
+        return await _scan_users()
+    except Exception as e:
+        print(f"Database error: {e}")
+        return []
+
+async def _scan_users():
+    """Distinct persons straight from transactions_view, for databases without the catalog"""
     query = "SELECT DISTINCT person FROM budget_app.transactions_view WHERE person IS NOT NULL ORDER BY person;"
     
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        df = pd.read_sql(query, conn)
-        conn.close()
-        return df['person'].tolist()
+        with connection(read_target()) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query)
+                return [row[0] for row in cursor.fetchall()]
     except Exception as e:
         print(f"Database error: {e}")
         return []
 
 async def get_available_periods():
     """
-    Fetch distinct months and years from the transactions_view
+    Fetch months and years that have transactions, from the trigger-maintained month catalog
     """
     query = """
-    SELECT DISTINCT 
-        EXTRACT(YEAR FROM transaction_date) as year,
-        EXTRACT(MONTH FROM transaction_date) as month
-    FROM budget_app.transactions_view 
-    ORDER BY year DESC, month DESC;
+    SELECT month
+    FROM budget_app.catalog_months
+    WHERE transaction_count > 0
+    ORDER BY month DESC;
     """
     
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        df = pd.read_sql(query, conn)
-        conn.close()
-        
-        # Get distinct years
-        years = sorted(df['year'].unique(), reverse=True)
-        
-        # Get months with year info
-        months = df[['year', 'month']].drop_duplicates().sort_values(['year', 'month'], ascending=[False, False])
-        month_options = []
-        for _, row in months.iterrows():
-            month_name = pd.to_datetime(f"{int(row['year'])}-{int(row['month'])}-01").strftime("%B")
-            month_options.append({
-                'value': f"{int(row['year'])}-{int(row['month']):02d}",
-                'label': f"{month_name} {int(row['year'])}"
-            })
-        
-        
-        return {
-            'years': [int(year) for year in years],
-            'months': month_options
-        }
+        with connection(read_target()) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query)
+                months = [as_date(row[0]) for row in cursor.fetchall()]
+    except psycopg2.errors.UndefinedTable:
+        print("Catalog tables missing, falling back to a full scan (run backend/migrate.py)")
+        try:
+            months = await _scan_months()
+        except Exception as e:
+            print(f"Database error: {e}")
+            return {'years': [], 'months': []}
     except Exception as e:
         print(f"Database error: {e}")
         return {'years': [], 'months': []}
+    
+    # Months arrive newest first, so years come out in descending order too
+    years = list(dict.fromkeys(month.year for month in months))
+    month_options = [
+        {
+            'value': f"{month.year}-{month.month:02d}",
+            'label': f"{calendar.month_name[month.month]} {month.year}"
+        }
+        for month in months
+    ]
+    
+    return {
+        'years': years,
+        'months': month_options
+    }
+
+async def _scan_months():
+    """Distinct months straight from transactions_view, for databases without the catalog"""
+    query = f"""
+    SELECT DISTINCT {dialect.month_start('transaction_date')} AS month
+    FROM budget_app.transactions_view
+    ORDER BY month DESC;
+    """
+    
+    with connection(read_target()) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query)
+            return [as_date(row[0]) for row in cursor.fetchall()]
 
 def test_connection():
     """Test database connection"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1")
-        cursor.close()
-        conn.close()
+        with connection(write_target()) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
         return True
     except Exception as e:
         print(f"Connection failed: {e}")
@@ -205,85 +243,191 @@ async def get_all_categories():
     """
     
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        df = pd.read_sql(query, conn)
-        conn.close()
+        with connection(read_target()) as conn:
+            df = read_frame(conn, query)
         return df['category_name'].tolist()
     except Exception as e:
         print(f"Database error: {e}")
         return []
 
-async def update_transaction_category(
-    transaction_date,
-    merchant_name,
-    amount,
-    person,
-    new_category
-):
+def _month_category_totals(cursor, month_start, person_id, category_ids):
     """
-    Update the spending category for a specific transaction
-    Uses composite key (date, merchant, amount, person) to identify the transaction
+    Month totals for the given categories, for the whole household and for one person,
+    together with each category's limit. Runs on the caller's cursor so it sees the
+    caller's uncommitted writes.
+    """
+    params = [person_id, person_id, month_start, month_start]
+    ids = dialect.in_list("c.id", params, category_ids)
+    cursor.execute(f"""
+        SELECT c.id,
+               c.category_name,
+               c.spending_limit,
+               {dialect.round("COALESCE(SUM(t.amount), 0)", 2)} AS total,
+               {dialect.round("COALESCE(SUM(t.amount) FILTER (WHERE t.person_id = %s), 0)", 2)} AS person_total,
+               COUNT(t.amount) AS transaction_count,
+               COUNT(t.amount) FILTER (WHERE t.person_id = %s) AS person_transaction_count
+        FROM budget_app.spending_categories c
+        LEFT JOIN budget_app.transactions t
+          ON t.category_id = c.id
+         AND t.transaction_date >= {dialect.date('%s')}
+         AND t.transaction_date < {dialect.add_months(dialect.date('%s'), 1)}
+        WHERE {ids}
+        GROUP BY c.id, c.category_name, c.spending_limit
+    """, params)
+    return {
+        row[0]: {
+            "category": row[1],
+            "spending_limit": float(row[2]) if row[2] is not None else None,
+            "total": float(row[3]),
+            "person_total": float(row[4]),
+            "transaction_count": row[5],
+            "person_transaction_count": row[6]
+        }
+        for row in cursor.fetchall()
+    }
+
+TOTAL_FIELDS = ("total", "person_total", "transaction_count", "person_transaction_count")
+
+def _limit_info(spending_limit, spent):
+    """Remaining budget and percent used for one month"""
+    if spending_limit is None:
+        return {"remaining": None, "percent_used": None}
+    return {
+        "remaining": round(spending_limit - spent, 2),
+        "percent_used": round(spent / spending_limit * 100, 1) if spending_limit else None
+    }
+
+async def recategorize_transactions(updates):
+    """
+    Move transactions to new categories and report the effect, all in one DB transaction
+    Each update identifies a transaction by its composite key (date, merchant, amount, person)
     
     Args:
-        transaction_date: Transaction date (YYYY-MM-DD format)
-        merchant_name: Merchant name
-        amount: Transaction amount
-        person: Person name who made the transaction
-        new_category: New category name to assign
+        updates: List of dicts with transaction_date, merchant_name, amount, person, new_category
     
     Returns:
-        True if update successful, False otherwise
+        Dict with the number of rows updated, the indexes of updates that matched nothing,
+        and for every affected (month, person) scope the before/after totals and limit info
+        of the source and destination categories. None on database error.
     """
-    # First, get the category_id and person_id from their names
     lookup_query = """
     SELECT 
         (SELECT id FROM budget_app.spending_categories WHERE category_name = %s) as category_id,
         (SELECT id FROM budget_app.persons WHERE name = %s) as person_id
     """
     
-    update_query = """
-    UPDATE budget_app.transactions
-    SET category_id = %s
-    WHERE transaction_date = %s::date
+    match = f"""
+      transaction_date = {dialect.date('%s')}
       AND merchant_name = %s
       AND amount = %s
       AND person_id = %s
     """
     
-    conn = None
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        with conn.cursor() as cursor:
-            # Look up the IDs
-            cursor.execute(lookup_query, (new_category, person))
-            result = cursor.fetchone()
-            
-            if not result or result[0] is None or result[1] is None:
-                print(f"Could not find category '{new_category}' or person '{person}'")
-                return False
-            
-            category_id, person_id = result
-            
-            # Update the transaction
-            cursor.execute(update_query, (
-                category_id,
-                transaction_date,
-                merchant_name,
-                amount,
-                person_id
-            ))
-            rows_affected = cursor.rowcount
-            conn.commit()
-            
-        return rows_affected > 0
+        with connection(write_target()) as conn:
+            with conn.cursor() as cursor:
+                resolved = []
+                not_found = []
+                scopes = {}
+                for index, update in enumerate(updates):
+                    cursor.execute(lookup_query, (update["new_category"], update["person"]))
+                    category_id, person_id = cursor.fetchone()
+                    if category_id is None or person_id is None:
+                        print(f"Could not find category '{update['new_category']}' or person '{update['person']}'")
+                        not_found.append(index)
+                        continue
+                    
+                    key = (update["transaction_date"], update["merchant_name"], update["amount"], person_id)
+                    # Lock the rows and learn their current (source) categories
+                    cursor.execute(
+                        f"SELECT DISTINCT category_id FROM budget_app.transactions WHERE {match}{dialect.for_update}",
+                        key
+                    )
+                    sources = [row[0] for row in cursor.fetchall() if row[0] is not None]
+                    
+                    scope = scopes.setdefault(
+                        (str(update["transaction_date"])[:7], person_id, update["person"]),
+                        {"sources": set(), "destinations": set()}
+                    )
+                    scope["sources"].update(sources)
+                    scope["destinations"].add(category_id)
+                    resolved.append((index, category_id, key))
+                
+                before = {
+                    scope: _month_category_totals(cursor, f"{scope[0]}-01", scope[1], ids["sources"] | ids["destinations"])
+                    for scope, ids in scopes.items()
+                }
+                
+                updated = 0
+                for index, category_id, key in resolved:
+                    cursor.execute(
+                        f"UPDATE budget_app.transactions SET category_id = %s WHERE {match}",
+                        (category_id, *key)
+                    )
+                    if cursor.rowcount == 0:
+                        not_found.append(index)
+                    updated += cursor.rowcount
+                
+                after = {
+                    scope: _month_category_totals(cursor, f"{scope[0]}-01", scope[1], ids["sources"] | ids["destinations"])
+                    for scope, ids in scopes.items()
+                }
+                conn.commit()
     except Exception as e:
         print(f"Database error updating transaction: {e}")
-        if conn:
-            conn.rollback()
-        return False
-    finally:
-        if conn:
-            conn.close()
+        return None
+    
+    if updated:
+        record_write()
+    affected = []
+    for scope, ids in scopes.items():
+        month, _, person = scope
+        categories = []
+        for category_id, now in after[scope].items():
+            was = before[scope].get(category_id, now)
+            categories.append({
+                "category": now["category"],
+                "role": "destination" if category_id in ids["destinations"] else "source",
+                "spending_limit": now["spending_limit"],
+                "before": {k: was[k] for k in TOTAL_FIELDS},
+                "after": {k: now[k] for k in TOTAL_FIELDS},
+                **_limit_info(now["spending_limit"], now["total"])
+            })
+        categories.sort(key=lambda c: (c["role"] != "source", c["category"]))
+        affected.append({"month": month, "person": person, "categories": categories})
+        if updated:
+            bump_month(month)
+    
+    return {"updated": updated, "not_found": sorted(not_found), "affected": affected}
+
+async def update_transaction_category(
+    transaction_date,
+    merchant_name,
+    amount,
+    person,
+    new_category
+):
+    """
+    Update the spending category for a specific transaction
+    Uses composite key (date, merchant, amount, person) to identify the transaction
+    
+    Args:
+        transaction_date: Transaction date (YYYY-MM-DD format)
+        merchant_name: Merchant name
+        amount: Transaction amount
+        person: Person name who made the transaction
+        new_category: New category name to assign
+    
+    Returns:
+        recategorize_transactions() result for this one update, or None on database error
+    """
+    return await recategorize_transactions([{
+        "transaction_date": transaction_date,
+        "merchant_name": merchant_name,
+        "amount": amount,
+        "person": person,
+        "new_category": new_category
+    }])
 
 async def get_all_categories_with_limits():
     """
@@ -297,9 +441,8 @@ async def get_all_categories_with_limits():
     """
     
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        df = pd.read_sql(query, conn)
-        conn.close()
+        with connection(read_target()) as conn:
+            df = read_frame(conn, query)
         return df.to_dict('records')
     except Exception as e:
         print(f"Database error: {e}")
@@ -314,31 +457,46 @@ async def update_category_limit(category_name, new_limit):
         new_limit: New spending limit value
     
     Returns:
-        True if update successful, False otherwise
+        Dict with the previous and new limit and the current month's spent/remaining
+        against it, computed in the same transaction; None if not found or on error
     """
-    query = """
-    UPDATE budget_app.spending_categories
-    SET spending_limit = %s
-    WHERE category_name = %s
+    lock_query = f"""
+    SELECT id, spending_limit
+    FROM budget_app.spending_categories
+    WHERE category_name = %s{dialect.for_update}
     """
     
-    conn = None
+    month = date.today().strftime("%Y-%m")
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        with conn.cursor() as cursor:
-            cursor.execute(query, (new_limit, category_name))
-            rows_affected = cursor.rowcount
-            conn.commit()
-            
-        return rows_affected > 0
+        with connection(write_target()) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(lock_query, (category_name,))
+                row = cursor.fetchone()
+                if row is None:
+                    conn.rollback()
+                    return None
+                category_id, previous_limit = row
+                cursor.execute(
+                    "UPDATE budget_app.spending_categories SET spending_limit = %s WHERE id = %s",
+                    (new_limit, category_id)
+                )
+                totals = _month_category_totals(cursor, f"{month}-01", None, [category_id])[category_id]
+                conn.commit()
     except Exception as e:
         print(f"Database error updating category limit: {e}")
-        if conn:
-            conn.rollback()
-        return False
-    finally:
-        if conn:
-            conn.close()
+        return None
+    
+    bump_all()
+    record_write()
+    return {
+        "category_name": category_name,
+        "previous_limit": float(previous_limit) if previous_limit is not None else None,
+        "spending_limit": totals["spending_limit"],
+        "month": month,
+        "spent": totals["total"],
+        "transaction_count": totals["transaction_count"],
+        **_limit_info(totals["spending_limit"], totals["total"])
+    }
 
 async def add_new_category(category_name, spending_limit=0.0):
     """
@@ -356,19 +514,164 @@ async def add_new_category(category_name, spending_limit=0.0):
     VALUES (%s, %s)
     """
     
-    conn = None
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        with conn.cursor() as cursor:
-            cursor.execute(query, (category_name, spending_limit))
-            conn.commit()
-            
+        with connection(write_target()) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (category_name, spending_limit))
+                conn.commit()
+
+        bump_all()
+        record_write()
         return True
     except Exception as e:
         print(f"Database error adding category: {e}")
-        if conn:
-            conn.rollback()
         return False
-    finally:
-        if conn:
-            conn.close()
+
+def _shift_month(year, month, delta):
+    """Return (year, month) moved by delta months."""
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+async def get_spending_trends(
+    end_month=None,
+    months=12,
+    rolling=3,
+    by_person=False,
+    user=None,
+    category=None
+):
+    """
+    Monthly totals per category (optionally per person) over a sliding window
+    
+    Rolling averages and month-over-month deltas are computed with window
+    functions in a single query. The query reaches `rolling` months further back
+    than the window so the first displayed month has a full rolling average and a
+    delta. Windows ending before the current month are cached until a write
+    touches one of their months.
+    
+    Args:
+        end_month: Last month of the window in YYYY-MM format (default: current month)
+        months: Number of months in the window
+        rolling: Months in the rolling average
+        by_person: Split each category by person
+        user: Filter by specific user/person (None for all users)
+        category: Restrict to one spending category
+    
+    Returns:
+        List of dicts ordered by category, person and month, or None on error
+    """
+    today = date.today()
+    if end_month:
+        end_year, end_month_num = int(end_month[:4]), int(end_month[5:7])
+    else:
+        end_year, end_month_num = today.year, today.month
+    
+    window_start = _shift_month(end_year, end_month_num, -(months - 1))
+    query_start = _shift_month(*window_start, -rolling)
+    query_end = _shift_month(end_year, end_month_num, 1)
+    
+    scopes = set()
+    year, month = query_start
+    while (year, month) < query_end:
+        scopes.add(f"{year}-{month:02d}")
+        year, month = _shift_month(year, month, 1)
+    
+    closed = (end_year, end_month_num) < (today.year, today.month)
+    cache_key = (end_year, end_month_num, months, rolling, by_person, (user or "all").lower(), (category or "").lower())
+    if closed:
+        cached = _trends_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        versions = snapshot(scopes)
+    
+    keys = "spending_category, person" if by_person else "spending_category"
+    conditions = [
+        f"spending_category NOT IN {EXCLUDED_CATEGORIES}",
+        f"transaction_date >= {dialect.date('%s')}",
+        f"transaction_date < {dialect.date('%s')}"
+    ]
+    params = [f"{query_start[0]}-{query_start[1]:02d}-01", f"{query_end[0]}-{query_end[1]:02d}-01"]
+    
+    if user and user.lower() != 'all':
+        conditions.append("LOWER(person) = %s")
+        params.append(user.lower())
+    if category:
+        conditions.append("LOWER(spending_category) = %s")
+        params.append(category.lower())
+    
+    # rolling is a validated int; frame offsets are interpolated rather than bound
+    query = f"""
+    WITH RECURSIVE months AS (
+        {dialect.month_series()}
+    ),
+    totals AS (
+        SELECT {dialect.month_start('transaction_date')} AS month,
+               {keys},
+               SUM(amount) AS total,
+               COUNT(*) AS transaction_count
+        FROM budget_app.transactions_view
+        WHERE {" AND ".join(conditions)}
+        GROUP BY 1, {keys}
+    ),
+    series AS (
+        SELECT k.*, m.month,
+               COALESCE(t.total, 0) AS total,
+               COALESCE(t.transaction_count, 0) AS transaction_count
+        FROM (SELECT DISTINCT {keys} FROM totals) k
+        CROSS JOIN months m
+        LEFT JOIN totals t USING ({keys}, month)
+    ),
+    trends AS (
+        SELECT {keys},
+               month,
+               total,
+               transaction_count,
+               AVG(total) OVER (PARTITION BY {keys} ORDER BY month ROWS BETWEEN {int(rolling) - 1} PRECEDING AND CURRENT ROW) AS rolling_avg,
+               total - LAG(total) OVER (PARTITION BY {keys} ORDER BY month) AS mom_delta,
+               LAG(total) OVER (PARTITION BY {keys} ORDER BY month) AS previous_total
+        FROM series
+    )
+    SELECT spending_category AS category,
+           {"person," if by_person else ""}
+           {dialect.month_label('month')} AS month,
+           {dialect.round('total', 2)} AS total,
+           transaction_count,
+           {dialect.round('rolling_avg', 2)} AS rolling_avg,
+           {dialect.round('mom_delta', 2)} AS mom_delta,
+           {dialect.round('(mom_delta / NULLIF(previous_total, 0) * 100)', 1)} AS mom_percent
+    FROM trends
+    WHERE month >= {dialect.date('%s')}
+    ORDER BY {keys}, month
+    """
+    window_params = [
+        f"{query_start[0]}-{query_start[1]:02d}-01",
+        f"{end_year}-{end_month_num:02d}-01"
+    ]
+    all_params = window_params + params + [f"{window_start[0]}-{window_start[1]:02d}-01"]
+    
+    # Closed months of the window come from analytics snapshots when enabled
+    result = analytics.query(query, all_params, date(*query_start, 1), date(*query_end, 1))
+    if result is not None:
+        columns, rows = result
+    else:
+        try:
+            with connection(read_target()) as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, all_params)
+                    columns = [col[0] for col in cursor.description]
+                    rows = cursor.fetchall()
+        except Exception as e:
+            print(f"Database error fetching trends: {e}")
+            return None
+    
+    trends = []
+    for row in rows:
+        record = dict(zip(columns, row))
+        for field in ("total", "rolling_avg", "mom_delta", "mom_percent"):
+            if record[field] is not None:
+                record[field] = float(record[field])
+        trends.append(record)
+    
+    if closed:
+        _trends_cache.put(cache_key, versions, trends)
+    return trends
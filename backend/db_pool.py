@@ -0,0 +1,106 @@
+"""
+Per-process Postgres connection pools.
+
+Each worker process lazily creates its own pool on first use (pools must never
+be shared across a fork). Pools are keyed by connection config, so modules that
+pass identical settings share one pool.
+
+Sizing comes from DB_POOL_MIN / DB_POOL_MAX, which server.py derives per worker
+from DB_MAX_CONNECTIONS and the worker count. Connections start with
+DB_STATEMENT_TIMEOUT_MS; see query_control.py for per-endpoint timeouts and
+cancellation.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.pool
+from metrics import InstrumentedConnection
+import query_control
+
+_pools = {}
+_pools_pid = None
+_lock = threading.Lock()
+
+
+class _BlockingPool(psycopg2.pool.ThreadedConnectionPool):
+    """ThreadedConnectionPool that waits for a free connection instead of raising."""
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        self._slots = threading.BoundedSemaphore(maxconn)
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        self._slots.acquire()
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+
+def _config_key(config):
+    return tuple(sorted((k, str(v)) for k, v in config.items()))
+
+
+def get_pool(config):
+    """Return this process's pool for a connection config, creating it if needed."""
+    global _pools_pid
+    with _lock:
+        if _pools_pid != os.getpid():
+            # Forked child: never reuse the parent's sockets
+            _pools.clear()
+            _pools_pid = os.getpid()
+        key = _config_key(config)
+        pool = _pools.get(key)
+        if pool is None:
+            # Read at creation time so .env and server.py overrides are already applied
+            min_size = int(os.environ.get("DB_POOL_MIN", "1"))
+            max_size = int(os.environ.get("DB_POOL_MAX", "5"))
+            options = f"{config.get('options', '')} -c statement_timeout={query_control.DB_STATEMENT_TIMEOUT_MS}"
+            pool = _BlockingPool(
+                min_size,
+                max(max_size, min_size),
+                connection_factory=InstrumentedConnection,
+                **{**config, "options": options.strip()}
+            )
+            _pools[key] = pool
+        return pool
+
+
+@contextmanager
+def connection(config):
+    """
+    Borrow a pooled connection.
+
+    Open transactions are rolled back when the connection is returned, so
+    writers must commit explicitly. Broken connections are discarded.
+    """
+    pool = get_pool(config)
+    conn = pool.getconn()
+    discard = False
+    scope = None
+    try:
+        scope = query_control.attach(conn)
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        discard = True
+        raise
+    finally:
+        query_control.detach(conn, scope)
+        pool.putconn(conn, close=discard or bool(conn.closed))
+
+
+def close_all():
+    """Close every pool owned by this process."""
+    with _lock:
+        for pool in _pools.values():
+            pool.closeall()
+        _pools.clear()
@@ -0,0 +1,105 @@
+"""
+Read/write routing between the primary and an optional read replica.
+
+Writes always use the primary config. Reads call read_config(DB_CONFIG),
+which returns the replica's config when DB_READ_HOST is set, except:
+
+  - for REPLICA_PIN_SECONDS after a client writes: write responses set a
+    short-lived cookie, and requests carrying it read from the primary, so
+    the writer sees its own change on every worker;
+  - for REPLICA_PIN_SECONDS after this worker saw any write (its own, or one
+    announced by the change feed), so data versions bumped by that write are
+    never cached against rows the replica hasn't replayed yet.
+
+REPLICA_PIN_SECONDS should exceed the replica's usual replay lag.
+"""
+import os
+import math
+import time
+import contextvars
+
+import data_versions
+
+READ_REPLICA_ENABLED = bool(os.environ.get("DB_READ_HOST"))
+REPLICA_PIN_SECONDS = float(os.environ.get("REPLICA_PIN_SECONDS", "5"))
+PIN_COOKIE = "budget_read_primary"
+
+_REPLICA_SETTINGS = {
+    "host": "DB_READ_HOST",
+    "port": "DB_READ_PORT",
+    "dbname": "DB_READ_NAME",
+    "user": "DB_READ_USER",
+    "password": "DB_READ_PASSWORD",
+}
+
+_request_routing = contextvars.ContextVar("request_routing", default=None)
+
+
+class _RequestRouting:
+    __slots__ = ("pinned", "wrote")
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replica_config(primary):
+    """The replica's version of a primary config; unset DB_READ_* settings fall back to the primary's."""
+    config = dict(primary)
+    for key, env in _REPLICA_SETTINGS.items():
+        value = os.environ.get(env)
+        if value:
+            config[key] = value
+    return config
+
+
+def read_config(primary):
+    """Connection config for a read that may tolerate replica lag."""
+    if not READ_REPLICA_ENABLED:
+        return primary
+    routing = _request_routing.get()
+    if routing is not None and (routing.pinned or routing.wrote):
+        return primary
+    if time.monotonic() - data_versions.last_change() < REPLICA_PIN_SECONDS:
+        return primary
+    return replica_config(primary)
+
+
+def record_write():
+    """Pin the current client to the primary for its next reads."""
+    routing = _request_routing.get()
+    if routing is not None:
+        routing.wrote = True
+
+
+def _has_pin_cookie(scope):
+    for name, value in scope.get("headers", []):
+        if name == b"cookie" and f"{PIN_COOKIE}=".encode() in value:
+            return True
+    return False
+
+
+class ReadRoutingMiddleware:
+    """Pure ASGI middleware: honours and sets the primary-pin cookie."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not READ_REPLICA_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        routing = _RequestRouting(pinned=_has_pin_cookie(scope))
+        token = _request_routing.set(routing)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and routing.wrote:
+                cookie = f"{PIN_COOKIE}=1; Max-Age={math.ceil(REPLICA_PIN_SECONDS)}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_routing.reset(token)
@@ -0,0 +1,334 @@
+"""
+Bulk transaction import from CSV and OFX statements.
+
+    python importer.py statement.csv --person Alex
+    python importer.py checking.ofx --person Alex --default-category Groceries
+    python importer.py 2025/*.csv --dry-run
+
+Parsed rows are streamed with COPY into a temporary staging table. Persons and
+categories are resolved with set-based SQL, every row gets a stable hash
+(budget_app.transaction_hash, see migrations/004_import_hash.sql), and the
+merge into transactions happens in one database transaction. Rows whose hash
+already exists are skipped, so re-importing overlapping statements is safe.
+
+CSV files need a header row. Recognised columns (case-insensitive):
+date, merchant/description/payee, amount (or debit/credit), person,
+category, account_type. Positive amounts are spending; pass --negate-amounts
+for banks that export purchases as negative numbers.
+"""
+import io
+import os
+import re
+import csv
+import sys
+import argparse
+from decimal import Decimal, InvalidOperation
+from datetime import datetime
+
+import psycopg2
+from dotenv import load_dotenv
+from data_versions import bump_month
+from merchants import sync_merchants
+
+load_dotenv()
+
+DB_CONFIG = {
+    "dbname": os.environ.get("DB_NAME"),
+    "user": os.environ.get("DB_USER"),
+    "password": os.environ.get("DB_PASSWORD"),
+    "host": os.environ.get("DB_HOST"),
+    "port": os.environ.get("DB_PORT"),
+    "options": "-c search_path=budget_app,public"
+}
+
+CSV_COLUMNS = {
+    "date": ("date", "transaction_date", "transaction date", "posted date", "posting date"),
+    "merchant": ("merchant", "merchant_name", "description", "payee", "name"),
+    "amount": ("amount", "transaction amount"),
+    "debit": ("debit", "withdrawal"),
+    "credit": ("credit", "deposit"),
+    "person": ("person", "user", "cardholder", "card member"),
+    "category": ("category", "spending_category"),
+    "account_type": ("account_type", "account type", "account"),
+}
+
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%Y%m%d", "%d.%m.%Y")
+
+_OFX_TRANSACTION = re.compile(r"<STMTTRN>(.*?)(?=</STMTTRN>|<STMTTRN>|</BANKTRANLIST>)", re.S | re.I)
+_OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def _parse_date(value):
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date '{value}'")
+
+
+def _parse_amount(value):
+    text = value.strip().replace("$", "").replace(",", "")
+    negative = text.startswith("(") and text.endswith(")")
+    try:
+        amount = Decimal(text.strip("()"))
+    except InvalidOperation:
+        raise ValueError(f"Unrecognised amount '{value}'")
+    return -amount if negative else amount
+
+
+def _optional(record, column):
+    value = (record.get(column) or "").strip() if column else ""
+    return value or None
+
+
+def parse_csv(text, negate_amounts=False):
+    """Parse a CSV statement into row dicts (transaction_date, merchant_name, amount, ...)."""
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    headers = {(name or "").strip().lower(): name for name in reader.fieldnames or []}
+    columns = {}
+    for field, aliases in CSV_COLUMNS.items():
+        columns[field] = next((headers[alias] for alias in aliases if alias in headers), None)
+
+    if not columns["date"] or not columns["merchant"]:
+        raise ValueError("CSV needs a date and a merchant/description column")
+    if not columns["amount"] and not (columns["debit"] or columns["credit"]):
+        raise ValueError("CSV needs an amount column (or debit/credit columns)")
+
+    rows = []
+    for line, record in enumerate(reader, start=2):
+        try:
+            if columns["amount"]:
+                amount = _parse_amount(record[columns["amount"]])
+            else:
+                debit = record.get(columns["debit"]) if columns["debit"] else ""
+                credit = record.get(columns["credit"]) if columns["credit"] else ""
+                amount = (_parse_amount(debit) if debit and debit.strip() else Decimal(0)) - \
+                         (_parse_amount(credit) if credit and credit.strip() else Decimal(0))
+            rows.append({
+                "transaction_date": _parse_date(record[columns["date"]]),
+                "merchant_name": record[columns["merchant"]].strip(),
+                "amount": -amount if negate_amounts else amount,
+                "person": _optional(record, columns["person"]),
+                "category": _optional(record, columns["category"]),
+                "account_type": _optional(record, columns["account_type"]),
+            })
+        except (ValueError, AttributeError) as e:
+            raise ValueError(f"Line {line}: {e}")
+    return rows
+
+
+def parse_ofx(text):
+    """Parse an OFX/QFX statement. Debits (negative TRNAMT) become positive spending."""
+    account_type = "credit" if re.search(r"<CCSTMTRS>", text, re.I) else None
+    if account_type is None:
+        match = re.search(r"<ACCTTYPE>([^<\r\n]+)", text, re.I)
+        account_type = match.group(1).strip().lower() if match else None
+
+    rows = []
+    for index, block in enumerate(_OFX_TRANSACTION.findall(text), start=1):
+        fields = {tag.upper(): value.strip() for tag, value in _OFX_FIELD.findall(block)}
+        try:
+            rows.append({
+                "transaction_date": _parse_date(fields["DTPOSTED"][:8]),
+                "merchant_name": fields.get("NAME") or fields.get("MEMO") or "UNKNOWN",
+                "amount": -_parse_amount(fields["TRNAMT"]),
+                "person": None,
+                "category": None,
+                "account_type": account_type,
+            })
+        except (KeyError, ValueError) as e:
+            raise ValueError(f"Transaction {index}: {e}")
+    return rows
+
+
+def parse_statement(text, fmt=None, negate_amounts=False):
+    """Parse statement text as 'csv' or 'ofx' (detected from the content when fmt is None)."""
+    if fmt is None:
+        fmt = "ofx" if re.search(r"OFXHEADER|<OFX>", text[:2048], re.I) else "csv"
+    if fmt in ("ofx", "qfx"):
+        return parse_ofx(text)
+    if fmt == "csv":
+        return parse_csv(text, negate_amounts=negate_amounts)
+    raise ValueError(f"Unsupported format '{fmt}'")
+
+
+def _copy_field(value):
+    if value is None:
+        return ""
+    text = str(value)
+    if any(ch in text for ch in ',"\n\r') or text == "":
+        text = '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def import_rows(conn, sources, person=None, account_type=None, default_category=None, dry_run=False):
+    """
+    Stage, resolve, deduplicate and merge parsed rows in one transaction.
+
+    sources is a list of row lists, one per statement; identical rows are
+    numbered per statement, so overlapping statements dedupe against each other.
+    person / account_type / default_category fill in values a row doesn't carry.
+
+    Returns {"inserted", "skipped", "persons_created", "categories_created", "months"}.
+    """
+    buf = io.StringIO()
+    staged = 0
+    for source, rows in enumerate(sources):
+        for row in rows:
+            staged += 1
+            buf.write(",".join(_copy_field(v) for v in (
+                source,
+                staged,
+                row["transaction_date"].isoformat(),
+                row["merchant_name"],
+                row["amount"],
+                row.get("person") or person,
+                row.get("category") or default_category,
+                row.get("account_type") or account_type,
+            )) + "\n")
+    buf.seek(0)
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TEMP TABLE import_staging (
+                    source INTEGER,
+                    line INTEGER,
+                    transaction_date DATE,
+                    merchant_name TEXT,
+                    amount NUMERIC(12, 2),
+                    person TEXT,
+                    category TEXT,
+                    account_type TEXT
+                ) ON COMMIT DROP
+            """)
+            cur.copy_expert("COPY import_staging FROM STDIN WITH (FORMAT csv)", buf)
+
+            cur.execute("""
+                INSERT INTO budget_app.persons (name)
+                SELECT DISTINCT ON (LOWER(s.person)) s.person
+                FROM import_staging s
+                WHERE s.person IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM budget_app.persons p WHERE LOWER(p.name) = LOWER(s.person))
+                ON CONFLICT (name) DO NOTHING
+            """)
+            persons_created = cur.rowcount
+
+            cur.execute("""
+                INSERT INTO budget_app.spending_categories (category_name, spending_limit)
+                SELECT DISTINCT ON (LOWER(s.category)) s.category, 0
+                FROM import_staging s
+                WHERE s.category IS NOT NULL
+                  AND NOT EXISTS (
+                      SELECT 1 FROM budget_app.spending_categories c WHERE LOWER(c.category_name) = LOWER(s.category)
+                  )
+                ON CONFLICT (category_name) DO NOTHING
+            """)
+            categories_created = cur.rowcount
+
+            cur.execute("""
+                WITH persons AS (
+                    SELECT DISTINCT ON (LOWER(name)) id, name FROM budget_app.persons ORDER BY LOWER(name), id
+                ),
+                categories AS (
+                    SELECT DISTINCT ON (LOWER(category_name)) id, category_name
+                    FROM budget_app.spending_categories
+                    ORDER BY LOWER(category_name), id
+                ),
+                resolved AS (
+                    SELECT s.transaction_date,
+                           s.merchant_name,
+                           s.amount,
+                           p.id AS person_id,
+                           c.id AS category_id,
+                           s.account_type,
+                           budget_app.transaction_hash(
+                               s.transaction_date, s.merchant_name, s.amount, p.name, s.account_type,
+                               ROW_NUMBER() OVER (
+                                   PARTITION BY s.source, s.transaction_date, UPPER(TRIM(s.merchant_name)),
+                                                ROUND(s.amount, 2), LOWER(COALESCE(p.name, '')),
+                                                LOWER(COALESCE(s.account_type, ''))
+                                   ORDER BY s.line
+                               )
+                           ) AS import_hash
+                    FROM import_staging s
+                    LEFT JOIN persons p ON LOWER(p.name) = LOWER(s.person)
+                    LEFT JOIN categories c ON LOWER(c.category_name) = LOWER(s.category)
+                )
+                INSERT INTO budget_app.transactions
+                    (transaction_date, merchant_name, amount, person_id, category_id, account_type, import_hash)
+                SELECT transaction_date, merchant_name, amount, person_id, category_id, account_type, import_hash
+                FROM resolved
+                ON CONFLICT (import_hash) DO NOTHING
+                RETURNING TO_CHAR(transaction_date, 'YYYY-MM')
+            """)
+            inserted_months = [row[0] for row in cur.fetchall()]
+            inserted = len(inserted_months)
+            months = sorted(set(inserted_months))
+
+        if dry_run:
+            conn.rollback()
+        else:
+            # Commits the merge together with the new rows' merchant mapping
+            sync_merchants(conn)
+    except Exception:
+        conn.rollback()
+        raise
+
+    if not dry_run:
+        for month in months:
+            bump_month(month)
+
+    return {
+        "inserted": inserted,
+        "skipped": staged - inserted,
+        "persons_created": persons_created,
+        "categories_created": categories_created,
+        "months": months,
+        "dry_run": dry_run,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import CSV/OFX statements into budget_app.transactions")
+    parser.add_argument("files", nargs="+", help="Statement files (.csv, .ofx, .qfx)")
+    parser.add_argument("--format", choices=["csv", "ofx"], help="Override format detection")
+    parser.add_argument("--person", help="Person for rows without a person column")
+    parser.add_argument("--account-type", help="Account type for rows without one")
+    parser.add_argument("--default-category", help="Category for rows without a category column")
+    parser.add_argument("--negate-amounts", action="store_true", help="CSV exports purchases as negative amounts")
+    parser.add_argument("--dry-run", action="store_true", help="Report counts without committing")
+    args = parser.parse_args()
+
+    sources = []
+    for path in args.files:
+        with open(path, encoding="utf-8-sig", errors="replace") as f:
+            text = f.read()
+        fmt = args.format or (path.rsplit(".", 1)[-1].lower() if "." in path else None)
+        try:
+            sources.append(parse_statement(text, fmt if fmt in ("csv", "ofx", "qfx") else None, args.negate_amounts))
+        except ValueError as e:
+            sys.exit(f"{path}: {e}")
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        result = import_rows(
+            conn,
+            sources,
+            person=args.person,
+            account_type=args.account_type,
+            default_category=args.default_category,
+            dry_run=args.dry_run
+        )
+    finally:
+        conn.close()
+
+    prefix = "Would import" if args.dry_run else "Imported"
+    print(f"{prefix} {result['inserted']} transactions, skipped {result['skipped']} duplicates "
+          f"({result['persons_created']} new persons, {result['categories_created']} new categories)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Dashboard push updates over the /ws WebSocket.
+
+A client subscribes to the same filters the dashboard uses:
+
+    {"type": "subscribe", "period": "monthly", "month": "2026-02", "user": "all"}
+
+Change feed events (see change_feed.py) that touch a subscription's months
+(and person, for a single-user subscription) are turned into compact deltas,
+computed once per distinct subscription:
+
+    {"type": "delta",
+     "months": ["2026-02"], "categories_affected": ["Groceries", "Restaurants"],
+     "categories": [...changed /categories rows...], "removed_categories": [...],
+     "summary": {"total_amount": ..., "transaction_count": ...},
+     "rows": [.../raw-transactions rows for the affected months and categories...]}
+
+The client drops its rows matching (month, category) in months x
+categories_affected and inserts `rows`. Limit changes send {"type": "limits"};
+an event with unknown scope sends {"type": "resync"} and the client re-fetches.
+"""
+import asyncio
+from datetime import datetime
+
+import pandas as pd
+
+import change_feed
+import column_store
+from database import get_transactions_data, get_all_categories_with_limits
+
+
+def _subscription_months(sub):
+    """Months ('YYYY-MM') a subscription covers, or None for a whole year."""
+    if sub.get("period") == "monthly" and sub.get("month"):
+        return {sub["month"][:7]}
+    if sub.get("period") == "yearly" and sub.get("year"):
+        return None
+    return {datetime.now().strftime("%Y-%m")}
+
+
+def _subscription_key(sub):
+    return (sub.get("period"), str(sub.get("year") or ""), sub.get("month") or "", (sub.get("user") or "all").lower())
+
+
+def _affects(sub, event):
+    months = event.get("months") or []
+    covered = _subscription_months(sub)
+    if covered is None:
+        if not any(m.startswith(str(sub["year"])) for m in months):
+            return False
+    elif not covered.intersection(months):
+        return False
+
+    user = (sub.get("user") or "all").lower()
+    persons = [p.lower() for p in event.get("persons") or []]
+    return user == "all" or not persons or user in persons
+
+
+async def _period_snapshot(sub):
+    """({category: (total, count)}, rows) for a subscription, via the column store when enabled."""
+    filters = {"user": sub.get("user"), "period": sub.get("period"), "year": sub.get("year"), "month": sub.get("month")}
+    store = column_store.get_store()
+    if store is not None:
+        selection = store.select(**filters)
+        totals = {category: (total, count) for category, total, count in selection.category_aggregates()}
+        return totals, selection.records()
+
+    df = await get_transactions_data(**filters)
+    if df.empty:
+        return {}, []
+    grouped = df.groupby("spending_category")["amount"].agg(["sum", "count"])
+    totals = {category: (float(row["sum"]), int(row["count"])) for category, row in grouped.iterrows()}
+    df["transaction_date"] = pd.to_datetime(df["transaction_date"]).dt.strftime("%Y-%m-%d")
+    df["amount"] = df["amount"].astype(float)
+    rows = df[["amount", "merchant_name", "spending_category", "person", "transaction_date", "account_type"]]
+    return totals, rows.to_dict("records")
+
+
+def _category_row(category, total, count):
+    """Same shape as a /categories row."""
+    return {
+        "spending_category": category,
+        "total_amount": round(total, 2),
+        "transaction_count": count,
+        "avg_amount": round(total / count, 2) if count else 0.0
+    }
+
+
+class Client:
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.subscription = None
+        self.totals = {}
+
+
+class LiveUpdates:
+    """Tracks WebSocket clients and pushes change feed deltas to them."""
+
+    def __init__(self):
+        self.clients = set()
+        self._loop = None
+
+    def start(self, loop):
+        """Begin forwarding change feed events; events arrive on the listener thread."""
+        self._loop = loop
+        change_feed.subscribe(self._on_change)
+
+    def connect(self, websocket):
+        client = Client(websocket)
+        self.clients.add(client)
+        return client
+
+    def disconnect(self, client):
+        self.clients.discard(client)
+
+    def _on_change(self, event):
+        if self._loop is not None and self.clients:
+            asyncio.run_coroutine_threadsafe(self.dispatch(event), self._loop)
+
+    async def subscribe(self, client, subscription):
+        client.subscription = subscription
+        totals, _ = await _period_snapshot(subscription)
+        client.totals = totals
+
+    async def dispatch(self, event):
+        if event.get("all"):
+            await self._broadcast([c for c in list(self.clients) if c.subscription], {"type": "resync"})
+            return
+
+        if event.get("table") == "spending_categories":
+            limits = await get_all_categories_with_limits()
+            await self._broadcast(list(self.clients), {"type": "limits", "categories": limits})
+            return
+
+        # One snapshot per distinct subscription, shared by every client on it
+        groups = {}
+        for client in list(self.clients):
+            if client.subscription and _affects(client.subscription, event):
+                groups.setdefault(_subscription_key(client.subscription), []).append(client)
+
+        months = set(event.get("months") or [])
+        categories = set(event.get("categories") or [])
+        for clients in groups.values():
+            try:
+                totals, rows = await _period_snapshot(clients[0].subscription)
+            except Exception as e:
+                print(f"Live update failed: {e}")
+                await self._broadcast(clients, {"type": "resync"})
+                continue
+
+            changed_rows = [
+                row for row in rows
+                if row["transaction_date"][:7] in months and row["spending_category"] in categories
+            ]
+            summary = {
+                "total_amount": sum(total for total, _ in totals.values()),
+                "transaction_count": sum(count for _, count in totals.values())
+            }
+            for client in clients:
+                message = {
+                    "type": "delta",
+                    "months": sorted(months),
+                    "categories_affected": sorted(categories),
+                    "categories": [
+                        _category_row(category, total, count)
+                        for category, (total, count) in sorted(totals.items())
+                        if client.totals.get(category) != (total, count)
+                    ],
+                    "removed_categories": sorted(set(client.totals) - set(totals)),
+                    "summary": summary,
+                    "rows": changed_rows
+                }
+                client.totals = totals
+                await self._broadcast([client], message)
+
+    async def _broadcast(self, clients, message):
+        for client in clients:
+            try:
+                await client.websocket.send_json(message)
+            except Exception:
+                # Closed mid-send; the receive loop removes it
+                pass
+
+
+live_updates = LiveUpdates()
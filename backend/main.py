@@ -1,4 +1,9 @@
-from fastapi import FastAPI, HTTPException
+import os
+import re
+import startup
+import asyncio
+from fastapi import FastAPI, HTTPException, UploadFile, File, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 from database import (
@@ -8,16 +13,41 @@ from database import (
     get_category_limit,
     get_all_categories,
     update_transaction_category,
+    recategorize_transactions,
     get_all_categories_with_limits,
     update_category_limit,
-    add_new_category
+    add_new_category,
+    get_spending_trends
 )
-from chatbot import process_chat_message
+from db_pool import connection as db_connection
+from queries import get_budget_status, budget_period_span, search_merchants
+from metrics import MetricsMiddleware, TimedRoute, registry as metrics_registry
+from profiling import ProfilingMiddleware
+from query_control import CancelOnDisconnectMiddleware, LimiterBusy, with_statement_timeout, run_in_executor
+import db_routing
+import storage
+import admin
+import column_store
+import change_feed
+import analytics
+from live_updates import live_updates
 import pandas as pd
 from datetime import datetime
 from typing import Optional, List, Any
 
 app = FastAPI(title="Budget Data API")
+app.router.route_class = TimedRoute
+
+# Per-endpoint statement timeouts (ms); other endpoints use DB_STATEMENT_TIMEOUT_MS
+SEARCH_STATEMENT_TIMEOUT_MS = int(os.environ.get("SEARCH_STATEMENT_TIMEOUT_MS", "2000"))
+CHAT_STATEMENT_TIMEOUT_MS = int(os.environ.get("CHAT_STATEMENT_TIMEOUT_MS", "10000"))
+IMPORT_STATEMENT_TIMEOUT_MS = int(os.environ.get("IMPORT_STATEMENT_TIMEOUT_MS", "300000"))
+
+# Innermost, so a cancelled request is still recorded by MetricsMiddleware
+app.add_middleware(CancelOnDisconnectMiddleware)
+app.add_middleware(db_routing.ReadRoutingMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware, authorize=admin.admin_token_valid)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,10 +62,100 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(admin.router)
+
+_background_tasks = set()
+
+@app.on_event("startup")
+async def start_warm_up():
+    change_feed.start()
+    analytics.start()
+    live_updates.start(asyncio.get_running_loop())
+    # Warm up in the background so the port opens immediately; /ready gates traffic
+    task = asyncio.create_task(startup.warm_up())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+@app.on_event("shutdown")
+async def shutdown():
+    change_feed.stop()
+    analytics.stop()
+    storage.close_all()
+
 @app.get("/")
 async def root():
     return {"message": "Budget Data API"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once DB connections are open and the current month is warm"""
+    state = {
+        **startup.state,
+        "change_feed": change_feed.status(),
+        "read_replica": db_routing.READ_REPLICA_ENABLED,
+        "analytics": analytics.status()
+    }
+    if not startup.state["ready"]:
+        return JSONResponse(status_code=503, content=state)
+    return state
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Per-route latency histograms and DB/response counters in Prometheus text format"""
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+def _period_label(period, year, month):
+    """Human readable label for the selected period"""
+    if period == "monthly" and month:
+        year_val, month_val = month.split('-')
+        return pd.to_datetime(f"{year_val}-{month_val}-01").strftime("%B %Y")
+    elif period == "yearly":
+        current_year = year or datetime.now().year
+        return f"{current_year}"
+    # Default: current month
+    return datetime.now().strftime("%B %Y")
+
+@app.websocket("/ws")
+async def websocket_updates(websocket: WebSocket):
+    """
+    Push channel for dashboard deltas
+    Send {"type": "subscribe", "period", "month", "year", "user"} to (re)subscribe
+    """
+    await websocket.accept()
+    client = live_updates.connect(websocket)
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if message.get("type") != "subscribe":
+                continue
+            subscription = {
+                "period": message.get("period") or "monthly",
+                "month": message.get("month") or None,
+                "year": message.get("year") or None,
+                "user": message.get("user") or "all"
+            }
+            if subscription["month"] and not re.fullmatch(r"\d{4}-(0[1-9]|1[0-2])", subscription["month"]):
+                await websocket.send_json({"type": "error", "detail": "month must be in YYYY-MM format"})
+                continue
+            try:
+                await live_updates.subscribe(client, subscription)
+            except Exception as e:
+                print(f"WebSocket subscribe failed: {e}")
+                await websocket.send_json({"type": "error", "detail": "Failed to subscribe"})
+                continue
+            await websocket.send_json({
+                "type": "subscribed",
+                "subscription": subscription,
+                "live": change_feed.status().get("connected", False)
+            })
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        live_updates.disconnect(client)
+
 @app.get("/transactions")
 async def get_transactions(
     period: Optional[str] = "monthly",
@@ -48,6 +168,25 @@ async def get_transactions(
     period: 'monthly', 'yearly'
     month: 'YYYY-MM' format for specific month
     """
+    store = column_store.get_store()
+    if store is not None:
+        selection = store.select(user=user, period=period, year=year, month=month)
+        if not len(selection):
+            return {"data": [], "summary": {}}
+        current_period_info = _period_label(period, year, month)
+        return {
+            "data": [
+                {"spending_category": category, "amount": total, "period": current_period_info}
+                for category, total, _ in selection.category_aggregates()
+            ],
+            "summary": {
+                "total_amount": selection.total(),
+                "transaction_count": len(selection),
+                "period": period,
+                "current_period": current_period_info
+            }
+        }
+    
     # Get filtered data directly from database
     df = await get_transactions_data(
         user=user,
@@ -62,15 +201,7 @@ async def get_transactions(
     df['transaction_date'] = pd.to_datetime(df['transaction_date'])
     
     # Generate period info for display
-    if period == "monthly" and month:
-        year_val, month_val = month.split('-')
-        current_period_info = pd.to_datetime(f"{year_val}-{month_val}-01").strftime("%B %Y")
-    elif period == "yearly":
-        current_year = year or datetime.now().year
-        current_period_info = f"{current_year}"
-    else:
-        # Default: current month
-        current_period_info = datetime.now().strftime("%B %Y")
+    current_period_info = _period_label(period, year, month)
     
     # Group by spending category
     grouped = df.groupby('spending_category')['amount'].sum().reset_index()
@@ -94,6 +225,21 @@ async def get_categories(
     user: Optional[str] = None
 ):
     """Get spending categories summary for the specified period"""
+    store = column_store.get_store()
+    if store is not None:
+        selection = store.select(user=user, period=period, year=year, month=month)
+        return {
+            "categories": [
+                {
+                    "spending_category": category,
+                    "total_amount": round(total, 2),
+                    "transaction_count": count,
+                    "avg_amount": round(total / count, 2)
+                }
+                for category, total, count in selection.category_aggregates()
+            ]
+        }
+    
     # Get filtered data directly from database
     df = await get_transactions_data(
         user=user,
@@ -125,6 +271,10 @@ async def get_raw_transactions(
     """
     Get raw transaction data for line chart
     """
+    store = column_store.get_store()
+    if store is not None:
+        return {"data": store.select(user=user, period=period, year=year, month=month).records()}
+    
     # Get filtered data directly from database
     df = await get_transactions_data(
         user=user,
@@ -170,6 +320,24 @@ async def get_periods():
     periods = await get_available_periods()
     return periods
 
+async def _category_limit_info(category, total_spent, period, year, month):
+    """Limit context for a category: base limit times the months in the period, as in /budget-status"""
+    months_multiplier, _ = budget_period_span(period, month, year)
+
+    limit_value = await get_category_limit(category)
+    limit_info = {
+        "category": category,
+        "base_limit": limit_value,
+        "months_multiplier": months_multiplier,
+        "effective_limit": float(limit_value * months_multiplier) if limit_value is not None else None,
+        "total_spent": total_spent,
+        "difference": None
+    }
+
+    if limit_value is not None:
+        limit_info["difference"] = limit_info["effective_limit"] - total_spent
+    return limit_info
+
 @app.get("/category-transactions")
 async def get_category_transactions(
     category: str,
@@ -181,8 +349,15 @@ async def get_category_transactions(
     """
     Get detailed transactions for a specific category
     """
-    print(f"DEBUG: Requested category: '{category}'")
-    print(f"DEBUG: Parameters - period: {period}, user: {user}, month: {month}, year: {year}")
+    store = column_store.get_store()
+    if store is not None:
+        selection = store.select(user=user, period=period, year=year, month=month, category=category)
+        if not len(selection):
+            return {"transactions": []}
+        return {
+            "transactions": selection.records(),
+            "limit_info": await _category_limit_info(category, selection.total(absolute=True), period, year, month)
+        }
     
     # Get filtered data from database
     df = await get_transactions_data(
@@ -192,21 +367,12 @@ async def get_category_transactions(
         month=month
     )
     
-    print(f"DEBUG: Total transactions from database: {len(df)}")
-    
     if df.empty:
-        print("DEBUG: No transactions found from database")
         return {"transactions": []}
     
-    # Debug: Print available categories
-    available_categories = df['spending_category'].unique().tolist()
-    print(f"DEBUG: Available categories: {available_categories}")
-    
     # Filter by category (case-insensitive comparison)
     category_df = df[df['spending_category'].str.lower() == category.lower()].copy()
     
-    print(f"DEBUG: Transactions found for category '{category}': {len(category_df)}")
-    
     if category_df.empty:
         return {"transactions": []}
     
@@ -218,21 +384,7 @@ async def get_category_transactions(
     
     # Calculate totals and limit context before serialization
     total_spent = float(category_df['amount'].abs().sum())
-    unique_months = category_df['transaction_date'].dt.to_period('M').nunique()
-    months_multiplier = int(unique_months) if unique_months else 1
-
-    limit_value = await get_category_limit(category)
-    limit_info = {
-        "category": category,
-        "base_limit": limit_value,
-        "months_multiplier": months_multiplier,
-        "effective_limit": float(limit_value * months_multiplier) if limit_value is not None else None,
-        "total_spent": total_spent,
-        "difference": None
-    }
-
-    if limit_value is not None:
-        limit_info["difference"] = limit_info["effective_limit"] - total_spent
+    limit_info = await _category_limit_info(category, total_spent, period, year, month)
 
     # Convert to records with all requested columns
     transactions = category_df[[
@@ -248,11 +400,74 @@ async def get_category_transactions(
     for transaction in transactions:
         transaction['transaction_date'] = transaction['transaction_date'].strftime('%Y-%m-%d')
     
-    print(f"DEBUG: Returning {len(transactions)} transactions")
     return {
         "transactions": transactions,
         "limit_info": limit_info
     }
+
+@app.get("/budget-status")
+async def budget_status(
+    period: Optional[str] = "monthly",
+    year: Optional[int] = None,
+    month: Optional[str] = None,
+    user: Optional[str] = None
+):
+    """
+    Spent, effective limit, remaining, percent used and pace projection for every category
+    """
+    result = get_budget_status(period=period, month=month, year=year, user=user)
+    if isinstance(result, dict) and "error" in result:
+        raise HTTPException(status_code=500, detail="Failed to compute budget status")
+    return result
+
+@app.get("/merchants/search")
+@with_statement_timeout(SEARCH_STATEMENT_TIMEOUT_MS)
+async def merchant_search(q: str, limit: int = 10):
+    """
+    Ranked merchant name autocomplete; tolerates partial and misspelled names
+    """
+    if not 1 <= limit <= 50:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 50")
+    
+    merchants = search_merchants(q, limit=limit)
+    if isinstance(merchants, dict) and "error" in merchants:
+        raise HTTPException(status_code=500, detail="Failed to search merchants")
+    
+    return {"merchants": merchants}
+
+@app.get("/trends")
+async def get_trends(
+    end_month: Optional[str] = None,
+    months: int = 12,
+    rolling: int = 3,
+    by_person: bool = False,
+    user: Optional[str] = None,
+    category: Optional[str] = None
+):
+    """
+    Monthly totals per category over a sliding window with rolling averages and month-over-month deltas
+    end_month: 'YYYY-MM' format, defaults to the current month
+    """
+    if end_month and not re.fullmatch(r"\d{4}-(0[1-9]|1[0-2])", end_month):
+        raise HTTPException(status_code=400, detail="end_month must be in YYYY-MM format")
+    if not 1 <= months <= 60:
+        raise HTTPException(status_code=400, detail="months must be between 1 and 60")
+    if not 1 <= rolling <= 12:
+        raise HTTPException(status_code=400, detail="rolling must be between 1 and 12")
+    
+    trends = await get_spending_trends(
+        end_month=end_month,
+        months=months,
+        rolling=rolling,
+        by_person=by_person,
+        user=user,
+        category=category
+    )
+    if trends is None:
+        raise HTTPException(status_code=500, detail="Failed to fetch trends")
+    
+    return {"trends": trends, "months": months, "rolling": rolling}
+
 @app.get("/categories-list")
 async def get_categories_list():
     """
@@ -272,8 +487,10 @@ class CategoryUpdateRequest(BaseModel):
 async def update_category(request: CategoryUpdateRequest):
     """
     Update the category for a specific transaction
+    The response carries the before/after month totals of the source and destination
+    categories, so the client can patch its view without re-fetching
     """
-    success = await update_transaction_category(
+    result = await update_transaction_category(
         transaction_date=request.transaction_date,
         merchant_name=request.merchant_name,
         amount=request.amount,
@@ -281,11 +498,34 @@ async def update_category(request: CategoryUpdateRequest):
         new_category=request.new_category
     )
     
-    if success:
-        return {"success": True, "message": "Category updated successfully"}
+    if result and result["updated"]:
+        return {"success": True, "message": "Category updated successfully", **result}
     else:
         raise HTTPException(status_code=404, detail="Transaction not found or update failed")
 
+class BatchCategoryUpdateRequest(BaseModel):
+    updates: List[CategoryUpdateRequest]
+
+BATCH_UPDATE_MAX = 500
+
+@app.put("/transactions/category")
+async def update_categories(request: BatchCategoryUpdateRequest):
+    """
+    Update the category of several transactions in one database transaction
+    not_found lists the indexes of updates that matched no transaction
+    """
+    if not request.updates:
+        raise HTTPException(status_code=400, detail="No updates given")
+    if len(request.updates) > BATCH_UPDATE_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_UPDATE_MAX} updates per request")
+    
+    result = await recategorize_transactions([update.dict() for update in request.updates])
+    
+    if result and result["updated"]:
+        return {"success": True, "message": f"Updated {result['updated']} transactions", **result}
+    else:
+        raise HTTPException(status_code=404, detail="No transactions found or update failed")
+
 @app.get("/categories-with-limits")
 async def get_categories_with_limits():
     """
@@ -306,13 +546,13 @@ async def update_limit(request: CategoryLimitUpdateRequest):
     if request.new_limit < 0:
         raise HTTPException(status_code=400, detail="Spending limit cannot be negative")
     
-    success = await update_category_limit(
+    result = await update_category_limit(
         category_name=request.category_name,
         new_limit=request.new_limit
     )
     
-    if success:
-        return {"success": True, "message": "Category limit updated successfully"}
+    if result:
+        return {"success": True, "message": "Category limit updated successfully", "category": result}
     else:
         raise HTTPException(status_code=404, detail="Category not found or update failed")
 
@@ -342,23 +582,94 @@ async def create_category(request: NewCategoryRequest):
         raise HTTPException(status_code=400, detail="Category already exists or creation failed")
 
 
+IMPORT_MAX_BYTES = int(os.environ.get("IMPORT_MAX_BYTES", str(20 * 1024 * 1024)))
+
+@app.post("/import")
+@with_statement_timeout(IMPORT_STATEMENT_TIMEOUT_MS)
+async def import_statement(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    person: Optional[str] = None,
+    account_type: Optional[str] = None,
+    default_category: Optional[str] = None,
+    negate_amounts: bool = False,
+    dry_run: bool = False
+):
+    """
+    Import an uploaded CSV or OFX statement
+    format: 'csv' or 'ofx', detected from the file name/content when omitted
+    Rows that already exist are skipped; returns inserted/skipped counts
+    """
+    from importer import parse_statement, import_rows, DB_CONFIG as IMPORT_DB_CONFIG
+    
+    # COPY staging and the hash function are Postgres features
+    if storage.engine.name != "postgres":
+        raise HTTPException(status_code=501, detail="Statement import needs the postgres storage engine")
+    
+    body = await file.read(IMPORT_MAX_BYTES + 1)
+    if not body:
+        raise HTTPException(status_code=400, detail="Uploaded statement file is empty")
+    if len(body) > IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Statement file too large")
+    
+    if format is None and file.filename and file.filename.lower().endswith((".ofx", ".qfx")):
+        format = "ofx"
+    try:
+        rows = parse_statement(body.decode("utf-8-sig", errors="replace"), format, negate_amounts)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    def run_import():
+        with db_connection(IMPORT_DB_CONFIG) as conn:
+            result = import_rows(
+                conn,
+                [rows],
+                person=person,
+                account_type=account_type,
+                default_category=default_category,
+                dry_run=dry_run
+            )
+        if result["inserted"] and not dry_run:
+            db_routing.record_write()
+        return result
+    
+    try:
+        return await run_in_executor(run_import)
+    except Exception as e:
+        print(f"Import failed: {e}")
+        raise HTTPException(status_code=500, detail="Import failed")
+
+
 class ChatRequest(BaseModel):
     message: str
     conversation_history: List[Any] = []
     filters: dict = {}
+    bypass_cache: bool = False
 
 @app.post("/chat")
+@with_statement_timeout(CHAT_STATEMENT_TIMEOUT_MS)
 async def chat(request: ChatRequest):
     """Chat with the AI budget assistant"""
     import os
     if not os.environ.get("ANTHROPIC_API_KEY"):
         raise HTTPException(status_code=503, detail="Chatbot not configured: ANTHROPIC_API_KEY not set")
 
-    result = await process_chat_message(
-        message=request.message,
-        conversation_history=request.conversation_history,
-        filters=request.filters
-    )
+    # Loaded on first use so the anthropic SDK stays out of worker startup
+    from chatbot import process_chat_message
+
+    try:
+        result = await process_chat_message(
+            message=request.message,
+            conversation_history=request.conversation_history,
+            filters=request.filters,
+            bypass_cache=request.bypass_cache
+        )
+    except LimiterBusy:
+        raise HTTPException(
+            status_code=429,
+            detail="The assistant is busy, please try again in a moment",
+            headers={"Retry-After": "5"}
+        )
     return result
 
 
@@ -0,0 +1,136 @@
+"""
+Merchant name normalization.
+
+Maps raw statement merchant names onto canonical merchants:
+
+    SQ *COSTCO WHSE #0123   ->  COSTCO WHSE
+    PAYPAL *SPOTIFY         ->  SPOTIFY
+    SHELL OIL 57442         ->  SHELL OIL
+
+    python merchants.py             # map names not seen before
+    python merchants.py --rebuild   # re-normalize every name after changing the rules
+
+Only raw names without an alias are normalized, so runs after an import cost
+time proportional to the new names, not the table.
+"""
+import os
+import re
+import argparse
+import psycopg2
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_CONFIG = {
+    "dbname": os.environ.get("DB_NAME"),
+    "user": os.environ.get("DB_USER"),
+    "password": os.environ.get("DB_PASSWORD"),
+    "host": os.environ.get("DB_HOST"),
+    "port": os.environ.get("DB_PORT"),
+    "options": "-c search_path=budget_app,public"
+}
+
+# Card processor / payment aggregator prefixes, e.g. "SQ *", "TST* ", "PAYPAL *"
+_PROCESSOR_PREFIX = re.compile(r"^(?:SQ|TST|PAYPAL|PP|SP|DD|IC|PY|POS|ACH|GOOGLE|APL|CKE)\s*\*\s*")
+# Store / terminal numbers: "#0123", "STORE 45", trailing runs of 3+ digits
+_STORE_NUMBER = re.compile(r"\s*(?:#\s*\d+|\bSTORE\s+\d+|\b\d{3,})\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_merchant_name(raw_name):
+    """Canonical form of a raw merchant name (uppercase, no processor prefix or store number)."""
+    name = _WHITESPACE.sub(" ", (raw_name or "").upper()).strip()
+    while True:
+        stripped = _PROCESSOR_PREFIX.sub("", name)
+        if stripped == name:
+            break
+        name = stripped
+    name = _STORE_NUMBER.sub("", name)
+    name = _WHITESPACE.sub(" ", name).strip(" -*#,.")
+    # Never collapse a name to nothing (e.g. a merchant called "7-11 #123")
+    return name or (raw_name or "").strip().upper()
+
+
+def sync_merchants(conn, rebuild=False):
+    """
+    Create aliases (and canonical merchants) for unmapped raw names and map their transactions.
+
+    Commits on success. Returns {"new_names": ..., "transactions_mapped": ...}.
+    """
+    try:
+        with conn.cursor() as cur:
+            if rebuild:
+                cur.execute("UPDATE budget_app.transactions SET merchant_id = NULL WHERE merchant_id IS NOT NULL")
+                cur.execute("DELETE FROM budget_app.merchant_aliases")
+
+            cur.execute("""
+                SELECT DISTINCT t.merchant_name
+                FROM budget_app.transactions t
+                WHERE t.merchant_id IS NULL
+                  AND NOT EXISTS (
+                      SELECT 1 FROM budget_app.merchant_aliases a WHERE a.raw_name = t.merchant_name
+                  )
+            """)
+            raw_names = [row[0] for row in cur.fetchall()]
+
+            if raw_names:
+                cur.execute("""
+                    CREATE TEMP TABLE merchant_alias_staging (raw_name TEXT, canonical TEXT)
+                    ON COMMIT DROP
+                """)
+                execute_values(
+                    cur,
+                    "INSERT INTO merchant_alias_staging (raw_name, canonical) VALUES %s",
+                    [(raw, normalize_merchant_name(raw)) for raw in raw_names],
+                    page_size=1000
+                )
+                cur.execute("""
+                    INSERT INTO budget_app.merchants (name)
+                    SELECT DISTINCT canonical FROM merchant_alias_staging
+                    ON CONFLICT (name) DO NOTHING
+                """)
+                cur.execute("""
+                    INSERT INTO budget_app.merchant_aliases (raw_name, merchant_id)
+                    SELECT s.raw_name, m.id
+                    FROM merchant_alias_staging s
+                    JOIN budget_app.merchants m ON m.name = s.canonical
+                    ON CONFLICT (raw_name) DO NOTHING
+                """)
+
+            cur.execute("""
+                UPDATE budget_app.transactions t
+                SET merchant_id = a.merchant_id
+                FROM budget_app.merchant_aliases a
+                WHERE t.merchant_id IS NULL AND a.raw_name = t.merchant_name
+            """)
+            mapped = cur.rowcount
+
+            if rebuild:
+                cur.execute("""
+                    DELETE FROM budget_app.merchants m
+                    WHERE NOT EXISTS (SELECT 1 FROM budget_app.merchant_aliases a WHERE a.merchant_id = m.id)
+                """)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return {"new_names": len(raw_names), "transactions_mapped": mapped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Map raw merchant names onto canonical merchants")
+    parser.add_argument("--rebuild", action="store_true", help="Discard all aliases and re-normalize every name")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        result = sync_merchants(conn, rebuild=args.rebuild)
+    finally:
+        conn.close()
+    print(f"Normalized {result['new_names']} new merchant names, mapped {result['transactions_mapped']} transactions")
+
+
+if __name__ == "__main__":
+    main()
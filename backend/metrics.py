@@ -0,0 +1,275 @@
+"""
+Request-level performance metrics exposed in Prometheus text format.
+
+MetricsMiddleware starts a RequestStats for every HTTP request and stores it
+in a context variable. Database connections opened through
+InstrumentedConnection add their connect/execute time and fetched rows to it,
+TimedRoute records how long the endpoint itself ran, and the middleware counts
+response bytes. When the response finishes, the request is split into:
+
+    db             time spent connecting to and executing against Postgres
+    processing     endpoint time not spent in the database (pandas, Python)
+    serialization  everything after the endpoint returned (JSON encoding, send)
+"""
+import time
+import threading
+import functools
+import contextvars
+import psycopg2.extensions
+from fastapi.routing import APIRoute
+from slow_queries import record_execution
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestStats:
+    """Mutable per-request counters shared by everything running for one request."""
+
+    __slots__ = ("route", "db_seconds", "endpoint_seconds", "connections", "rows", "response_bytes", "cancelled")
+
+    def __init__(self):
+        self.route = None
+        self.db_seconds = 0.0
+        self.endpoint_seconds = None
+        self.connections = 0
+        self.rows = 0
+        self.response_bytes = 0
+        self.cancelled = False
+
+
+_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_stats():
+    """Return the RequestStats of the request being handled, or None outside a request."""
+    return _request_stats.get()
+
+
+def record_db_time(seconds):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.db_seconds += seconds
+
+
+def record_rows(count):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.rows += count
+
+
+class _InstrumentedCursorMixin:
+    """Times execute() calls, feeds the slow-query log and counts fetched rows."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            result = super().execute(query, vars)
+        finally:
+            elapsed = time.perf_counter() - start
+            record_db_time(elapsed)
+        stats = _request_stats.get()
+        record_execution(self, query, vars, elapsed, stats.route if stats is not None else None)
+        return result
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        record_db_time(time.perf_counter() - start)
+        if row is not None:
+            record_rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(size) if size is not None else super().fetchmany()
+        record_db_time(time.perf_counter() - start)
+        record_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        record_db_time(time.perf_counter() - start)
+        record_rows(len(rows))
+        return rows
+
+
+class InstrumentedCursor(_InstrumentedCursorMixin, psycopg2.extensions.cursor):
+    pass
+
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    """
+    psycopg2 connection_factory that counts connections and instruments cursors.
+
+    Usage: psycopg2.connect(**DB_CONFIG, connection_factory=InstrumentedConnection)
+    """
+
+    def __init__(self, *args, **kwargs):
+        start = time.perf_counter()
+        super().__init__(*args, **kwargs)
+        self.cursor_factory = InstrumentedCursor
+        # What this connection was opened with; the slow-query log EXPLAINs on its own connection
+        self.connect_dsn = args[0] if args else kwargs.get("dsn")
+        # Names PREPAREd in this session (see storage.Statement)
+        self.prepared_statements = set()
+        record_db_time(time.perf_counter() - start)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.connections += 1
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that records the route template and how long the endpoint ran."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        route_path = path
+
+        @functools.wraps(endpoint)
+        async def timed_endpoint(*args, **kw):
+            stats = _request_stats.get()
+            start = time.perf_counter()
+            try:
+                return await endpoint(*args, **kw)
+            finally:
+                if stats is not None:
+                    stats.route = route_path
+                    stats.endpoint_seconds = time.perf_counter() - start
+
+        super().__init__(path, timed_endpoint, **kwargs)
+
+
+class _Histogram:
+    def __init__(self):
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """In-process store for latency histograms and counters, keyed by route."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._requests = {}
+        self._counters = {"db_connections": {}, "db_rows_fetched": {}, "response_bytes": {}}
+        self._collectors = []
+
+    def add_collector(self, collector):
+        """Register a callable returning extra exposition lines for render()."""
+        self._collectors.append(collector)
+
+    def observe_request(self, method, route, status, total_seconds, stats):
+        db = stats.db_seconds
+        endpoint = stats.endpoint_seconds if stats.endpoint_seconds is not None else total_seconds
+        phases = {
+            "total": total_seconds,
+            "db": db,
+            "processing": max(endpoint - db, 0.0),
+            "serialization": max(total_seconds - endpoint, 0.0),
+        }
+        with self._lock:
+            for phase, seconds in phases.items():
+                key = (method, route, phase)
+                if key not in self._histograms:
+                    self._histograms[key] = _Histogram()
+                self._histograms[key].observe(seconds)
+
+            request_key = (method, route, str(status))
+            self._requests[request_key] = self._requests.get(request_key, 0) + 1
+
+            for name, value in (
+                ("db_connections", stats.connections),
+                ("db_rows_fetched", stats.rows),
+                ("response_bytes", stats.response_bytes),
+            ):
+                counter = self._counters[name]
+                counter[(method, route)] = counter.get((method, route), 0) + value
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP budget_api_request_duration_seconds Request latency split by phase.",
+            "# TYPE budget_api_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (method, route, phase), hist in sorted(self._histograms.items()):
+                labels = f'method="{method}",route="{_escape(route)}",phase="{phase}"'
+                for bound, count in zip(LATENCY_BUCKETS, hist.bucket_counts):
+                    lines.append(f'budget_api_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'budget_api_request_duration_seconds_bucket{{{labels},le="+Inf"}} {hist.count}')
+                lines.append(f"budget_api_request_duration_seconds_sum{{{labels}}} {hist.sum:.6f}")
+                lines.append(f"budget_api_request_duration_seconds_count{{{labels}}} {hist.count}")
+
+            lines.append("# HELP budget_api_requests_total Requests handled.")
+            lines.append("# TYPE budget_api_requests_total counter")
+            for (method, route, status), count in sorted(self._requests.items()):
+                lines.append(f'budget_api_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+
+            for name, help_text in (
+                ("db_connections", "Database connections opened."),
+                ("db_rows_fetched", "Rows fetched from the database."),
+                ("response_bytes", "Response body bytes sent."),
+            ):
+                lines.append(f"# HELP budget_api_{name}_total {help_text}")
+                lines.append(f"# TYPE budget_api_{name}_total counter")
+                for (method, route), value in sorted(self._counters[name].items()):
+                    lines.append(f'budget_api_{name}_total{{method="{method}",route="{_escape(route)}"}} {value}')
+
+        for collector in self._collectors:
+            lines.extend(collector())
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware so the request context variable reaches the endpoint."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                stats.response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            registry.observe_request(
+                scope.get("method", ""),
+                stats.route or "unmatched",
+                # Client went away before the response; nginx's "client closed request"
+                499 if stats.cancelled else status,
+                time.perf_counter() - start,
+                stats,
+            )
@@ -0,0 +1,89 @@
+"""
+Apply SQL migrations in backend/migrations/ in filename order.
+
+    python migrate.py            # apply pending migrations
+    python migrate.py --list     # show applied/pending
+
+Each file runs in its own transaction and is recorded in
+budget_app.schema_migrations, so re-running only applies new files.
+"""
+import os
+import argparse
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+DB_CONFIG = {
+    "dbname": os.environ.get("DB_NAME"),
+    "user": os.environ.get("DB_USER"),
+    "password": os.environ.get("DB_PASSWORD"),
+    "host": os.environ.get("DB_HOST"),
+    "port": os.environ.get("DB_PORT"),
+    "options": "-c search_path=budget_app,public"
+}
+
+
+def _migration_files():
+    return sorted(name for name in os.listdir(MIGRATIONS_DIR) if name.endswith(".sql"))
+
+
+def _applied(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS budget_app.schema_migrations (
+                name TEXT PRIMARY KEY,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """)
+        cur.execute("SELECT name FROM budget_app.schema_migrations")
+        applied = {row[0] for row in cur.fetchall()}
+    conn.commit()
+    return applied
+
+
+def apply_migrations(conn, verbose=True):
+    """Apply every pending migration on an open connection. Returns the names applied."""
+    applied = _applied(conn)
+    newly_applied = []
+    for name in _migration_files():
+        if name in applied:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+            sql = f.read()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                cur.execute("INSERT INTO budget_app.schema_migrations (name) VALUES (%s)", (name,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        newly_applied.append(name)
+        if verbose:
+            print(f"Applied {name}")
+    return newly_applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply budget_app SQL migrations")
+    parser.add_argument("--list", action="store_true", help="List migrations and whether they are applied")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        if args.list:
+            applied = _applied(conn)
+            for name in _migration_files():
+                print(f"{'applied' if name in applied else 'pending':8} {name}")
+            return
+        if not apply_migrations(conn):
+            print("No pending migrations")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+-- Catalog of months and persons that have transactions.
+-- Kept current by statement-level triggers on budget_app.transactions, so
+-- /periods and /users read a few hundred rows instead of scanning every transaction.
+
+-- Block writers until the triggers exist and the backfill is done
+LOCK TABLE budget_app.transactions IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE TABLE IF NOT EXISTS budget_app.catalog_months (
+    month DATE PRIMARY KEY,
+    transaction_count BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS budget_app.catalog_persons (
+    person_id INTEGER PRIMARY KEY REFERENCES budget_app.persons (id) ON DELETE CASCADE,
+    transaction_count BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION budget_app.catalog_on_insert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO budget_app.catalog_months (month, transaction_count)
+    SELECT DATE_TRUNC('month', transaction_date)::date, COUNT(*)
+    FROM new_rows
+    GROUP BY 1
+    ON CONFLICT (month) DO UPDATE
+        SET transaction_count = budget_app.catalog_months.transaction_count + EXCLUDED.transaction_count;
+
+    INSERT INTO budget_app.catalog_persons (person_id, transaction_count)
+    SELECT person_id, COUNT(*)
+    FROM new_rows
+    WHERE person_id IS NOT NULL
+    GROUP BY 1
+    ON CONFLICT (person_id) DO UPDATE
+        SET transaction_count = budget_app.catalog_persons.transaction_count + EXCLUDED.transaction_count;
+
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION budget_app.catalog_on_delete() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE budget_app.catalog_months c
+    SET transaction_count = c.transaction_count - d.removed
+    FROM (
+        SELECT DATE_TRUNC('month', transaction_date)::date AS month, COUNT(*) AS removed
+        FROM old_rows
+        GROUP BY 1
+    ) d
+    WHERE c.month = d.month;
+
+    UPDATE budget_app.catalog_persons c
+    SET transaction_count = c.transaction_count - d.removed
+    FROM (
+        SELECT person_id, COUNT(*) AS removed
+        FROM old_rows
+        WHERE person_id IS NOT NULL
+        GROUP BY 1
+    ) d
+    WHERE c.person_id = d.person_id;
+
+    DELETE FROM budget_app.catalog_months WHERE transaction_count <= 0;
+    DELETE FROM budget_app.catalog_persons WHERE transaction_count <= 0;
+
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION budget_app.catalog_on_update() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- Net change per month/person; recategorizations cancel out and write nothing
+    INSERT INTO budget_app.catalog_months (month, transaction_count)
+    SELECT month, SUM(delta)
+    FROM (
+        SELECT DATE_TRUNC('month', transaction_date)::date AS month, 1 AS delta FROM new_rows
+        UNION ALL
+        SELECT DATE_TRUNC('month', transaction_date)::date, -1 FROM old_rows
+    ) changes
+    GROUP BY month
+    HAVING SUM(delta) <> 0
+    ON CONFLICT (month) DO UPDATE
+        SET transaction_count = budget_app.catalog_months.transaction_count + EXCLUDED.transaction_count;
+
+    INSERT INTO budget_app.catalog_persons (person_id, transaction_count)
+    SELECT person_id, SUM(delta)
+    FROM (
+        SELECT person_id, 1 AS delta FROM new_rows WHERE person_id IS NOT NULL
+        UNION ALL
+        SELECT person_id, -1 FROM old_rows WHERE person_id IS NOT NULL
+    ) changes
+    GROUP BY person_id
+    HAVING SUM(delta) <> 0
+    ON CONFLICT (person_id) DO UPDATE
+        SET transaction_count = budget_app.catalog_persons.transaction_count + EXCLUDED.transaction_count;
+
+    DELETE FROM budget_app.catalog_months WHERE transaction_count <= 0;
+    DELETE FROM budget_app.catalog_persons WHERE transaction_count <= 0;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS catalog_insert ON budget_app.transactions;
+CREATE TRIGGER catalog_insert
+    AFTER INSERT ON budget_app.transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION budget_app.catalog_on_insert();
+
+DROP TRIGGER IF EXISTS catalog_delete ON budget_app.transactions;
+CREATE TRIGGER catalog_delete
+    AFTER DELETE ON budget_app.transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION budget_app.catalog_on_delete();
+
+DROP TRIGGER IF EXISTS catalog_update ON budget_app.transactions;
+CREATE TRIGGER catalog_update
+    AFTER UPDATE ON budget_app.transactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION budget_app.catalog_on_update();
+
+-- Backfill from existing transactions
+TRUNCATE budget_app.catalog_months, budget_app.catalog_persons;
+
+INSERT INTO budget_app.catalog_months (month, transaction_count)
+SELECT DATE_TRUNC('month', transaction_date)::date, COUNT(*)
+FROM budget_app.transactions
+GROUP BY 1;
+
+INSERT INTO budget_app.catalog_persons (person_id, transaction_count)
+SELECT person_id, COUNT(*)
+FROM budget_app.transactions
+WHERE person_id IS NOT NULL
+GROUP BY 1;
@@ -0,0 +1,115 @@
+-- Trigram-indexed merchant search.
+-- catalog_merchants holds one row per distinct merchant name, kept current by
+-- statement-level triggers like catalog_months/catalog_persons, so autocomplete
+-- ranks a few thousand names instead of scanning every transaction. Chat merchant
+-- filters resolve names here and then hit the btree index on transactions.
+
+-- Installed into budget_app unless the database already has it elsewhere (often
+-- public); the app's search_path is budget_app,public so its operators resolve
+CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA budget_app;
+
+LOCK TABLE budget_app.transactions IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE TABLE IF NOT EXISTS budget_app.catalog_merchants (
+    merchant_name TEXT PRIMARY KEY,
+    transaction_count BIGINT NOT NULL DEFAULT 0
+);
+
+DO $$
+DECLARE
+    trgm_schema TEXT;
+BEGIN
+    SELECT n.nspname INTO trgm_schema
+    FROM pg_extension e JOIN pg_namespace n ON n.oid = e.extnamespace
+    WHERE e.extname = 'pg_trgm';
+
+    EXECUTE format(
+        'CREATE INDEX IF NOT EXISTS catalog_merchants_name_trgm_idx
+             ON budget_app.catalog_merchants USING GIN (LOWER(merchant_name) %I.gin_trgm_ops)',
+        trgm_schema
+    );
+END;
+$$;
+
+CREATE INDEX IF NOT EXISTS transactions_merchant_name_idx
+    ON budget_app.transactions (merchant_name);
+
+CREATE OR REPLACE FUNCTION budget_app.catalog_merchants_on_insert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO budget_app.catalog_merchants (merchant_name, transaction_count)
+    SELECT merchant_name, COUNT(*)
+    FROM new_rows
+    GROUP BY 1
+    ON CONFLICT (merchant_name) DO UPDATE
+        SET transaction_count = budget_app.catalog_merchants.transaction_count + EXCLUDED.transaction_count;
+
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION budget_app.catalog_merchants_on_delete() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE budget_app.catalog_merchants c
+    SET transaction_count = c.transaction_count - d.removed
+    FROM (
+        SELECT merchant_name, COUNT(*) AS removed
+        FROM old_rows
+        GROUP BY 1
+    ) d
+    WHERE c.merchant_name = d.merchant_name;
+
+    DELETE FROM budget_app.catalog_merchants WHERE transaction_count <= 0;
+
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION budget_app.catalog_merchants_on_update() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- Recategorizations leave merchant names alone and net out to nothing
+    INSERT INTO budget_app.catalog_merchants (merchant_name, transaction_count)
+    SELECT merchant_name, SUM(delta)
+    FROM (
+        SELECT merchant_name, 1 AS delta FROM new_rows
+        UNION ALL
+        SELECT merchant_name, -1 FROM old_rows
+    ) changes
+    GROUP BY merchant_name
+    HAVING SUM(delta) <> 0
+    ON CONFLICT (merchant_name) DO UPDATE
+        SET transaction_count = budget_app.catalog_merchants.transaction_count + EXCLUDED.transaction_count;
+
+    DELETE FROM budget_app.catalog_merchants WHERE transaction_count <= 0;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS catalog_merchants_insert ON budget_app.transactions;
+CREATE TRIGGER catalog_merchants_insert
+    AFTER INSERT ON budget_app.transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION budget_app.catalog_merchants_on_insert();
+
+DROP TRIGGER IF EXISTS catalog_merchants_delete ON budget_app.transactions;
+CREATE TRIGGER catalog_merchants_delete
+    AFTER DELETE ON budget_app.transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION budget_app.catalog_merchants_on_delete();
+
+DROP TRIGGER IF EXISTS catalog_merchants_update ON budget_app.transactions;
+CREATE TRIGGER catalog_merchants_update
+    AFTER UPDATE ON budget_app.transactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION budget_app.catalog_merchants_on_update();
+
+-- Backfill from existing transactions
+TRUNCATE budget_app.catalog_merchants;
+
+INSERT INTO budget_app.catalog_merchants (merchant_name, transaction_count)
+SELECT merchant_name, COUNT(*)
+FROM budget_app.transactions
+GROUP BY 1;
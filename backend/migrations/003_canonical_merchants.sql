@@ -0,0 +1,63 @@
+-- Canonical merchant dimension.
+-- Raw statement names ("SQ *COSTCO WHSE #0123") map through merchant_aliases to
+-- one row in merchants, and transactions carry the integer merchant_id so
+-- merchant group-bys and joins run on integers. merchants.py fills the aliases
+-- for names it has not seen yet; rows for already-known names are mapped on insert.
+-- transactions_view is left as the user defined it; transactions_merchant_view
+-- has the same columns plus merchant_id and the canonical merchant name, joined
+-- on the integer id, for queries that group by merchant.
+
+CREATE TABLE IF NOT EXISTS budget_app.merchants (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS budget_app.merchant_aliases (
+    raw_name TEXT PRIMARY KEY,
+    merchant_id INTEGER NOT NULL REFERENCES budget_app.merchants (id) ON DELETE CASCADE
+);
+
+ALTER TABLE budget_app.transactions
+    ADD COLUMN IF NOT EXISTS merchant_id INTEGER REFERENCES budget_app.merchants (id);
+
+CREATE INDEX IF NOT EXISTS transactions_merchant_id_idx
+    ON budget_app.transactions (merchant_id);
+
+-- Lets merchants.py find unmapped names without scanning mapped rows
+CREATE INDEX IF NOT EXISTS transactions_unmapped_merchant_idx
+    ON budget_app.transactions (merchant_name)
+    WHERE merchant_id IS NULL;
+
+CREATE OR REPLACE FUNCTION budget_app.map_merchant_alias() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- A renamed row must not keep the old name's merchant
+    IF NEW.merchant_id IS NULL OR TG_OP = 'UPDATE' THEN
+        SELECT merchant_id INTO NEW.merchant_id
+        FROM budget_app.merchant_aliases
+        WHERE raw_name = NEW.merchant_name;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS map_merchant_alias ON budget_app.transactions;
+CREATE TRIGGER map_merchant_alias
+    BEFORE INSERT OR UPDATE OF merchant_name ON budget_app.transactions
+    FOR EACH ROW EXECUTE FUNCTION budget_app.map_merchant_alias();
+
+CREATE OR REPLACE VIEW budget_app.transactions_merchant_view AS
+SELECT
+    t.id,
+    t.transaction_date,
+    t.merchant_name,
+    t.amount,
+    p.name AS person,
+    c.category_name AS spending_category,
+    t.account_type,
+    t.merchant_id,
+    COALESCE(m.name, t.merchant_name) AS merchant
+FROM budget_app.transactions t
+LEFT JOIN budget_app.persons p ON p.id = t.person_id
+LEFT JOIN budget_app.spending_categories c ON c.id = t.category_id
+LEFT JOIN budget_app.merchants m ON m.id = t.merchant_id;
@@ -0,0 +1,47 @@
+-- Stable per-transaction hash used by importer.py to skip rows that already exist.
+-- The hash covers date, merchant, amount, person and account type plus an
+-- occurrence number, so two identical coffees on the same day stay two rows
+-- while re-importing the statement that contains them inserts nothing.
+
+CREATE OR REPLACE FUNCTION budget_app.transaction_hash(
+    transaction_date DATE,
+    merchant_name TEXT,
+    amount NUMERIC,
+    person TEXT,
+    account_type TEXT,
+    occurrence BIGINT
+) RETURNS TEXT
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT md5(concat_ws('|',
+        to_char(transaction_date, 'YYYY-MM-DD'),
+        UPPER(TRIM(merchant_name)),
+        ROUND(amount, 2)::text,
+        LOWER(COALESCE(person, '')),
+        LOWER(COALESCE(account_type, '')),
+        occurrence::text
+    ))
+$$;
+
+ALTER TABLE budget_app.transactions
+    ADD COLUMN IF NOT EXISTS import_hash TEXT;
+
+-- Backfill existing rows, numbering identical rows in id order
+UPDATE budget_app.transactions t
+SET import_hash = h.import_hash
+FROM (
+    SELECT t2.id,
+           budget_app.transaction_hash(
+               t2.transaction_date, t2.merchant_name, t2.amount, p.name, t2.account_type,
+               ROW_NUMBER() OVER (
+                   PARTITION BY t2.transaction_date, UPPER(TRIM(t2.merchant_name)), ROUND(t2.amount, 2),
+                                LOWER(COALESCE(p.name, '')), LOWER(COALESCE(t2.account_type, ''))
+                   ORDER BY t2.id
+               )
+           ) AS import_hash
+    FROM budget_app.transactions t2
+    LEFT JOIN budget_app.persons p ON p.id = t2.person_id
+) h
+WHERE t.id = h.id AND t.import_hash IS NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS transactions_import_hash_key
+    ON budget_app.transactions (import_hash);
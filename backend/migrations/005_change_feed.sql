@@ -0,0 +1,137 @@
+-- Change feed for cache invalidation.
+-- Every statement that changes transactions or spending_categories sends one
+-- NOTIFY on budget_app_changes, whoever the writer is (this API, importer.py,
+-- manual SQL). The JSON payload names the affected months, persons and
+-- categories; change_feed.py turns it into data version bumps.
+
+CREATE OR REPLACE FUNCTION budget_app.send_change(payload JSONB) RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- NOTIFY payloads are capped at 8000 bytes; fall back to "everything changed"
+    IF octet_length(payload::text) > 7900 THEN
+        payload := jsonb_build_object('table', payload->'table', 'operation', payload->'operation', 'all', true);
+    END IF;
+    PERFORM pg_notify('budget_app_changes', payload::text);
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION budget_app.transaction_change_payload(
+    operation TEXT,
+    months TEXT[],
+    person_ids INTEGER[],
+    category_ids INTEGER[]
+) RETURNS JSONB
+LANGUAGE sql STABLE AS $$
+    SELECT jsonb_build_object(
+        'table', 'transactions',
+        'operation', operation,
+        'months', to_jsonb(months),
+        'persons', COALESCE((SELECT jsonb_agg(name ORDER BY name) FROM budget_app.persons WHERE id = ANY(person_ids)), '[]'::jsonb),
+        'categories', COALESCE((SELECT jsonb_agg(category_name ORDER BY category_name)
+                                FROM budget_app.spending_categories WHERE id = ANY(category_ids)), '[]'::jsonb)
+    )
+$$;
+
+CREATE OR REPLACE FUNCTION budget_app.notify_transaction_changes() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    months TEXT[];
+    person_ids INTEGER[];
+    category_ids INTEGER[];
+BEGIN
+    -- Transition tables only exist for the operations they were declared for
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT to_char(transaction_date, 'YYYY-MM')), array_agg(DISTINCT person_id),
+               array_agg(DISTINCT category_id)
+        INTO months, person_ids, category_ids
+        FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT to_char(transaction_date, 'YYYY-MM')), array_agg(DISTINCT person_id),
+               array_agg(DISTINCT category_id)
+        INTO months, person_ids, category_ids
+        FROM old_rows;
+    ELSE
+        SELECT array_agg(DISTINCT to_char(transaction_date, 'YYYY-MM')), array_agg(DISTINCT person_id),
+               array_agg(DISTINCT category_id)
+        INTO months, person_ids, category_ids
+        FROM (
+            SELECT transaction_date, person_id, category_id FROM new_rows
+            UNION ALL
+            SELECT transaction_date, person_id, category_id FROM old_rows
+        ) changed;
+    END IF;
+
+    IF months IS NOT NULL THEN
+        PERFORM budget_app.send_change(budget_app.transaction_change_payload(TG_OP, months, person_ids, category_ids));
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION budget_app.notify_category_changes() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    names JSONB;
+    renamed BOOLEAN := false;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT jsonb_agg(DISTINCT category_name) INTO names FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT jsonb_agg(DISTINCT category_name) INTO names FROM old_rows;
+    ELSE
+        SELECT jsonb_agg(DISTINCT category_name) INTO names
+        FROM (SELECT category_name FROM new_rows UNION SELECT category_name FROM old_rows) changed;
+        -- Limit edits leave names alone; only renames change what past months show
+        SELECT EXISTS (
+            SELECT 1 FROM old_rows o JOIN new_rows n ON n.id = o.id
+            WHERE n.category_name IS DISTINCT FROM o.category_name
+        ) INTO renamed;
+    END IF;
+
+    IF names IS NOT NULL THEN
+        PERFORM budget_app.send_change(jsonb_build_object(
+            'table', 'spending_categories',
+            'operation', TG_OP,
+            'categories', names,
+            'renamed', renamed
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS notify_transactions_insert ON budget_app.transactions;
+CREATE TRIGGER notify_transactions_insert
+    AFTER INSERT ON budget_app.transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION budget_app.notify_transaction_changes();
+
+DROP TRIGGER IF EXISTS notify_transactions_update ON budget_app.transactions;
+CREATE TRIGGER notify_transactions_update
+    AFTER UPDATE ON budget_app.transactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION budget_app.notify_transaction_changes();
+
+DROP TRIGGER IF EXISTS notify_transactions_delete ON budget_app.transactions;
+CREATE TRIGGER notify_transactions_delete
+    AFTER DELETE ON budget_app.transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION budget_app.notify_transaction_changes();
+
+DROP TRIGGER IF EXISTS notify_categories_insert ON budget_app.spending_categories;
+CREATE TRIGGER notify_categories_insert
+    AFTER INSERT ON budget_app.spending_categories
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION budget_app.notify_category_changes();
+
+DROP TRIGGER IF EXISTS notify_categories_update ON budget_app.spending_categories;
+CREATE TRIGGER notify_categories_update
+    AFTER UPDATE ON budget_app.spending_categories
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION budget_app.notify_category_changes();
+
+DROP TRIGGER IF EXISTS notify_categories_delete ON budget_app.spending_categories;
+CREATE TRIGGER notify_categories_delete
+    AFTER DELETE ON budget_app.spending_categories
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION budget_app.notify_category_changes();
@@ -0,0 +1,23 @@
+-- Trigram index for merchant filters.
+-- One merchant appears under thousands of raw names (store numbers, processor
+-- prefixes), so chat merchant filters match LOWER(merchant_name) on the
+-- transactions themselves instead of a capped list of names from
+-- catalog_merchants. This index serves both the substring LIKE and the
+-- word-similarity (<%) fallback for misspellings.
+
+-- gin_trgm_ops lives wherever pg_trgm is installed (see 002)
+DO $$
+DECLARE
+    trgm_schema TEXT;
+BEGIN
+    SELECT n.nspname INTO trgm_schema
+    FROM pg_extension e JOIN pg_namespace n ON n.oid = e.extnamespace
+    WHERE e.extname = 'pg_trgm';
+
+    EXECUTE format(
+        'CREATE INDEX IF NOT EXISTS transactions_merchant_name_trgm_idx
+             ON budget_app.transactions USING GIN (LOWER(merchant_name) %I.gin_trgm_ops)',
+        trgm_schema
+    );
+END;
+$$;
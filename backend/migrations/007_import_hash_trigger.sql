@@ -0,0 +1,74 @@
+-- import_hash for every insert, not just importer.py.
+-- Rows added by the ingestion pipeline, manual SQL or any other writer get
+-- their hash here, so importing a statement that overlaps them skips the rows
+-- instead of duplicating them. The occurrence is the lowest number whose hash
+-- is still free, which matches importer.py's numbering of identical rows.
+
+CREATE OR REPLACE FUNCTION budget_app.next_import_hash(
+    transaction_date DATE,
+    merchant_name TEXT,
+    amount NUMERIC,
+    person TEXT,
+    account_type TEXT
+) RETURNS TEXT
+LANGUAGE plpgsql VOLATILE AS $$
+DECLARE
+    occurrence BIGINT := 1;
+    candidate TEXT;
+BEGIN
+    LOOP
+        candidate := budget_app.transaction_hash(
+            transaction_date, merchant_name, amount, person, account_type, occurrence
+        );
+        EXIT WHEN NOT EXISTS (
+            SELECT 1 FROM budget_app.transactions t WHERE t.import_hash = candidate
+        );
+        occurrence := occurrence + 1;
+    END LOOP;
+    RETURN candidate;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION budget_app.set_import_hash() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- importer.py computes its own hashes so ON CONFLICT can skip existing rows
+    IF NEW.import_hash IS NULL THEN
+        NEW.import_hash := budget_app.next_import_hash(
+            NEW.transaction_date,
+            NEW.merchant_name,
+            NEW.amount,
+            (SELECT name FROM budget_app.persons WHERE id = NEW.person_id),
+            NEW.account_type
+        );
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS set_import_hash ON budget_app.transactions;
+CREATE TRIGGER set_import_hash
+    BEFORE INSERT ON budget_app.transactions
+    FOR EACH ROW EXECUTE FUNCTION budget_app.set_import_hash();
+
+-- Backfill rows inserted since 004 without a hash, one statement per row so
+-- each sees the hashes assigned before it
+DO $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT t.id, t.transaction_date, t.merchant_name, t.amount, p.name AS person, t.account_type
+        FROM budget_app.transactions t
+        LEFT JOIN budget_app.persons p ON p.id = t.person_id
+        WHERE t.import_hash IS NULL
+        ORDER BY t.id
+    LOOP
+        UPDATE budget_app.transactions
+        SET import_hash = budget_app.next_import_hash(
+            r.transaction_date, r.merchant_name, r.amount, r.person, r.account_type
+        )
+        WHERE id = r.id;
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,240 @@
+"""
+On-demand profiling of single requests.
+
+An admin can send `X-Profile: 1` (or `?profile=1`) together with a valid
+X-Admin-Token to run just that request under a sampling profiler with
+tracemalloc peak tracking. The response carries X-Profile-Id and
+X-Profile-Peak-Bytes headers, and the full result can be downloaded from
+/admin/profiles/{id}. Requests without the flag only pay for one header lookup.
+
+The sampler walks the stacks of the event loop thread and of the executor
+threads running work for the profiled request every PROFILE_SAMPLE_INTERVAL_MS,
+and aggregates collapsed stacks (the flamegraph.pl / speedscope input format).
+Executor work started through query_control.run_in_executor or single_flight
+goes through sampled(), which adds its thread while it runs, so DB and pandas
+time shows up. Anything else running on the loop at the same time shows up in
+the samples too.
+"""
+import os
+import sys
+import time
+import uuid
+import threading
+import contextvars
+import tracemalloc
+from collections import Counter, OrderedDict
+from datetime import datetime
+from urllib.parse import parse_qs
+
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", "1"))
+PROFILE_MAX_STORED = int(os.environ.get("PROFILE_MAX_STORED", "20"))
+
+_profiles = OrderedDict()
+_profiles_lock = threading.Lock()
+# tracemalloc and the sampler are process-wide, so profile one request at a time
+_active = threading.Lock()
+# The sampler of the request being profiled, inherited by its executor work
+_current_sampler = contextvars.ContextVar("profile_sampler", default=None)
+
+
+class _Sampler(threading.Thread):
+    """Periodically captures the stacks of a set of threads into collapsed-stack counts."""
+
+    def __init__(self, thread_id, interval_seconds):
+        super().__init__(daemon=True)
+        self.interval_seconds = interval_seconds
+        self.counts = Counter()
+        self.samples = 0
+        self._threads = Counter({thread_id: 1})
+        self._threads_lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def add_thread(self, thread_id):
+        with self._threads_lock:
+            self._threads[thread_id] += 1
+
+    def remove_thread(self, thread_id):
+        with self._threads_lock:
+            self._threads[thread_id] -= 1
+            if self._threads[thread_id] <= 0:
+                del self._threads[thread_id]
+
+    def run(self):
+        own_file = __file__
+        while not self._stop_event.wait(self.interval_seconds):
+            with self._threads_lock:
+                thread_ids = list(self._threads)
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    if code.co_filename != own_file:
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    self.counts[";".join(reversed(stack))] += 1
+                    self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def sampled(func, *args):
+    """Run func(*args) on this thread, sampling it while it runs if the calling request is profiled."""
+    sampler = _current_sampler.get()
+    if sampler is None:
+        return func(*args)
+    thread_id = threading.get_ident()
+    sampler.add_thread(thread_id)
+    try:
+        return func(*args)
+    finally:
+        sampler.remove_thread(thread_id)
+
+
+def _top_functions(counts, limit=25):
+    """Self and inclusive sample counts per function."""
+    self_counts = Counter()
+    inclusive_counts = Counter()
+    for stack, count in counts.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] += count
+        for frame in set(frames):
+            inclusive_counts[frame] += count
+    return {
+        "self": [{"function": f, "samples": c} for f, c in self_counts.most_common(limit)],
+        "inclusive": [{"function": f, "samples": c} for f, c in inclusive_counts.most_common(limit)],
+    }
+
+
+def _store(profile):
+    with _profiles_lock:
+        _profiles[profile["id"]] = profile
+        while len(_profiles) > PROFILE_MAX_STORED:
+            _profiles.popitem(last=False)
+
+
+def list_profiles():
+    with _profiles_lock:
+        return [
+            {key: p[key] for key in ("id", "timestamp", "method", "path", "status", "duration_ms", "samples", "peak_memory_bytes")}
+            for p in reversed(_profiles.values())
+        ]
+
+
+def get_profile(profile_id):
+    with _profiles_lock:
+        profile = _profiles.get(profile_id)
+    if profile is None:
+        return None
+    summary = {key: value for key, value in profile.items() if key != "stacks"}
+    summary["top_functions"] = _top_functions(profile["stacks"])
+    return summary
+
+
+def get_collapsed_stacks(profile_id):
+    """Return the profile in collapsed-stack text format, or None if unknown."""
+    with _profiles_lock:
+        profile = _profiles.get(profile_id)
+    if profile is None:
+        return None
+    return "\n".join(f"{stack} {count}" for stack, count in profile["stacks"].items()) + "\n"
+
+
+def _wants_profile(scope):
+    for name, value in scope.get("headers", []):
+        if name == b"x-profile" and value in (b"1", b"true"):
+            return True
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return any(value in ("1", "true") for value in query.get("profile", []))
+
+
+def _header(scope, header_name):
+    for name, value in scope.get("headers", []):
+        if name == header_name:
+            return value.decode("latin-1")
+    return None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware; `authorize` decides whether an admin token is valid."""
+
+    def __init__(self, app, authorize):
+        self.app = app
+        self.authorize = authorize
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not self.authorize(_header(scope, b"x-admin-token")):
+            await self.app(scope, receive, _with_headers(send, [(b"x-profile-status", b"unauthorized")]))
+            return
+
+        if not _active.acquire(blocking=False):
+            await self.app(scope, receive, _with_headers(send, [(b"x-profile-status", b"busy")]))
+            return
+
+        profile_id = uuid.uuid4().hex[:12]
+        sampler = _Sampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL_MS / 1000)
+        profile = {
+            "id": profile_id,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "method": scope.get("method"),
+            "path": scope.get("path"),
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "status": None,
+        }
+        finished = False
+
+        def finish():
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            sampler.stop()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            profile["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            profile["peak_memory_bytes"] = peak
+            profile["samples"] = sampler.samples
+            profile["sample_interval_ms"] = PROFILE_SAMPLE_INTERVAL_MS
+            profile["stacks"] = dict(sampler.counts)
+            _store(profile)
+            _active.release()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # The body is fully rendered by now; stop before the bytes go out
+                finish()
+                profile["status"] = message["status"]
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", [])) + [
+                        (b"x-profile-id", profile_id.encode()),
+                        (b"x-profile-peak-bytes", str(profile["peak_memory_bytes"]).encode()),
+                    ],
+                }
+            await send(message)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        sampler.start()
+        token = _current_sampler.set(sampler)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_sampler.reset(token)
+            finish()
+
+
+def _with_headers(send, extra_headers):
+    async def send_wrapper(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": list(message.get("headers", [])) + extra_headers}
+        await send(message)
+    return send_wrapper
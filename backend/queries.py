@@ -1,173 +1,423 @@
-import os
-import psycopg2
-import psycopg2.extras
-from dotenv import load_dotenv
-
-load_dotenv()
-
-DB_CONFIG = {
-    "dbname": os.environ.get("DB_NAME"),
-    "user": os.environ.get("DB_USER"),
-    "password": os.environ.get("DB_PASSWORD"),
-    "host": os.environ.get("DB_HOST"),
-    "port": os.environ.get("DB_PORT"),
-    "options": "-c search_path=budget_app"
-}
+import re
+import calendar
+from datetime import date, timedelta
+from storage import (
+    EXCLUDED_CATEGORIES,
+    connection,
+    read_target,
+    execute,
+    Statement,
+    transaction_filter,
+    transaction_conditions,
+    transaction_params,
+    filters_user,
+    spans_year,
+    period_range,
+    dialect
+)
+import analytics
+
+
+def _period_filter(params, period, month=None, year=None, user=None):
+    """Period and user conditions for chat tools; user names match by substring."""
+    return transaction_filter(params, period, month, year, user, partial_user=True)
+
+
+def _period_statements(name, template):
+    """
+    Statements for a query with a {where} period filter, keyed by (yearly, filters a user).
 
-EXCLUDED_CATEGORIES = "('Installment','Payments','Refunds & Returns')"
+    Use with _period_statement(); user names match by substring as in _period_filter.
+    Only the monthly shapes are prepared (see Statement).
+    """
+    return {
+        (yearly, by_user): Statement(
+            name + ("_year" if yearly else "") + ("_user" if by_user else ""),
+            template.format(where=transaction_conditions(by_user, partial_user=True)),
+            prepare=not yearly
+        )
+        for yearly in (False, True)
+        for by_user in (False, True)
+    }
 
 
-def _build_period_filter(params, period, month=None, year=None, user=None):
-    """Build SQL WHERE conditions for time period and user filtering."""
-    conditions = [f"spending_category NOT IN {EXCLUDED_CATEGORIES}"]
+def _period_statement(statements, period, month=None, year=None, user=None):
+    """The statement from _period_statements() for these filters, and its params."""
+    params = transaction_params(period, month, year, user, partial_user=True)
+    return statements[(spans_year(period, year), filters_user(user))], params
 
-    if period == "monthly" and month:
-        conditions.append("transaction_date >= %s::date AND transaction_date < (%s::date + INTERVAL '1 month')")
-        params.extend([f"{month}-01", f"{month}-01"])
-    elif period == "yearly" and year:
-        conditions.append("EXTRACT(YEAR FROM transaction_date) = %s")
-        params.append(year)
-    else:
-        from datetime import datetime
-        now = datetime.now()
-        conditions.append("EXTRACT(YEAR FROM transaction_date) = %s AND EXTRACT(MONTH FROM transaction_date) = %s")
-        params.extend([now.year, now.month])
 
-    if user and user.lower() != "all":
-        conditions.append("LOWER(person) LIKE %s")
-        params.append(f"%{user.lower()}%")
+def _period_bounds(period, month=None, year=None):
+    """[start, end) dates matching _period_filter, or None for the open current month."""
+    if (period == "monthly" and month) or (period == "yearly" and year):
+        return period_range(period, month, year)
+    return None
 
-    return " AND ".join(conditions)
 
+def _run_query(query, params, bounds=None):
+    """
+    Execute a SQL query and return results as list of dicts.
 
-def _run_query(query, params):
-    """Execute a SQL query and return results as list of dicts."""
-    conn = None
+    query: SQL text or a Statement.
+    bounds: (start, end) dates covering every row the query reads; lets
+    transactions_view aggregates over closed months run on analytics snapshots.
+    """
+    if bounds is not None:
+        sql = query.sql if isinstance(query, Statement) else query
+        rows = analytics.query_records(sql, params, *bounds)
+        if rows is not None:
+            return rows
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute(query, params)
-            rows = cur.fetchall()
-        return [dict(row) for row in rows]
+        with connection(read_target()) as conn:
+            with conn.cursor() as cur:
+                execute(cur, query, params)
+                columns = [col[0] for col in cur.description]
+                rows = cur.fetchall()
+        return [dict(zip(columns, row)) for row in rows]
     except Exception as e:
         return {"error": str(e)}
-    finally:
-        if conn:
-            conn.close()
 
 
-def handle_get_spending_by_category(args):
-    params = []
-    where = _build_period_filter(params, args.get("period", "monthly"), args.get("month"), args.get("year"), args.get("user"))
-    query = f"""
+def _escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_merchants(term, limit=10):
+    """
+    Ranked merchant name autocomplete over the trigram-indexed catalog_merchants.
+
+    Substring matches rank first (prefixes before infixes), then trigram word
+    similarity picks up typos like 'costko'. Both predicates are served by the
+    GIN index, so this stays fast regardless of how many transactions exist.
+    The SQLite engine has no trigram support and only finds substring matches.
+    """
+    term = (term or "").strip().lower()
+    if not term:
+        return []
+    escaped = _escape_like(term)
+    if not dialect.fuzzy_search:
+        return _search_merchants_substring(escaped, limit)
+    query = """
+        SELECT merchant_name AS merchant,
+               transaction_count,
+               LOWER(merchant_name) LIKE %s AS substring_match,
+               word_similarity(%s, LOWER(merchant_name)) AS score
+        FROM budget_app.catalog_merchants
+        WHERE LOWER(merchant_name) LIKE %s OR %s <%% LOWER(merchant_name)
+        ORDER BY substring_match DESC, LOWER(merchant_name) LIKE %s DESC, score DESC, transaction_count DESC
+        LIMIT %s
+    """
+    pattern = f"%{escaped}%"
+    results = _run_query(query, [pattern, term, pattern, term, f"{escaped}%", limit])
+    if isinstance(results, dict) and "error" in results:
+        return results
+
+    for row in results:
+        row["score"] = round(float(row["score"]), 3)
+    return results
+
+
+def _search_merchants_substring(escaped, limit):
+    query = """
+        SELECT merchant_name AS merchant,
+               transaction_count,
+               LOWER(merchant_name) LIKE %s ESCAPE '\\' AS prefix_match
+        FROM budget_app.catalog_merchants
+        WHERE LOWER(merchant_name) LIKE %s ESCAPE '\\'
+        ORDER BY prefix_match DESC, transaction_count DESC
+        LIMIT %s
+    """
+    results = _run_query(query, [f"{escaped}%", f"%{escaped}%", limit])
+    if isinstance(results, dict) and "error" in results:
+        return results
+
+    for row in results:
+        del row["prefix_match"]
+        row["substring_match"] = True
+        row["score"] = 1.0
+    return results
+
+
+def _merchant_condition(params, search):
+    """
+    SQL condition restricting transactions to merchants whose name contains `search`.
+
+    Matches every raw name variant through the trigram index on transactions.
+    When no merchant name contains the term, names similar to it match instead,
+    so misspelled merchants still find their transactions.
+    """
+    term = (search or "").strip().lower()
+    pattern = f"%{_escape_like(term)}%"
+    if dialect.fuzzy_search and not _merchant_substring_exists(pattern):
+        params.append(term)
+        return "%s <%% LOWER(merchant_name)"
+    params.append(pattern)
+    return "LOWER(merchant_name) LIKE %s ESCAPE '\\'"
+
+
+def _merchant_substring_exists(pattern):
+    query = """
+        SELECT EXISTS (
+            SELECT 1 FROM budget_app.catalog_merchants WHERE LOWER(merchant_name) LIKE %s ESCAPE '\\'
+        ) AS found
+    """
+    results = _run_query(query, [pattern])
+    if isinstance(results, dict):
+        # catalog_merchants not migrated yet: substring matching only
+        return True
+    return results[0]["found"]
+
+
+_spending_by_category = _period_statements("spending_by_category", f"""
         SELECT spending_category AS category,
-               ROUND(SUM(amount)::numeric, 2) AS total,
+               {dialect.round("SUM(amount)", 2)} AS total,
                COUNT(*) AS transaction_count
         FROM budget_app.transactions_view
-        WHERE {where}
+        WHERE {{where}}
         GROUP BY spending_category
         ORDER BY total DESC
-    """
-    return _run_query(query, params)
+    """)
+
+
+def handle_get_spending_by_category(args):
+    statement, params = _period_statement(
+        _spending_by_category, args.get("period", "monthly"), args.get("month"), args.get("year"), args.get("user")
+    )
+    return _run_query(statement, params, _period_bounds(args.get("period", "monthly"), args.get("month"), args.get("year")))
 
 
 def handle_get_merchant_spending(args):
     params = []
-    where = _build_period_filter(params, args.get("period", "monthly"), args.get("month"), args.get("year"), args.get("user"))
+    where = _period_filter(params, args.get("period", "monthly"), args.get("month"), args.get("year"), args.get("user"))
 
     search = args.get("merchant_search")
     if search:
-        where += " AND LOWER(merchant_name) LIKE %s"
-        params.append(f"%{search.lower()}%")
+        where += " AND " + _merchant_condition(params, search)
 
+    groups, params = _merchant_groups(
+        ["SUM(amount) AS total", "COUNT(*) AS transaction_count"], [], where, params
+    )
     query = f"""
-        SELECT merchant_name AS merchant,
-               ROUND(SUM(amount)::numeric, 2) AS total,
-               COUNT(*) AS transaction_count
-        FROM budget_app.transactions_view
-        WHERE {where}
-        GROUP BY merchant_name
+        SELECT COALESCE(m.name, s.merchant_name) AS merchant,
+               {dialect.round("s.total", 2)} AS total,
+               s.transaction_count
+        FROM ({groups}) s
+        LEFT JOIN budget_app.merchants m ON m.id = s.merchant_id
         ORDER BY total DESC
     """
     return _run_query(query, params)
 
 
-def handle_get_category_budget_status(args):
-    params = []
-    where = _build_period_filter(params, args.get("period", "monthly"), args.get("month"), args.get("year"), args.get("user"))
-    query = f"""
-        SELECT t.spending_category AS category,
-               ROUND(SUM(t.amount)::numeric, 2) AS spent,
+def budget_period_span(period, month=None, year=None, today=None):
+    """
+    Describe the period a budget covers, matching _period_filter's defaults.
+
+    Returns (months_in_range, elapsed_fraction) where elapsed_fraction is the share
+    of the period already past (1.0 for closed periods). A year always spans 12
+    months, so the effective limit covers the same period the projection does.
+    """
+    today = today or date.today()
+    if period == "yearly" and year:
+        year = int(year)
+        if year < today.year:
+            return 12, 1.0
+        if year > today.year:
+            return 12, 0.0
+        days_in_year = 366 if calendar.isleap(year) else 365
+        return 12, today.timetuple().tm_yday / days_in_year
+
+    if period == "monthly" and month:
+        year_val, month_val = int(month[:4]), int(month[5:7])
+    else:
+        year_val, month_val = today.year, today.month
+
+    if (year_val, month_val) < (today.year, today.month):
+        return 1, 1.0
+    if (year_val, month_val) > (today.year, today.month):
+        return 1, 0.0
+    return 1, today.day / calendar.monthrange(year_val, month_val)[1]
+
+
+_budget_status = _period_statements("budget_status", f"""
+        SELECT COALESCE(sc.category_name, t.spending_category) AS category,
+               {dialect.round("COALESCE(t.spent, 0)", 2)} AS spent,
+               COALESCE(t.transaction_count, 0) AS transaction_count,
                sc.spending_limit AS budget_limit
-        FROM budget_app.transactions_view t
-        LEFT JOIN budget_app.spending_categories sc
-            ON LOWER(sc.category_name) = LOWER(t.spending_category)
-        WHERE {where}
-        GROUP BY t.spending_category, sc.spending_limit
-        ORDER BY spent DESC
+        FROM (
+            SELECT category_name, spending_limit
+            FROM budget_app.spending_categories
+            WHERE category_name NOT IN {EXCLUDED_CATEGORIES}
+        ) sc
+        FULL OUTER JOIN (
+            SELECT spending_category, SUM(amount) AS spent, COUNT(*) AS transaction_count
+            FROM budget_app.transactions_view
+            WHERE {{where}}
+            GROUP BY spending_category
+        ) t ON LOWER(sc.category_name) = LOWER(t.spending_category)
+        ORDER BY spent DESC, category
+    """)
+
+
+def get_budget_status(period="monthly", month=None, year=None, user=None):
     """
-    results = _run_query(query, params)
+    Spent vs. limit for every category in one query, shared by /budget-status and the chat tool.
+
+    The effective limit is the monthly limit times the months in range. The pace
+    projection extrapolates spending to the end of the period at the rate observed
+    so far, and is compared with the effective limit for that whole period.
+    """
+    statement, params = _period_statement(_budget_status, period, month, year, user)
+    results = _run_query(statement, params)
     if isinstance(results, dict) and "error" in results:
         return results
 
+    months_in_range, elapsed_fraction = budget_period_span(period, month, year)
+
     for row in results:
-        limit = row.get("budget_limit")
-        spent = row.get("spent", 0)
-        if limit and float(limit) > 0:
-            row["remaining"] = round(float(limit) - float(spent), 2)
-            row["percent_used"] = round(float(spent) / float(limit) * 100, 1)
-            row["status"] = "over" if float(spent) > float(limit) else "under"
+        limit = float(row["budget_limit"]) if row.get("budget_limit") is not None else None
+        spent = float(row.get("spent") or 0)
+        projected = round(spent / elapsed_fraction, 2) if elapsed_fraction > 0 else spent
+
+        row["spent"] = spent
+        row["budget_limit"] = limit if limit else None
+        row["months_in_range"] = months_in_range
+        row["projected_spend"] = projected
+
+        if limit and limit > 0:
+            effective = limit * months_in_range
+            row["effective_limit"] = round(effective, 2)
+            row["remaining"] = round(effective - spent, 2)
+            row["percent_used"] = round(spent / effective * 100, 1)
+            row["projected_percent"] = round(projected / effective * 100, 1)
+            if spent > effective:
+                row["status"] = "over"
+            elif projected > effective:
+                row["status"] = "projected_over"
+            else:
+                row["status"] = "under"
         else:
+            row["effective_limit"] = None
             row["remaining"] = None
             row["percent_used"] = None
+            row["projected_percent"] = None
             row["status"] = "no_limit"
-        # Convert Decimal to float for JSON serialization
-        row["budget_limit"] = float(limit) if limit else None
-        row["spent"] = float(spent)
 
-    return results
+    return {
+        "months_in_range": months_in_range,
+        "elapsed_fraction": round(elapsed_fraction, 4),
+        "categories": results
+    }
 
 
-def handle_get_spending_comparison(args):
-    def _get_month_totals(month, user=None):
-        params = []
-        where = _build_period_filter(params, "monthly", month=month, user=user)
-        query = f"""
-            SELECT spending_category AS category,
-                   ROUND(SUM(amount)::numeric, 2) AS total
-            FROM budget_app.transactions_view
-            WHERE {where}
-            GROUP BY spending_category
-            ORDER BY total DESC
-        """
-        return _run_query(query, params)
+def handle_get_category_budget_status(args):
+    return get_budget_status(args.get("period", "monthly"), args.get("month"), args.get("year"), args.get("user"))
 
-    month_a = args["month_a"]
-    month_b = args["month_b"]
-    user = args.get("user")
 
-    data_a = _get_month_totals(month_a, user)
-    data_b = _get_month_totals(month_b, user)
+def _comparison_bounds(period):
+    """Return the [start, end) date range for a 'YYYY-MM' or 'YYYY' period string."""
+    period = str(period).strip()
+    if re.fullmatch(r"\d{4}-\d{2}", period):
+        year, month = int(period[:4]), int(period[5:])
+        if not 1 <= month <= 12:
+            return None
+        end = f"{year + 1}-01-01" if month == 12 else f"{year}-{month + 1:02d}-01"
+        return f"{period}-01", end
+    if re.fullmatch(r"\d{4}", period):
+        return f"{period}-01-01", f"{int(period) + 1}-01-01"
+    return None
+
 
-    if isinstance(data_a, dict) and "error" in data_a:
-        return data_a
-    if isinstance(data_b, dict) and "error" in data_b:
-        return data_b
+def _percent_change(current, previous):
+    return round((current - previous) / previous * 100, 1) if previous else None
 
-    total_a = sum(float(r["total"]) for r in data_a)
-    total_b = sum(float(r["total"]) for r in data_b)
+
+def handle_get_spending_comparison(args):
+    periods = [str(p).strip() for p in args.get("periods") or []]
+    if len(periods) < 2:
+        return {"error": "Provide at least two periods to compare"}
+
+    bounds = []
+    for period in periods:
+        period_bounds = _comparison_bounds(period)
+        if not period_bounds:
+            return {"error": f"Invalid period '{period}', expected YYYY-MM or YYYY"}
+        bounds.append(period_bounds)
+
+    # One pass over the union of all periods; each period becomes a filtered aggregate column
+    columns = []
+    ranges = []
+    column_params = []
+    range_params = []
+    for i, (start, end) in enumerate(bounds):
+        in_period = f"transaction_date >= {dialect.date('%s')} AND transaction_date < {dialect.date('%s')}"
+        columns.append(f"{dialect.round(f'COALESCE(SUM(amount) FILTER (WHERE {in_period}), 0)', 2)} AS p{i}")
+        column_params.extend([start, end])
+        ranges.append(f"({in_period})")
+        range_params.extend([start, end])
+
+    conditions = [f"spending_category NOT IN {EXCLUDED_CATEGORIES}", "(" + " OR ".join(ranges) + ")"]
+    params = column_params + range_params
+
+    user = args.get("user")
+    if user and user.lower() != "all":
+        conditions.append("LOWER(person) LIKE %s")
+        params.append(f"%{user.lower()}%")
+
+    period_columns = ",\n               ".join(columns)
+    query = f"""
+        SELECT spending_category AS category,
+               {period_columns}
+        FROM budget_app.transactions_view
+        WHERE {" AND ".join(conditions)}
+        GROUP BY spending_category
+    """
+    span = (date.fromisoformat(min(start for start, _ in bounds)), date.fromisoformat(max(end for _, end in bounds)))
+    rows = _run_query(query, params, span)
+    if isinstance(rows, dict) and "error" in rows:
+        return rows
+
+    categories = []
+    totals = [0.0] * len(periods)
+    for row in rows:
+        values = [float(row[f"p{i}"]) for i in range(len(periods))]
+        changes = []
+        for i in range(1, len(periods)):
+            changes.append({
+                "from": periods[i - 1],
+                "to": periods[i],
+                "difference": round(values[i] - values[i - 1], 2),
+                "percent_change": _percent_change(values[i], values[i - 1])
+            })
+        for i, value in enumerate(values):
+            totals[i] += value
+        categories.append({
+            "category": row["category"],
+            "totals": dict(zip(periods, values)),
+            "changes": changes
+        })
+
+    # Largest movers between the last two periods first
+    categories.sort(key=lambda c: abs(c["changes"][-1]["difference"]), reverse=True)
+
+    total_changes = []
+    for i in range(1, len(periods)):
+        total_changes.append({
+            "from": periods[i - 1],
+            "to": periods[i],
+            "difference": round(totals[i] - totals[i - 1], 2),
+            "percent_change": _percent_change(totals[i], totals[i - 1])
+        })
 
     return {
-        "month_a": {"month": month_a, "total": round(total_a, 2), "categories": data_a},
-        "month_b": {"month": month_b, "total": round(total_b, 2), "categories": data_b},
-        "difference": round(total_a - total_b, 2),
-        "percent_change": round((total_a - total_b) / total_b * 100, 1) if total_b else None
+        "periods": [{"period": p, "total": round(t, 2)} for p, t in zip(periods, totals)],
+        "changes": total_changes,
+        "categories": categories
     }
 
 
 def handle_get_spending_by_person(args):
     params = []
-    where = _build_period_filter(params, args.get("period", "monthly"), args.get("month"), args.get("year"))
+    where = _period_filter(params, args.get("period", "monthly"), args.get("month"), args.get("year"))
 
     category = args.get("category")
     if category:
@@ -176,19 +426,19 @@ def handle_get_spending_by_person(args):
 
     query = f"""
         SELECT person,
-               ROUND(SUM(amount)::numeric, 2) AS total,
+               {dialect.round("SUM(amount)", 2)} AS total,
                COUNT(*) AS transaction_count
         FROM budget_app.transactions_view
         WHERE {where}
         GROUP BY person
         ORDER BY total DESC
     """
-    return _run_query(query, params)
+    return _run_query(query, params, _period_bounds(args.get("period", "monthly"), args.get("month"), args.get("year")))
 
 
 def handle_get_recent_transactions(args):
     params = []
-    where = _build_period_filter(params, args.get("period", "monthly"), args.get("month"), args.get("year"), args.get("user"))
+    where = _period_filter(params, args.get("period", "monthly"), args.get("month"), args.get("year"), args.get("user"))
 
     category = args.get("category")
     if category:
@@ -197,8 +447,7 @@ def handle_get_recent_transactions(args):
 
     search = args.get("merchant_search")
     if search:
-        where += " AND LOWER(merchant_name) LIKE %s"
-        params.append(f"%{search.lower()}%")
+        where += " AND " + _merchant_condition(params, search)
 
 
     query = f"""
@@ -223,14 +472,208 @@ def handle_lookup_users(args):
     search = args.get("search", "")
     params = [f"%{search.lower()}%"]
     query = """
-        SELECT DISTINCT person
-        FROM budget_app.transactions_view
-        WHERE LOWER(person) LIKE %s
-        ORDER BY person
+        SELECT p.name AS person
+        FROM budget_app.catalog_persons c
+        JOIN budget_app.persons p ON p.id = c.person_id
+        WHERE c.transaction_count > 0 AND LOWER(p.name) LIKE %s
+        ORDER BY p.name
     """
     return _run_query(query, params)
 
 
+# Declarative aggregation planner behind the query_spending tool.
+# Every identifier comes from these whitelists; user values are always bound as params.
+SPENDING_DIMENSIONS = {
+    "category": "spending_category",
+    # Canonical name; grouped through _merchant_groups() on the integer merchant_id
+    "merchant": "merchant",
+    "person": "person",
+    "account_type": "account_type",
+    "day": dialect.date("transaction_date"),
+    "month": dialect.month_label("transaction_date"),
+    "year": dialect.year("transaction_date"),
+}
+
+SPENDING_METRICS = {
+    "total": dialect.round("SUM(amount)", 2),
+    "count": "COUNT(*)",
+    "average": dialect.round("AVG(amount)", 2),
+    "min": dialect.round("MIN(amount)", 2),
+    "max": dialect.round("MAX(amount)", 2),
+}
+
+TIME_DIMENSIONS = ("day", "month", "year")
+MAX_QUERY_ROWS = 200
+
+
+def _merchant_groups(columns, group, where, where_params):
+    """
+    Per-merchant aggregates over transactions_merchant_view, grouped on the integer merchant_id.
+
+    columns are "expr AS alias" select items and group the other GROUP BY
+    expressions. Rows merchants.py has not mapped yet are grouped by raw name in
+    a second branch that only reads unmapped rows. Returns (subquery, params):
+    the subquery has merchant_id, merchant_name (set for unmapped rows only) and
+    the column aliases; join budget_app.merchants on merchant_id for names.
+    """
+    select = ", ".join(columns)
+    other_groups = "".join(", " + expr for expr in group)
+    query = f"""
+            SELECT merchant_id, NULL AS merchant_name, {select}
+            FROM budget_app.transactions_merchant_view
+            WHERE {where} AND merchant_id IS NOT NULL
+            GROUP BY merchant_id{other_groups}
+            UNION ALL
+            SELECT NULL, merchant_name, {select}
+            FROM budget_app.transactions_merchant_view
+            WHERE {where} AND merchant_id IS NULL
+            GROUP BY merchant_name{other_groups}
+        """
+    return query, where_params + where_params
+
+
+def _plan_spending_query(args):
+    """
+    Compile a query_spending request into one parameterized SQL statement.
+
+    Returns (query, params) or raises ValueError for an invalid request.
+    """
+    group_by = args.get("group_by") or []
+    metrics = args.get("metrics") or ["total", "count"]
+
+    for dim in group_by:
+        if dim not in SPENDING_DIMENSIONS:
+            raise ValueError(f"Unknown group_by dimension '{dim}'")
+    for metric in metrics:
+        if metric not in SPENDING_METRICS:
+            raise ValueError(f"Unknown metric '{metric}'")
+    if len(set(group_by)) != len(group_by) or len(set(metrics)) != len(metrics):
+        raise ValueError("group_by and metrics must not contain duplicates")
+
+    params = []
+    start_date, end_date = args.get("start_date"), args.get("end_date")
+    if start_date or end_date:
+        conditions = [f"spending_category NOT IN {EXCLUDED_CATEGORIES}"]
+        if start_date:
+            conditions.append(f"transaction_date >= {dialect.date('%s')}")
+            params.append(start_date)
+        if end_date:
+            conditions.append(f"transaction_date <= {dialect.date('%s')}")
+            params.append(end_date)
+        user = args.get("user")
+        if user and user.lower() != "all":
+            conditions.append("LOWER(person) LIKE %s")
+            params.append(f"%{user.lower()}%")
+        where = " AND ".join(conditions)
+    else:
+        where = _period_filter(params, args.get("period", "monthly"), args.get("month"), args.get("year"), args.get("user"))
+
+    categories = args.get("categories")
+    if categories:
+        where += " AND " + dialect.in_list("LOWER(spending_category)", params, [c.lower() for c in categories])
+
+    search = args.get("merchant_search")
+    if search:
+        where += " AND " + _merchant_condition(params, search)
+
+    account_type = args.get("account_type")
+    if account_type:
+        where += " AND LOWER(account_type) = %s"
+        params.append(account_type.lower())
+
+    if args.get("min_amount") is not None:
+        where += " AND amount >= %s"
+        params.append(float(args["min_amount"]))
+    if args.get("max_amount") is not None:
+        where += " AND amount <= %s"
+        params.append(float(args["max_amount"]))
+
+    select = [f"{SPENDING_DIMENSIONS[dim]} AS {dim}" for dim in group_by]
+    select += [f"{SPENDING_METRICS[metric]} AS {metric}" for metric in metrics]
+
+    sort = args.get("sort") or {}
+    sort_by = sort.get("by")
+    direction = "ASC" if str(sort.get("direction", "desc")).lower() == "asc" else "DESC"
+    if sort_by:
+        if sort_by not in group_by and sort_by not in metrics:
+            raise ValueError(f"Cannot sort by '{sort_by}': it must be a group_by dimension or metric")
+        order_by = f"{sort_by} {direction} NULLS LAST"
+    else:
+        time_dims = [dim for dim in group_by if dim in TIME_DIMENSIONS]
+        order_by = f"{time_dims[0]} ASC" if time_dims else f"{metrics[0]} DESC NULLS LAST"
+
+    limit = args.get("top_n")
+    limit = min(int(limit), MAX_QUERY_ROWS) if limit else MAX_QUERY_ROWS
+
+    if "merchant" in group_by:
+        others = [dim for dim in group_by if dim != "merchant"]
+        groups, params = _merchant_groups(
+            [f"{SPENDING_DIMENSIONS[dim]} AS {dim}" for dim in others]
+            + [f"{SPENDING_METRICS[metric]} AS {metric}" for metric in metrics],
+            [SPENDING_DIMENSIONS[dim] for dim in others],
+            where,
+            params
+        )
+        columns = ["COALESCE(m.name, s.merchant_name) AS merchant" if dim == "merchant" else f"s.{dim}"
+                   for dim in group_by]
+        columns += [f"s.{metric}" for metric in metrics]
+        query = f"""
+        SELECT {", ".join(columns)}
+        FROM ({groups}) s
+        LEFT JOIN budget_app.merchants m ON m.id = s.merchant_id
+        ORDER BY {order_by}
+        LIMIT %s"""
+        params.append(limit)
+        return query, params
+
+    query = f"""
+        SELECT {", ".join(select)}
+        FROM budget_app.transactions_view
+        WHERE {where}
+    """
+    if group_by:
+        query += f"    GROUP BY {', '.join(SPENDING_DIMENSIONS[dim] for dim in group_by)}\n"
+        query += f"        ORDER BY {order_by}\n"
+    query += "        LIMIT %s"
+    params.append(limit)
+
+    return query, params
+
+
+def _spending_query_bounds(args):
+    """Date range a query_spending request covers (see _plan_spending_query)."""
+    start_date, end_date = args.get("start_date"), args.get("end_date")
+    if start_date or end_date:
+        try:
+            return (
+                date.fromisoformat(start_date) if start_date else None,
+                date.fromisoformat(end_date) + timedelta(days=1) if end_date else None
+            )
+        except ValueError:
+            return None
+    return _period_bounds(args.get("period", "monthly"), args.get("month"), args.get("year"))
+
+
+def handle_query_spending(args):
+    try:
+        query, params = _plan_spending_query(args)
+    except (ValueError, TypeError) as e:
+        return {"error": str(e)}
+
+    results = _run_query(query, params, _spending_query_bounds(args))
+    if isinstance(results, dict) and "error" in results:
+        return results
+
+    for row in results:
+        for metric in ("total", "average", "min", "max"):
+            if row.get(metric) is not None:
+                row[metric] = float(row[metric])
+        if row.get("day") is not None:
+            row["day"] = str(row["day"])
+
+    return results
+
+
 TOOL_HANDLERS = {
     "get_spending_by_category": handle_get_spending_by_category,
     "get_merchant_spending": handle_get_merchant_spending,
@@ -239,4 +682,5 @@ TOOL_HANDLERS = {
     "get_spending_by_person": handle_get_spending_by_person,
     "get_recent_transactions": handle_get_recent_transactions,
     "lookup_users": handle_lookup_users,
+    "query_spending": handle_query_spending,
 }
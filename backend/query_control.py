@@ -0,0 +1,219 @@
+"""
+Bounds on how long and how much database work a request can hold.
+
+  - Statement timeouts: every pooled connection starts with
+    DB_STATEMENT_TIMEOUT_MS (see db_pool.py). Endpoints that need a different
+    bound use @with_statement_timeout(ms); connections borrowed while it is
+    active get SET LOCAL statement_timeout, which ends with their transaction.
+  - Disconnect cancellation: CancelOnDisconnectMiddleware gives each request a
+    QueryScope. Connections borrowed for the request register with it, and
+    when the client goes away the endpoint is cancelled and pg_cancel is sent
+    for every query still running on its behalf (including ones running in
+    executor threads, which inherit the request context).
+  - Concurrency limits: ConcurrencyLimiter runs blocking work in the executor
+    with at most `limit` calls at once and `max_waiting` queued, rejecting the
+    rest with LimiterBusy, so /chat load cannot take every thread and pooled
+    connection away from the dashboard.
+"""
+import os
+import asyncio
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+import profiling
+from metrics import current_stats
+
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+_statement_timeout = contextvars.ContextVar("statement_timeout", default=None)
+_query_scope = contextvars.ContextVar("query_scope", default=None)
+
+
+class QueryScope:
+    """Connections doing work for one caller, so that work can be cancelled together."""
+
+    def __init__(self):
+        self.cancelled = False
+        self._connections = set()
+        self._lock = threading.Lock()
+
+    def register(self, conn):
+        with self._lock:
+            self._connections.add(conn)
+            cancelled = self.cancelled
+        if cancelled:
+            conn.cancel()
+
+    def unregister(self, conn):
+        with self._lock:
+            self._connections.discard(conn)
+
+    def cancel(self):
+        """Cancel every running query in the scope and any started later."""
+        with self._lock:
+            self.cancelled = True
+            connections = list(self._connections)
+        for conn in connections:
+            try:
+                conn.cancel()
+            except Exception as e:
+                print(f"Query cancel failed: {e}")
+
+
+def current_scope():
+    return _query_scope.get()
+
+
+def enter_scope(scope):
+    """Make `scope` current in this context (use with contextvars.Context.run)."""
+    _query_scope.set(scope)
+
+
+def cancelled():
+    """True once the caller this work is being done for has gone away."""
+    scope = _query_scope.get()
+    return scope is not None and scope.cancelled
+
+
+@contextmanager
+def statement_timeout(milliseconds):
+    """Statement timeout for connections borrowed in this block (0 = none)."""
+    token = _statement_timeout.set(milliseconds)
+    try:
+        yield
+    finally:
+        _statement_timeout.reset(token)
+
+
+def statement_timeout_ms():
+    """Timeout for statements run now, in ms (0 = none)."""
+    timeout = _statement_timeout.get()
+    return DB_STATEMENT_TIMEOUT_MS if timeout is None else timeout
+
+
+def with_statement_timeout(milliseconds):
+    """Endpoint decorator: statement timeout for the queries the endpoint runs."""
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            with statement_timeout(milliseconds):
+                return await endpoint(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def attach(conn):
+    """Apply the current timeout to a freshly borrowed connection and register it for cancellation."""
+    timeout = _statement_timeout.get()
+    if timeout is not None and timeout != DB_STATEMENT_TIMEOUT_MS:
+        with conn.cursor() as cursor:
+            cursor.execute("SET LOCAL statement_timeout = %s", (int(timeout),))
+    scope = _query_scope.get()
+    if scope is not None:
+        scope.register(conn)
+    return scope
+
+
+def detach(conn, scope):
+    if scope is not None:
+        scope.unregister(conn)
+
+
+def run_in_executor(func, *args):
+    """loop.run_in_executor that keeps the caller's request context (timeout, scope, metrics, profiling)."""
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(None, context.run, profiling.sampled, func, *args)
+
+
+class CancelOnDisconnectMiddleware:
+    """Pure ASGI middleware: cancel the endpoint and its queries when the client disconnects."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        query_scope = QueryScope()
+        token = _query_scope.set(query_scope)
+        messages = asyncio.Queue()
+        app_task = asyncio.ensure_future(self.app(scope, messages.get, send))
+
+        async def watch():
+            # Forward request messages to the app; a disconnect before it finishes cancels it
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not app_task.done():
+                        stats = current_stats()
+                        if stats is not None:
+                            stats.cancelled = True
+                        query_scope.cancel()
+                        app_task.cancel()
+                    return
+
+        watcher = asyncio.ensure_future(watch())
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if not query_scope.cancelled:
+                raise
+        finally:
+            watcher.cancel()
+            _query_scope.reset(token)
+
+
+class LimiterBusy(Exception):
+    """Raised when a ConcurrencyLimiter's queue is full or the wait timed out."""
+
+
+class ConcurrencyLimiter:
+    """At most `limit` concurrent executor calls, `max_waiting` queued behind them."""
+
+    def __init__(self, limit, max_waiting, wait_seconds):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.wait_seconds = wait_seconds
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = None
+
+    async def run(self, func, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise LimiterBusy()
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.wait_seconds)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise LimiterBusy()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        future = run_in_executor(func, *args)
+        # The slot is held until the thread finishes, even if the caller is cancelled first
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.shield(future)
+
+    def _release(self):
+        self.running -= 1
+        self._semaphore.release()
+
+    def status(self):
+        return {
+            "limit": self.limit,
+            "running": self.running,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,85 @@
+"""
+Production server entry point.
+
+Runs a gunicorn master with uvicorn workers (uvloop + httptools when installed):
+
+    python server.py
+
+Settings come from the environment (or backend/.env):
+
+    HOST / PORT              bind address (default 0.0.0.0:8000)
+    WEB_CONCURRENCY          worker processes (default: CPU count)
+    KEEPALIVE_SECONDS        HTTP keep-alive timeout (default 5)
+    GRACEFUL_TIMEOUT         seconds workers get to finish in-flight requests (default 30)
+    WORKER_TIMEOUT           seconds before a stuck worker is killed and replaced (default 120)
+    MAX_REQUESTS             recycle a worker after this many requests, 0 = never (default 0)
+    DB_MAX_CONNECTIONS       total Postgres connections this server may use; split evenly
+                             into each worker's DB_POOL_MAX unless DB_POOL_MAX is set
+                             (less one per worker for the change feed listener)
+
+Send SIGHUP to the master (`./manage-production.sh reload`) for a zero-downtime
+reload: new workers start with the current code before the old ones drain and exit.
+"""
+import os
+import multiprocessing
+from dotenv import load_dotenv
+from gunicorn.app.base import BaseApplication
+
+load_dotenv()
+
+
+def _worker_count():
+    return int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+
+
+def _configure_pool_size(workers):
+    """Give each worker an equal share of DB_MAX_CONNECTIONS unless DB_POOL_MAX is set."""
+    total = os.environ.get("DB_MAX_CONNECTIONS")
+    if total and "DB_POOL_MAX" not in os.environ:
+        # The change feed listener holds one extra connection per worker
+        listener = 1 if os.environ.get("CHANGE_FEED_ENABLED", "true").lower() == "true" else 0
+        os.environ["DB_POOL_MAX"] = str(max(1, int(total) // workers - listener))
+
+
+def _post_worker_init(worker):
+    worker.log.info(f"Worker {worker.pid} ready (DB_POOL_MAX={os.environ.get('DB_POOL_MAX', '5')})")
+
+
+class BudgetServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # Imported in each worker (no preload) so SIGHUP picks up new code
+        from main import app
+        return app
+
+
+def main():
+    workers = _worker_count()
+    _configure_pool_size(workers)
+    max_requests = int(os.environ.get("MAX_REQUESTS", "0"))
+
+    options = {
+        "bind": f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '8000')}",
+        "workers": workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "keepalive": int(os.environ.get("KEEPALIVE_SECONDS", "5")),
+        "graceful_timeout": int(os.environ.get("GRACEFUL_TIMEOUT", "30")),
+        "timeout": int(os.environ.get("WORKER_TIMEOUT", "120")),
+        "max_requests": max_requests,
+        "max_requests_jitter": max_requests // 10,
+        "preload_app": False,
+        "post_worker_init": _post_worker_init,
+        "accesslog": None,
+    }
+    BudgetServer(options).run()
+
+
+if __name__ == "__main__":
+    main()
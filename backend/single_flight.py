@@ -0,0 +1,114 @@
+"""
+Single-flight coalescing of identical concurrent reads.
+
+When the dashboard's parallel requests (or several household members opening
+it at once) ask for the same data at the same time, only the first caller
+runs the query; callers with the same key that arrive while it is in flight
+await that execution and share its result.
+
+Results are only shared while the query is running: the key is dropped the
+moment it completes, so a later caller always starts a fresh execution.
+Callers should put the data version of what they read into the key, so a
+caller arriving after a write never joins a query that started before it.
+
+The blocking function runs in the default executor, which keeps the event
+loop free to accept the callers it will be shared with. Its queries are
+cancelled only once every caller waiting on it has gone away.
+"""
+import asyncio
+import threading
+import contextvars
+
+import profiling
+import query_control
+from metrics import registry as metrics_registry
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+class _Execution:
+    __slots__ = ("future", "scope", "waiters")
+
+    def __init__(self, future, scope):
+        self.future = future
+        self.scope = scope
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution."""
+
+    def __init__(self, name, share=None):
+        # share(result) gives each caller its own copy of a mutable result
+        self.name = name
+        self.share = share
+        self.executions = 0
+        self.coalesced = 0
+        self._in_flight = {}
+        with _groups_lock:
+            _groups[name] = self
+
+    async def run(self, key, func, *args):
+        entry = self._in_flight.get(key)
+        if entry is None:
+            loop = asyncio.get_running_loop()
+            # Keep the leader's request context so its DB time is attributed in /metrics,
+            # but give the execution its own cancellation scope: one caller going away
+            # must not cancel the query the others are waiting on
+            context = contextvars.copy_context()
+            scope = query_control.QueryScope()
+            context.run(query_control.enter_scope, scope)
+            future = loop.run_in_executor(None, context.run, profiling.sampled, func, *args)
+            entry = self._in_flight[key] = _Execution(future, scope)
+            self.executions += 1
+            future.add_done_callback(lambda _, key=key, entry=entry: self._complete(key, entry))
+        else:
+            self.coalesced += 1
+
+        entry.waiters += 1
+        try:
+            result = await asyncio.shield(entry.future)
+        except asyncio.CancelledError:
+            entry.waiters -= 1
+            if entry.waiters == 0 and not entry.future.done():
+                # Every caller left; stop the query instead of finishing it for nobody,
+                # and make sure nobody new joins the cancelled execution
+                entry.scope.cancel()
+                self._complete(key, entry)
+            raise
+        entry.waiters -= 1
+        return self.share(result) if self.share else result
+
+    def _complete(self, key, entry):
+        if self._in_flight.get(key) is entry:
+            del self._in_flight[key]
+
+    def stats(self):
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+
+def stats():
+    """Counters of every single-flight group in this process."""
+    with _groups_lock:
+        return {name: group.stats() for name, group in _groups.items()}
+
+
+def _render_metrics():
+    lines = []
+    for name, help_text in (
+        ("executions", "Queries executed by single-flight groups."),
+        ("coalesced", "Calls that shared an in-flight execution instead of querying."),
+    ):
+        lines.append(f"# HELP budget_api_single_flight_{name}_total {help_text}")
+        lines.append(f"# TYPE budget_api_single_flight_{name}_total counter")
+        for group, values in sorted(stats().items()):
+            lines.append(f'budget_api_single_flight_{name}_total{{group="{group}"}} {values[name]}')
+    return lines
+
+
+metrics_registry.add_collector(_render_metrics)
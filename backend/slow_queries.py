@@ -0,0 +1,132 @@
+"""
+Slow-query log.
+
+Every statement executed through an instrumented cursor is timed. Statements
+slower than SLOW_QUERY_THRESHOLD_MS are printed with their params, duration and
+row count and kept in a bounded ring buffer. With SLOW_QUERY_EXPLAIN enabled,
+slow read-only statements are queued for a background thread that re-runs
+them under EXPLAIN (ANALYZE, BUFFERS) on a connection of its own to the same
+server and stores the plan in the entry, so the slow request does not wait for
+its query to run a second time. Entries show "plan": "pending" until then; when
+more than SLOW_QUERY_EXPLAIN_QUEUE statements are waiting, new ones are not
+explained.
+"""
+import os
+import re
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+
+import psycopg2
+
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "200"))
+SLOW_QUERY_EXPLAIN = os.environ.get("SLOW_QUERY_EXPLAIN", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_LOG_SIZE = int(os.environ.get("SLOW_QUERY_LOG_SIZE", "50"))
+SLOW_QUERY_EXPLAIN_QUEUE = int(os.environ.get("SLOW_QUERY_EXPLAIN_QUEUE", "20"))
+
+_entries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+_lock = threading.Lock()
+_explain_queue = queue.Queue(maxsize=SLOW_QUERY_EXPLAIN_QUEUE)
+_explainer = None
+_explainer_pid = None
+
+
+def _normalize(statement):
+    if isinstance(statement, bytes):
+        statement = statement.decode("utf-8", "replace")
+    return re.sub(r"\s+", " ", str(statement)).strip()
+
+
+def _is_read_only(statement):
+    # EXPLAIN ANALYZE executes the statement, so never replay writes. EXECUTE runs
+    # a storage.Statement, which only ever prepares reads
+    return statement.lstrip().upper().startswith(("SELECT", "WITH", "EXECUTE"))
+
+
+def _statement_sql(statement):
+    """SQL to explain: a storage.Statement's text for EXECUTE, which only exists on the original connection."""
+    match = re.match(r"EXECUTE\s+(\w+)", statement, re.IGNORECASE)
+    if match is None:
+        return statement
+    import storage  # storage imports this module through db_pool and metrics
+    prepared = storage.statements().get(match.group(1))
+    return prepared.sql if prepared is not None else None
+
+
+def _explain(connections, dsn, statement, params):
+    """EXPLAIN (ANALYZE, BUFFERS) output for a statement, on this thread's connection to dsn."""
+    sql = _statement_sql(statement)
+    if sql is None:
+        return "EXPLAIN skipped: unknown prepared statement"
+    try:
+        conn = connections.get(dsn)
+        if conn is None or conn.closed:
+            # Plain connection so the EXPLAIN itself is not timed or logged
+            conn = connections[dsn] = psycopg2.connect(dsn)
+            conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, params)
+            return "\n".join(row[0] for row in cur.fetchall())
+    except Exception as e:
+        return f"EXPLAIN failed: {e}"
+
+
+def _run_explainer():
+    connections = {}
+    while True:
+        entry, dsn, statement, params = _explain_queue.get()
+        plan = _explain(connections, dsn, statement, params)
+        with _lock:
+            entry["plan"] = plan
+
+
+def _queue_explain(entry, connection, statement, params):
+    global _explainer, _explainer_pid
+    with _lock:
+        # Threads don't survive a fork; each worker process starts its own
+        if _explainer_pid != os.getpid():
+            _explainer = threading.Thread(target=_run_explainer, name="slow-query-explain", daemon=True)
+            _explainer.start()
+            _explainer_pid = os.getpid()
+    try:
+        _explain_queue.put_nowait((entry, connection.connect_dsn, statement, params))
+        return "pending"
+    except queue.Full:
+        return "EXPLAIN skipped: queue full"
+
+
+def record_execution(cursor, statement, params, seconds, route=None):
+    """Log a statement if it ran longer than the configured threshold."""
+    duration_ms = seconds * 1000
+    if duration_ms < SLOW_QUERY_THRESHOLD_MS:
+        return
+
+    text = _normalize(statement)
+    rows = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+    print(f"Slow query ({duration_ms:.1f} ms, {rows} rows, route={route}): {text} params={params}")
+
+    entry = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "route": route,
+        "statement": text,
+        "params": [str(p) for p in params] if isinstance(params, (list, tuple)) else params,
+        "duration_ms": round(duration_ms, 2),
+        "rows": rows,
+        "plan": None,
+    }
+    if SLOW_QUERY_EXPLAIN and _is_read_only(text):
+        entry["plan"] = _queue_explain(entry, cursor.connection, text, params)
+    with _lock:
+        _entries.append(entry)
+
+
+def get_slow_queries():
+    """Return logged slow queries, most recent first."""
+    with _lock:
+        return [dict(entry) for entry in reversed(_entries)]
+
+
+def clear_slow_queries():
+    with _lock:
+        _entries.clear()
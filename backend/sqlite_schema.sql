@@ -0,0 +1,89 @@
+-- budget_app schema for the embedded SQLite engine (STORAGE_ENGINE=sqlite).
+-- Same tables and view columns as Postgres with migrations/ applied. budget_app
+-- is an attached database, so statements name it and view bodies stay unqualified.
+-- The catalogs the triggers maintain in Postgres are plain views here.
+
+CREATE TABLE IF NOT EXISTS budget_app.persons (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS budget_app.spending_categories (
+    id INTEGER PRIMARY KEY,
+    category_name TEXT NOT NULL UNIQUE,
+    spending_limit REAL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS budget_app.merchants (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS budget_app.merchant_aliases (
+    raw_name TEXT PRIMARY KEY,
+    merchant_id INTEGER NOT NULL REFERENCES merchants (id) ON DELETE CASCADE
+);
+
+-- REAL amounts keep SUM()/AVG() in floating point, like NUMERIC in Postgres
+CREATE TABLE IF NOT EXISTS budget_app.transactions (
+    id INTEGER PRIMARY KEY,
+    transaction_date DATE NOT NULL,
+    merchant_name TEXT NOT NULL,
+    amount REAL NOT NULL,
+    person_id INTEGER REFERENCES persons (id),
+    category_id INTEGER REFERENCES spending_categories (id),
+    account_type TEXT,
+    merchant_id INTEGER REFERENCES merchants (id),
+    import_hash TEXT UNIQUE
+);
+
+CREATE INDEX IF NOT EXISTS budget_app.transactions_transaction_date_idx
+    ON transactions (transaction_date);
+
+CREATE INDEX IF NOT EXISTS budget_app.transactions_merchant_name_idx
+    ON transactions (merchant_name);
+
+CREATE VIEW IF NOT EXISTS budget_app.transactions_view AS
+SELECT
+    t.id,
+    t.transaction_date,
+    t.merchant_name,
+    t.amount,
+    p.name AS person,
+    c.category_name AS spending_category,
+    t.account_type
+FROM transactions t
+LEFT JOIN persons p ON p.id = t.person_id
+LEFT JOIN spending_categories c ON c.id = t.category_id;
+
+CREATE VIEW IF NOT EXISTS budget_app.transactions_merchant_view AS
+SELECT
+    t.id,
+    t.transaction_date,
+    t.merchant_name,
+    t.amount,
+    p.name AS person,
+    c.category_name AS spending_category,
+    t.account_type,
+    t.merchant_id,
+    COALESCE(m.name, t.merchant_name) AS merchant
+FROM transactions t
+LEFT JOIN persons p ON p.id = t.person_id
+LEFT JOIN spending_categories c ON c.id = t.category_id
+LEFT JOIN merchants m ON m.id = t.merchant_id;
+
+CREATE VIEW IF NOT EXISTS budget_app.catalog_months AS
+SELECT date(transaction_date, 'start of month') AS month, COUNT(*) AS transaction_count
+FROM transactions
+GROUP BY 1;
+
+CREATE VIEW IF NOT EXISTS budget_app.catalog_persons AS
+SELECT person_id, COUNT(*) AS transaction_count
+FROM transactions
+WHERE person_id IS NOT NULL
+GROUP BY person_id;
+
+CREATE VIEW IF NOT EXISTS budget_app.catalog_merchants AS
+SELECT merchant_name, COUNT(*) AS transaction_count
+FROM transactions
+GROUP BY merchant_name;
@@ -0,0 +1,104 @@
+"""
+Startup warm-up, readiness state and import-time reporting.
+
+On startup each worker opens its pool connections and runs the current month's
+dashboard queries once (and loads the column store when enabled), so the first
+real request doesn't pay for cold connections, cold code paths or a cold
+Postgres buffer cache. /ready answers
+503 until that has finished.
+
+Run `python startup.py` to see which imports dominate cold start
+(uses `python -X importtime`).
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime
+
+_PROCESS_START = time.perf_counter()
+
+state = {
+    "ready": False,
+    "startup_seconds": None,
+    "warmup_seconds": None,
+    "warmup_error": None,
+}
+
+
+async def warm_up():
+    """Pre-open DB connections and warm the current month's dashboard queries."""
+    from database import (
+        test_connection,
+        get_transactions_data,
+        get_users_data,
+        get_available_periods,
+        get_all_categories_with_limits
+    )
+
+    started = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(None, test_connection):
+            raise RuntimeError("database connection failed")
+
+        await get_transactions_data(period="monthly", month=datetime.now().strftime("%Y-%m"))
+        await get_users_data()
+        await get_available_periods()
+        await get_all_categories_with_limits()
+
+        import column_store
+        if column_store.COLUMN_STORE_ENABLED:
+            await loop.run_in_executor(None, column_store.preload)
+    except Exception as e:
+        # Still become ready; requests will surface the underlying problem
+        state["warmup_error"] = str(e)
+        print(f"Warm-up failed: {e}")
+    finally:
+        state["warmup_seconds"] = round(time.perf_counter() - started, 3)
+        state["startup_seconds"] = round(time.perf_counter() - _PROCESS_START, 3)
+        state["ready"] = True
+
+
+def import_time_report(module="main", top=20):
+    """Import `module` in a fresh interpreter and return (total_seconds, rows) from -X importtime."""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=backend_dir,
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "module": name.rstrip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            "top_level": not name[1:].startswith(" "),
+        })
+    total_ms = sum(row["cumulative_ms"] for row in rows if row["top_level"])
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return total_ms, rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report which imports dominate backend cold start")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    total_ms, rows = import_time_report(args.module, args.top)
+    print(f"Importing {args.module}: {total_ms:.1f} ms\n")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for row in rows:
+        print(f"{row['cumulative_ms']:>14.1f} {row['self_ms']:>9.1f}  {row['module']}")
+
+
+if __name__ == "__main__":
+    main()
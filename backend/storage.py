@@ -0,0 +1,518 @@
+"""
+Storage engines behind database.py and queries.py.
+
+STORAGE_ENGINE picks the engine for the process:
+
+  - postgres (default): pooled psycopg2 connections to DB_CONFIG (db_pool.py),
+    with reads routed to the read replica when one is configured
+    (db_routing.py).
+  - sqlite: an embedded database at SQLITE_PATH, created from
+    sqlite_schema.sql on first use, so the API, the benchmark suite and tests
+    can run without a Postgres server. SQLITE_PATH=:memory: keeps the data in
+    this process only.
+
+Queries are written once with %s placeholders. Predicates that differ between
+engines come from `dialect` (date casts, month arithmetic, list membership,
+rounding, ...), and transaction_filter() builds the period/user conditions
+shared by the dashboard and the chat tools. Hot queries with a fixed shape are
+Statements, prepared once per pooled connection (PREPARED_STATEMENTS_ENABLED).
+
+The SQLite engine has no trigger-maintained catalogs (plain views stand in for
+them), no trigram merchant search, no change feed and no analytics snapshots;
+run it with a single worker.
+"""
+import os
+import re
+import time
+import queue
+import sqlite3
+import threading
+from datetime import date, datetime
+from functools import lru_cache
+from contextlib import contextmanager
+
+import pandas as pd
+from dotenv import load_dotenv
+
+import db_pool
+import db_routing
+import query_control
+from metrics import record_db_time, record_rows
+
+load_dotenv()
+
+STORAGE_ENGINE = os.environ.get("STORAGE_ENGINE", "postgres").lower()
+SQLITE_PATH = os.environ.get("SQLITE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "budget_app.sqlite3"))
+SQLITE_SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sqlite_schema.sql")
+PREPARED_STATEMENTS_ENABLED = os.environ.get("PREPARED_STATEMENTS_ENABLED", "true").lower() == "true"
+
+# Database configuration for remote server
+DB_CONFIG = {
+    "dbname": os.environ.get("DB_NAME"),
+    "user": os.environ.get("DB_USER"),
+    "password": os.environ.get("DB_PASSWORD"),
+    "host": os.environ.get("DB_HOST"),
+    "port": os.environ.get("DB_PORT"),
+    "options": "-c search_path=budget_app,public"
+}
+
+EXCLUDED_CATEGORIES = "('Installment','Payments','Refunds & Returns')"
+
+
+class PostgresDialect:
+    """SQL fragments for Postgres."""
+
+    name = "postgres"
+    for_update = " FOR UPDATE"
+    fuzzy_search = True
+
+    def date(self, expr):
+        return f"{expr}::date"
+
+    def add_months(self, expr, months):
+        return f"({expr} + INTERVAL '{int(months)} month')"
+
+    def month_start(self, expr):
+        return f"DATE_TRUNC('month', {expr})::date"
+
+    def month_label(self, expr):
+        return f"TO_CHAR({expr}, 'YYYY-MM')"
+
+    def year(self, expr):
+        return f"EXTRACT(YEAR FROM {expr})::int"
+
+    def round(self, expr, digits):
+        return f"ROUND({expr}::numeric, {int(digits)})"
+
+    def in_list(self, expr, params, values):
+        params.append(list(values))
+        return f"{expr} = ANY(%s)"
+
+    def month_series(self):
+        """Rows of first-of-month dates between two %s dates, inclusive, as column `month`."""
+        return "SELECT g.month::date AS month FROM generate_series(%s::date, %s::date, INTERVAL '1 month') AS g(month)"
+
+
+class SQLiteDialect:
+    """SQL fragments for SQLite, where dates are stored as ISO 'YYYY-MM-DD' text."""
+
+    name = "sqlite"
+    for_update = ""  # write transactions start with BEGIN IMMEDIATE instead
+    fuzzy_search = False
+
+    def date(self, expr):
+        return f"date({expr})"
+
+    def add_months(self, expr, months):
+        return f"date({expr}, '{int(months):+d} month')"
+
+    def month_start(self, expr):
+        return f"date({expr}, 'start of month')"
+
+    def month_label(self, expr):
+        return f"strftime('%%Y-%%m', {expr})"
+
+    def year(self, expr):
+        return f"CAST(strftime('%%Y', {expr}) AS INTEGER)"
+
+    def round(self, expr, digits):
+        return f"ROUND({expr}, {int(digits)})"
+
+    def in_list(self, expr, params, values):
+        values = list(values)
+        if not values:
+            return "0"
+        params.extend(values)
+        return f"{expr} IN ({', '.join(['%s'] * len(values))})"
+
+    def month_series(self):
+        return (
+            "SELECT date(%s) AS month UNION ALL "
+            "SELECT date(month, '+1 month') FROM months WHERE month < date(%s)"
+        )
+
+
+def period_range(period=None, month=None, year=None, today=None):
+    """[start, end) dates of a dashboard period; the current month when none is selected."""
+    if period == "monthly" and month:
+        start = date(int(month[:4]), int(month[5:7]), 1)
+    elif period == "yearly" and year:
+        return date(int(year), 1, 1), date(int(year) + 1, 1, 1)
+    else:
+        start = (today or date.today()).replace(day=1)
+    return start, date(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def spans_year(period=None, year=None):
+    """True when period_range() selects a whole year rather than one month."""
+    return period == "yearly" and bool(year)
+
+
+def filters_user(user):
+    """True when `user` selects one person rather than everyone."""
+    return bool(user) and user.lower() != "all"
+
+
+def transaction_conditions(by_user=False, partial_user=False):
+    """
+    WHERE conditions over transactions_view for a [start, end) period and optionally a user.
+
+    Excluded categories are always filtered out. Users match exactly, or by
+    substring with partial_user (for names the chat model typed). The text only
+    depends on the flags, so queries built from it have a fixed shape.
+    """
+    conditions = [
+        f"spending_category NOT IN {EXCLUDED_CATEGORIES}",
+        "transaction_date >= %s",
+        "transaction_date < %s"
+    ]
+    if by_user:
+        conditions.append("LOWER(person) LIKE %s" if partial_user else "LOWER(person) = %s")
+    return " AND ".join(conditions)
+
+
+def transaction_params(period=None, month=None, year=None, user=None, partial_user=False):
+    """Params for transaction_conditions(filters_user(user), partial_user), in order."""
+    params = list(period_range(period, month, year))
+    if filters_user(user):
+        params.append(f"%{user.lower()}%" if partial_user else user.lower())
+    return params
+
+
+def transaction_filter(params, period=None, month=None, year=None, user=None, partial_user=False):
+    """transaction_conditions() for a period and user, appending their params."""
+    params.extend(transaction_params(period, month, year, user, partial_user))
+    return transaction_conditions(filters_user(user), partial_user)
+
+
+def as_date(value):
+    """A date column value as a date (SQLite returns computed dates as ISO text)."""
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+_statements = {}
+
+
+class Statement:
+    """
+    A hot query with a fixed shape: the SQL text never changes, only its %s params.
+
+    On Postgres its first execution on a pooled connection sends PREPARE and
+    every later one sends EXECUTE, so the query is parsed and analyzed once per
+    connection and Postgres can switch to a cached generic plan. The generic
+    plan guesses the same row count for any date range, which suits one month
+    but makes yearly fetches slower (benchmark/planning.py), so period queries
+    have a separate yearly Statement with prepare=False that runs as plain SQL
+    and is planned for its dates every time. sqlite3 already keeps compiled
+    statements per connection, so there every Statement runs as SQL.
+    """
+
+    def __init__(self, name, sql, prepare=True):
+        # Only reads: the slow-query log replays EXECUTE under EXPLAIN ANALYZE
+        if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            raise ValueError(f"Statement '{name}' must be a SELECT")
+        if name in _statements and _statements[name].sql != sql:
+            raise ValueError(f"Statement '{name}' is already defined with different SQL")
+        self.name = name
+        self.sql = sql
+        self.prepare = prepare
+        # PREPARE takes $n placeholders and is sent without params, so %% becomes %
+        placeholders = []
+
+        def positional(match):
+            if match.group(1) == "%":
+                return "%"
+            placeholders.append("%s")
+            return f"${len(placeholders)}"
+
+        self.prepare_sql = f"PREPARE {name} AS " + re.sub(r"%([s%])", positional, sql)
+        self.param_count = len(placeholders)
+        self.execute_sql = f"EXECUTE {name} ({', '.join(placeholders)})" if placeholders else f"EXECUTE {name}"
+        _statements[name] = self
+
+    def __repr__(self):
+        return f"Statement({self.name!r})"
+
+
+def statements():
+    """Every Statement defined so far, by name (benchmark/planning.py measures them)."""
+    return dict(_statements)
+
+
+def execute(cursor, query, params=None):
+    """Run SQL text or a Statement on a cursor from connection()."""
+    if isinstance(query, Statement):
+        engine.execute_statement(cursor, query, params)
+    else:
+        cursor.execute(query, params)
+
+
+class PostgresEngine:
+    name = "postgres"
+    dialect = PostgresDialect()
+
+    def execute_statement(self, cursor, statement, params):
+        if not (PREPARED_STATEMENTS_ENABLED and statement.prepare):
+            cursor.execute(statement.sql, params)
+            return
+        prepared = cursor.connection.prepared_statements
+        if statement.name not in prepared:
+            # Session-level: survives the rollback the pool does when the connection is returned
+            cursor.execute(statement.prepare_sql)
+            prepared.add(statement.name)
+        cursor.execute(statement.execute_sql, params)
+
+    def read_target(self):
+        return db_routing.read_config(DB_CONFIG)
+
+    def write_target(self):
+        return DB_CONFIG
+
+    def target_key(self, target):
+        return target["host"]
+
+    def connection(self, target):
+        return db_pool.connection(target)
+
+    def close_all(self):
+        db_pool.close_all()
+
+
+@lru_cache(maxsize=512)
+def _sqlite_sql(query):
+    # %s placeholders become ?, and %% (needed next to %s placeholders) becomes %
+    return re.sub(r"%([s%])", lambda m: "?" if m.group(1) == "s" else "%", query)
+
+
+class _SQLiteCursor:
+    """DB-API cursor over sqlite3 that takes %s queries and feeds request metrics."""
+
+    def __init__(self, conn):
+        self.connection = conn
+        self._cursor = conn.raw.cursor()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, query, params=None):
+        self.connection.start_statement()
+        start = time.perf_counter()
+        try:
+            self._cursor.execute(_sqlite_sql(query), tuple(params or ()))
+        finally:
+            record_db_time(time.perf_counter() - start)
+        return self
+
+    def executemany(self, query, seq_of_params):
+        self.connection.start_statement()
+        start = time.perf_counter()
+        try:
+            self._cursor.executemany(_sqlite_sql(query), seq_of_params)
+        finally:
+            record_db_time(time.perf_counter() - start)
+        return self
+
+    def _fetch(self, fetch, *args):
+        start = time.perf_counter()
+        rows = fetch(*args)
+        record_db_time(time.perf_counter() - start)
+        return rows
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is not None:
+            record_rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._fetch(self._cursor.fetchmany, *(() if size is None else (size,)))
+        record_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        record_rows(len(rows))
+        return rows
+
+    def close(self):
+        self._cursor.close()
+
+
+class _SQLiteConnection:
+    """sqlite3 connection with the parts of the psycopg2 interface the app uses."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.deadline = None
+        # Statement timeouts and cancellation both end in the progress handler
+        raw.set_progress_handler(self._interrupt, 10_000)
+
+    def _interrupt(self):
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def start_statement(self):
+        timeout = query_control.statement_timeout_ms()
+        self.deadline = time.monotonic() + timeout / 1000 if timeout else None
+
+    def cursor(self):
+        return _SQLiteCursor(self)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def cancel(self):
+        self.raw.interrupt()
+
+
+class SQLiteEngine:
+    """Embedded engine: `budget_app` is an attached database, so budget_app.* names resolve."""
+
+    name = "sqlite"
+    dialect = SQLiteDialect()
+
+    def execute_statement(self, cursor, statement, params):
+        cursor.execute(statement.sql, params)
+
+    def __init__(self, path):
+        self.path = path
+        self._idle = queue.LifoQueue()
+        self._pid = None
+        self._lock = threading.Lock()
+        sqlite3.register_adapter(date, date.isoformat)
+        sqlite3.register_adapter(datetime, datetime.isoformat)
+        sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+
+    def read_target(self):
+        return (self.path, False)
+
+    def write_target(self):
+        return (self.path, True)
+
+    def target_key(self, target):
+        return target[0]
+
+    def _connect(self):
+        raw = sqlite3.connect(
+            ":memory:",
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            uri=True
+        )
+        if self.path == ":memory:":
+            # Shared cache keeps one in-memory database across this process's connections
+            raw.execute("ATTACH DATABASE 'file:budget_app?mode=memory&cache=shared' AS budget_app")
+        else:
+            raw.execute("ATTACH DATABASE ? AS budget_app", (self.path,))
+            raw.execute("PRAGMA budget_app.journal_mode = WAL")
+        return _SQLiteConnection(raw)
+
+    def _get(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked child: never reuse the parent's connections
+                self._idle = queue.LifoQueue()
+                self._pid = os.getpid()
+                conn = self._connect()
+                with open(SQLITE_SCHEMA_FILE) as f:
+                    conn.raw.executescript(f.read())
+                return conn
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    @contextmanager
+    def connection(self, target):
+        """
+        Borrow a connection; like db_pool.connection, open transactions are rolled back on return.
+
+        Write targets start with BEGIN IMMEDIATE, which takes the database write lock
+        up front (SQLite's stand-in for SELECT ... FOR UPDATE).
+        """
+        _, write = target
+        conn = self._get()
+        scope = query_control.current_scope()
+        if scope is not None:
+            scope.register(conn)
+        try:
+            if write:
+                conn.raw.execute("BEGIN IMMEDIATE")
+            yield conn
+        finally:
+            if scope is not None:
+                scope.unregister(conn)
+            conn.deadline = None
+            if conn.raw.in_transaction:
+                conn.raw.rollback()
+            self._idle.put(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().raw.close()
+            except queue.Empty:
+                return
+
+
+def _create_engine():
+    if STORAGE_ENGINE == "postgres":
+        return PostgresEngine()
+    if STORAGE_ENGINE == "sqlite":
+        return SQLiteEngine(SQLITE_PATH)
+    raise ValueError(f"Unknown STORAGE_ENGINE '{STORAGE_ENGINE}', expected postgres or sqlite")
+
+
+engine = _create_engine()
+dialect = engine.dialect
+
+
+def read_target():
+    """Connection target for a read that may tolerate replica lag."""
+    return engine.read_target()
+
+
+def write_target():
+    """Connection target for writes and reads that must see the latest data."""
+    return engine.write_target()
+
+
+def target_key(target):
+    """Hashable name of a target, for keys of shared reads."""
+    return engine.target_key(target)
+
+
+def connection(target):
+    """Borrow a connection to a target (see db_pool.connection)."""
+    return engine.connection(target)
+
+
+def read_frame(conn, query, params=None):
+    """Run SQL text or a Statement and return its rows as a DataFrame, Decimals as floats."""
+    with conn.cursor() as cursor:
+        execute(cursor, query, params)
+        columns = [col[0] for col in cursor.description]
+        rows = cursor.fetchall()
+    return pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+
+
+def close_all():
+    """Close every connection this process holds."""
+    engine.close_all()
@@ -1,4 +1,51 @@
 TOOLS = [
+    {
+        "name": "query_spending",
+        "description": "Flexible spending query that answers most questions in a single call. Choose any combination of group_by dimensions, filters and metrics, plus sorting and top-n. Prefer this over chaining several other tools, e.g. 'top 5 merchants for Hector in groceries this year' or 'monthly totals per category since January'.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "group_by": {
+                    "type": "array",
+                    "items": {"type": "string", "enum": ["category", "merchant", "person", "account_type", "day", "month", "year"]},
+                    "description": "Dimensions to group by. Omit to get overall totals."
+                },
+                "metrics": {
+                    "type": "array",
+                    "items": {"type": "string", "enum": ["total", "count", "average", "min", "max"]},
+                    "description": "Aggregates to return (default: total and count)"
+                },
+                "month": {"type": "string", "description": "Month in YYYY-MM format"},
+                "year": {"type": "integer", "description": "Year for yearly queries"},
+                "period": {
+                    "type": "string",
+                    "enum": ["monthly", "yearly"],
+                    "description": "Single month or full year; ignored when start_date or end_date is set"
+                },
+                "start_date": {"type": "string", "description": "Inclusive start date YYYY-MM-DD; overrides period/month/year when set"},
+                "end_date": {"type": "string", "description": "Inclusive end date YYYY-MM-DD; overrides period/month/year when set"},
+                "user": {"type": "string", "description": "Filter by person name"},
+                "categories": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Only include these spending categories"
+                },
+                "merchant_search": {"type": "string", "description": "Merchant name search; partial and misspelled names match"},
+                "account_type": {"type": "string", "description": "Filter by account type"},
+                "min_amount": {"type": "number", "description": "Only transactions of at least this amount"},
+                "max_amount": {"type": "number", "description": "Only transactions of at most this amount"},
+                "sort": {
+                    "type": "object",
+                    "properties": {
+                        "by": {"type": "string", "description": "A metric or group_by dimension"},
+                        "direction": {"type": "string", "enum": ["asc", "desc"]}
+                    },
+                    "description": "Sort order (default: chronological for time groupings, otherwise first metric descending)"
+                },
+                "top_n": {"type": "integer", "description": "Maximum number of rows to return (capped at 200)"}
+            }
+        }
+    },
     {
         "name": "get_spending_by_category",
         "description": "Get total spending amounts grouped by category for a given time period. Use this to answer questions like 'what are my top categories?' or 'how much did I spend on groceries?'",
@@ -38,7 +85,7 @@ TOOLS = [
                 "user": {"type": "string", "description": "Filter by person name"},
                 "merchant_search": {
                     "type": "string",
-                    "description": "Search term to filter merchants (case-insensitive partial match)"
+                    "description": "Search term to filter merchants (partial and misspelled names match)"
                 }
             },
             "required": ["period"]
@@ -46,7 +93,7 @@ TOOLS = [
     },
     {
         "name": "get_category_budget_status",
-        "description": "Get budget limit vs actual spending for each category. Use this for questions like 'am I over budget?' or 'how much budget do I have left?'",
+        "description": "Get budget limit vs actual spending for every category, with the limit scaled to the months in range, remaining budget, percent used and a pace projection to the end of the period. Use this for questions like 'am I over budget?', 'how much budget do I have left?' or 'am I on track this month?'",
         "input_schema": {
             "type": "object",
             "properties": {
@@ -60,15 +107,19 @@ TOOLS = [
     },
     {
         "name": "get_spending_comparison",
-        "description": "Compare spending between two time periods. Use this for questions like 'how does this month compare to last month?' or 'am I spending more than January?'",
+        "description": "Compare spending across two or more months or years in a single call, with per-category differences and percent changes between consecutive periods. Use this for questions like 'how does this month compare to last month?', 'am I spending more than January?' or 'how did my spending trend over the last six months?'",
         "input_schema": {
             "type": "object",
             "properties": {
-                "month_a": {"type": "string", "description": "First month in YYYY-MM format"},
-                "month_b": {"type": "string", "description": "Second month in YYYY-MM format"},
+                "periods": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "minItems": 2,
+                    "description": "Periods to compare, oldest first, each as YYYY-MM (month) or YYYY (year). Changes are computed from each period to the next."
+                },
                 "user": {"type": "string", "description": "Filter by person name"}
             },
-            "required": ["month_a", "month_b"]
+            "required": ["periods"]
         }
     },
     {
@@ -112,7 +163,7 @@ TOOLS = [
                 "category": {"type": "string", "description": "Filter by spending category"},
                 "merchant_search": {
                     "type": "string",
-                    "description": "Optional search term to filter transactions by merchant name (case-insensitive partial match)"
+                    "description": "Optional search term to filter transactions by merchant name (partial and misspelled names match)"
                 }
             },
             "required": ["period"]
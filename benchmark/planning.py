@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Planning cost of the hot queries, ad hoc vs. prepared.
+
+For every storage.Statement (period fetch, category aggregate and budget status
+in their monthly and yearly shapes, limit lookup) this runs the query on the
+benchmark database two ways on one connection:
+
+  - ad_hoc: the SQL text with its params, parsed and planned on every execution
+  - prepared: PREPARE once, then EXECUTE, as pooled connections do; Postgres
+    switches to a cached generic plan after five custom plans
+
+and records EXPLAIN ANALYZE's planning and execution times plus the client
+round trip, as medians over --iterations runs, and how many executions used the
+generic plan. The "api" column says which way the API runs the statement: the
+yearly shapes are not prepared because their generic plan is slower.
+
+Usage:
+    python benchmark/planning.py --dsn postgresql://localhost/budget_bench --iterations 50
+
+End-to-end, compare the load suite with prepared statements off:
+    python benchmark/run.py --against PREPARED_STATEMENTS_ENABLED=false
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from datetime import date, datetime
+
+import psycopg2
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_DSN = os.environ.get("BENCH_DATABASE_URL", "postgresql://localhost/budget_bench")
+
+# Period queries and how they filter by user: exact name or substring (chat tools)
+HOT_QUERIES = {
+    "period_transactions": "exact",
+    "spending_by_category": "partial",
+    "budget_status": "partial",
+}
+
+
+def _load_statements():
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ["STORAGE_ENGINE"] = "postgres"
+    import storage
+    import database  # noqa: F401 - defines the period fetch and limit lookup statements
+    import queries  # noqa: F401 - defines the category aggregate and budget status statements
+    return storage
+
+
+def build_cases(cur, storage):
+    """[(statement, params)] for every hot query shape."""
+    cur.execute("SELECT name FROM budget_app.persons ORDER BY name LIMIT 1")
+    row = cur.fetchone()
+    user = row[0] if row else "nobody"
+    cur.execute("SELECT category_name FROM budget_app.spending_categories ORDER BY category_name LIMIT 1")
+    row = cur.fetchone()
+    category = row[0] if row else "Groceries"
+
+    statements = storage.statements()
+    today = date.today()
+    cases = []
+    for base, match in HOT_QUERIES.items():
+        for yearly in (False, True):
+            for by_user in (False, True):
+                name = base + ("_year" if yearly else "") + ("_user" if by_user else "")
+                params = storage.transaction_params(
+                    "yearly" if yearly else "monthly",
+                    None if yearly else today.strftime("%Y-%m"),
+                    today.year if yearly else None,
+                    user if by_user else None,
+                    partial_user=match == "partial"
+                )
+                cases.append((statements[name], params))
+    cases.append((statements["category_limit"], [category.lower()]))
+    return cases
+
+
+def _explain(cur, sql, params):
+    cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Planning Time"], plan[0]["Execution Time"]
+
+
+def _round_trip(cur, sql, params):
+    start = time.perf_counter()
+    cur.execute(sql, params)
+    cur.fetchall()
+    return (time.perf_counter() - start) * 1000
+
+
+def measure(cur, statement, params, prepared, iterations):
+    """Median planning, execution and round-trip ms, ad hoc or prepared."""
+    planning, execution, round_trip = [], [], []
+    generic_plans = None
+    if prepared:
+        cur.execute(statement.prepare_sql)
+    sql = statement.execute_sql if prepared else statement.sql
+    try:
+        for _ in range(iterations):
+            plan_ms, exec_ms = _explain(cur, sql, params)
+            planning.append(plan_ms)
+            execution.append(exec_ms)
+            round_trip.append(_round_trip(cur, sql, params))
+        if prepared:
+            cur.execute("SELECT generic_plans FROM pg_prepared_statements WHERE name = %s", (statement.name,))
+            generic_plans = cur.fetchone()[0]
+    finally:
+        if prepared:
+            cur.execute(f"DEALLOCATE {statement.name}")
+
+    return {
+        "planning_ms": round(statistics.median(planning), 3),
+        "execution_ms": round(statistics.median(execution), 3),
+        "round_trip_ms": round(statistics.median(round_trip), 3),
+        "generic_plans": generic_plans,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure planning cost of the hot queries, ad hoc vs. prepared")
+    parser.add_argument("--dsn", default=DEFAULT_DSN)
+    parser.add_argument("--iterations", type=int, default=50, help="Runs per query and mode")
+    parser.add_argument("--label", default="", help="Free-form label stored with the results")
+    parser.add_argument("--output", help="Results JSON path (default: benchmark/results/planning-<timestamp>.json)")
+    args = parser.parse_args()
+
+    storage = _load_statements()
+    conn = psycopg2.connect(args.dsn)
+    conn.autocommit = True
+    results = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM budget_app.transactions")
+            rows = cur.fetchone()[0]
+            print(f"{'query':30} {'api':9} {'mode':9} {'planning':>9} {'execution':>10} {'round trip':>11} {'generic':>8}")
+            for statement, params in build_cases(cur, storage):
+                api = "prepared" if statement.prepare else "ad_hoc"
+                for mode in ("ad_hoc", "prepared"):
+                    result = measure(cur, statement, params, mode == "prepared", args.iterations)
+                    result.update({"name": statement.name, "api": api, "mode": mode})
+                    results.append(result)
+                    generic = result["generic_plans"] if result["generic_plans"] is not None else "-"
+                    print(f"{statement.name:30} {api:9} {mode:9} {result['planning_ms']:>9} {result['execution_ms']:>10} "
+                          f"{result['round_trip_ms']:>11} {generic:>8}")
+    finally:
+        conn.close()
+
+    output = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "label": args.label,
+            "iterations": args.iterations,
+            "rows": rows,
+        },
+        "results": results,
+    }
+    path = args.output or os.path.join(RESULTS_DIR, "planning-" + datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
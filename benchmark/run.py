@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+End-to-end load benchmark for the backend API.
+
+By default this starts the backend (uvicorn main:app) against the benchmark
+database, drives every endpoint at a fixed concurrency, and writes latency
+percentiles, throughput and the server's peak RSS to a JSON results file.
+
+Usage:
+    python benchmark/run.py --dsn postgresql://localhost/budget_bench --concurrency 8 --requests 200
+    python benchmark/run.py --base-url http://localhost:8000 --server-pid 1234
+    python benchmark/run.py --compare benchmark/results/before.json
+    python benchmark/run.py --against COLUMN_STORE_ENABLED=true
+    python benchmark/run.py --against STORAGE_ENGINE=sqlite --against SQLITE_PATH=/tmp/budget_bench.sqlite3
+
+The last form compares per-query cost across storage engines; seed both
+databases with the same seed.py options so they hold the same transactions.
+
+/chat is not driven because it calls the Anthropic API, and POST /category is
+skipped because it is not idempotent.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+import subprocess
+import urllib.request
+import urllib.error
+from urllib.parse import urlencode, quote
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2.extensions
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_DSN = os.environ.get("BENCH_DATABASE_URL", "postgresql://localhost/budget_bench")
+
+
+def _request(base_url, method, path, body=None, timeout=60):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method)
+    if data is not None:
+        req.add_header("Content-Type", "application/json")
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.status, resp.read()
+
+
+def _get_json(base_url, path):
+    _, body = _request(base_url, "GET", path)
+    return json.loads(body)
+
+
+def build_scenarios(base_url):
+    """One scenario per endpoint/filter combination, using real users and categories."""
+    today = date.today()
+    month = today.strftime("%Y-%m")
+    users = _get_json(base_url, "/users").get("users", [])
+    categories = _get_json(base_url, "/categories-with-limits").get("categories", [])
+    user = users[0] if users else "all"
+    category = categories[0] if categories else {"category_name": "Groceries", "spending_limit": 0}
+
+    filters = {
+        "month": {"period": "monthly", "month": month, "user": "all"},
+        "month_user": {"period": "monthly", "month": month, "user": user},
+        "year": {"period": "yearly", "year": today.year, "user": "all"},
+    }
+
+    scenarios = [("root", "GET", "/", None), ("users", "GET", "/users", None), ("periods", "GET", "/periods", None),
+                 ("categories_list", "GET", "/categories-list", None),
+                 ("categories_with_limits", "GET", "/categories-with-limits", None),
+                 ("merchant_search", "GET", "/merchants/search?q=costco", None),
+                 ("merchant_search_typo", "GET", "/merchants/search?q=costko", None),
+                 ("trends", "GET", f"/trends?{urlencode({'end_month': month, 'months': 12})}", None),
+                 ("trends_by_person", "GET", f"/trends?{urlencode({'end_month': month, 'months': 12, 'by_person': 'true'})}", None)]
+    for label, params in filters.items():
+        query = urlencode(params)
+        scenarios += [
+            (f"transactions_{label}", "GET", f"/transactions?{query}", None),
+            (f"categories_{label}", "GET", f"/categories?{query}", None),
+            (f"raw_transactions_{label}", "GET", f"/raw-transactions?{query}", None),
+            (f"category_transactions_{label}", "GET",
+             f"/category-transactions?category={quote(category['category_name'])}&{query}", None),
+        ]
+    # Idempotent write: set a limit to its current value
+    scenarios.append(("update_limit", "PUT", "/category/limit",
+                      {"category_name": category["category_name"], "new_limit": float(category.get("spending_limit") or 0)}))
+    return scenarios
+
+
+def run_scenario(base_url, method, path, body, total_requests, concurrency):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            _request(base_url, method, path, body)
+            ok = True
+        except (urllib.error.URLError, OSError):
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total_requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+
+    def pct(p):
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000, 2)
+
+    return {
+        "requests": total_requests,
+        "errors": errors,
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+    }
+
+
+class RssSampler(threading.Thread):
+    """Tracks the peak resident set size of a process from /proc (Linux only)."""
+
+    def __init__(self, pid, interval=0.1):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop_event = threading.Event()
+
+    def _read(self, field):
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith(field + ":"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            return 0
+        return 0
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, self._read("VmRSS"))
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        # VmHWM is the kernel's own high-water mark and catches spikes between samples
+        self.peak_bytes = max(self.peak_bytes, self._read("VmHWM"))
+        return self.peak_bytes
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(dsn, extra_env):
+    """Start the backend against the benchmark database and wait until it answers."""
+    parts = psycopg2.extensions.parse_dsn(dsn)
+    env = dict(os.environ)
+    env.update({
+        "DB_NAME": parts.get("dbname", ""),
+        "DB_USER": parts.get("user", os.environ.get("USER", "")),
+        "DB_PASSWORD": parts.get("password", ""),
+        "DB_HOST": parts.get("host", "localhost"),
+        "DB_PORT": parts.get("port", "5432"),
+    })
+    env.update(extra_env)
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            _request(base_url, "GET", "/", timeout=2)
+            return proc, base_url
+        except (urllib.error.URLError, OSError):
+            if proc.poll() is not None:
+                raise RuntimeError("Backend exited during startup")
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("Backend did not become ready within 60s")
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _row_count(dsn, server_env):
+    try:
+        if server_env.get("STORAGE_ENGINE", "postgres").lower() == "sqlite":
+            conn = sqlite3.connect(server_env["SQLITE_PATH"])
+            count = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+            conn.close()
+            return count
+        conn = psycopg2.connect(dsn)
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM budget_app.transactions")
+            count = cur.fetchone()[0]
+        conn.close()
+        return count
+    except Exception:
+        return None
+
+
+def print_comparison(results, previous):
+    before = {r["name"]: r for r in previous["results"]}
+    print(f"\n{'scenario':40} {'p50 before':>11} {'p50 after':>10} {'p95 before':>11} {'p95 after':>10}")
+    for r in results["results"]:
+        b = before.get(r["name"])
+        if not b:
+            continue
+        print(f"{r['name']:40} {b['p50_ms'] or 0:>11} {r['p50_ms'] or 0:>10} {b['p95_ms'] or 0:>11} {r['p95_ms'] or 0:>10}")
+    print(f"peak RSS: {previous.get('peak_rss_bytes')} -> {results.get('peak_rss_bytes')}")
+
+
+def run_suite(args, extra_env):
+    """Run every scenario against one server and return the results document."""
+    proc = None
+    if args.base_url:
+        base_url, pid = args.base_url.rstrip("/"), args.server_pid
+    else:
+        proc, base_url = start_server(args.dsn, extra_env)
+        pid = proc.pid
+
+    sampler = RssSampler(pid) if pid else None
+    if sampler:
+        sampler.start()
+
+    try:
+        scenarios = build_scenarios(base_url)
+        if args.only:
+            prefixes = tuple(args.only.split(","))
+            scenarios = [s for s in scenarios if s[0].startswith(prefixes)]
+
+        results = []
+        for name, method, path, body in scenarios:
+            # Warm up connections and caches before measuring
+            run_scenario(base_url, method, path, body, min(args.concurrency, args.requests), args.concurrency)
+            result = run_scenario(base_url, method, path, body, args.requests, args.concurrency)
+            result.update({"name": name, "method": method, "path": path})
+            results.append(result)
+            print(f"{name:40} p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms "
+                  f"{result['throughput_rps']} req/s errors={result['errors']}")
+    finally:
+        peak_rss = sampler.stop() if sampler else None
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "label": args.label,
+            "concurrency": args.concurrency,
+            "requests_per_scenario": args.requests,
+            "rows": _row_count(args.dsn, extra_env) if not args.base_url else None,
+            "server_env": extra_env,
+        },
+        "peak_rss_bytes": peak_rss,
+        "results": results,
+    }
+
+
+def _write_results(output, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nResults written to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test every backend endpoint")
+    parser.add_argument("--dsn", default=DEFAULT_DSN, help="Benchmark database for the spawned server")
+    parser.add_argument("--base-url", help="Use an already running server instead of spawning one")
+    parser.add_argument("--server-pid", type=int, help="PID of --base-url server, for peak RSS")
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the spawned server (repeatable)")
+    parser.add_argument("--against", action="append", default=[], metavar="KEY=VALUE",
+                        help="Run the suite a second time with this extra server environment and compare "
+                             "(repeatable), e.g. --against COLUMN_STORE_ENABLED=true")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--only", help="Comma-separated scenario name prefixes to run")
+    parser.add_argument("--label", default="", help="Free-form label stored with the results")
+    parser.add_argument("--output", help="Results JSON path (default: benchmark/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous results JSON to print a comparison against")
+    args = parser.parse_args()
+
+    if args.against and args.base_url:
+        parser.error("--against needs a spawned server; drop --base-url")
+
+    extra_env = dict(item.split("=", 1) for item in args.server_env)
+    path = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+
+    output = run_suite(args, extra_env)
+    _write_results(output, path)
+
+    if args.against:
+        variant_env = dict(extra_env, **dict(item.split("=", 1) for item in args.against))
+        print(f"\nVariant: {' '.join(args.against)}")
+        variant = run_suite(args, variant_env)
+        _write_results(variant, path[:-len(".json")] + "-variant.json" if path.endswith(".json") else path + "-variant")
+        print_comparison(variant, output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(output, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
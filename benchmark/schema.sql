@@ -0,0 +1,41 @@
+-- budget_app schema used by the benchmark database.
+-- Mirrors the production tables and view that backend/ reads and writes.
+
+CREATE SCHEMA IF NOT EXISTS budget_app;
+
+CREATE TABLE IF NOT EXISTS budget_app.persons (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS budget_app.spending_categories (
+    id SERIAL PRIMARY KEY,
+    category_name TEXT NOT NULL UNIQUE,
+    spending_limit NUMERIC(12, 2) DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS budget_app.transactions (
+    id BIGSERIAL PRIMARY KEY,
+    transaction_date DATE NOT NULL,
+    merchant_name TEXT NOT NULL,
+    amount NUMERIC(12, 2) NOT NULL,
+    person_id INTEGER REFERENCES budget_app.persons (id),
+    category_id INTEGER REFERENCES budget_app.spending_categories (id),
+    account_type TEXT
+);
+
+CREATE INDEX IF NOT EXISTS transactions_transaction_date_idx
+    ON budget_app.transactions (transaction_date);
+
+CREATE OR REPLACE VIEW budget_app.transactions_view AS
+SELECT
+    t.id,
+    t.transaction_date,
+    t.merchant_name,
+    t.amount,
+    p.name AS person,
+    c.category_name AS spending_category,
+    t.account_type
+FROM budget_app.transactions t
+LEFT JOIN budget_app.persons p ON p.id = t.person_id
+LEFT JOIN budget_app.spending_categories c ON c.id = t.category_id;
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Seed a local Postgres (or embedded SQLite) database with synthetic budget_app data.
+
+Usage:
+    python benchmark/seed.py --dsn postgresql://localhost/budget_bench --rows 1000000
+    python benchmark/seed.py --rows 10000 --persons 4 --years 3 --reset
+    python benchmark/seed.py --sqlite benchmark/budget_bench.sqlite3 --rows 1000000 --reset
+
+Rows are streamed into budget_app.transactions with COPY in chunks, so even
+10M rows load in a few minutes. Generation is deterministic for a given --seed,
+so a Postgres and a SQLite database seeded with the same options hold the same
+transactions (for STORAGE_ENGINE comparisons, see run.py).
+"""
+import io
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+from datetime import date, timedelta
+
+import psycopg2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from migrate import apply_migrations
+from merchants import sync_merchants
+
+SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "schema.sql")
+SQLITE_SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "sqlite_schema.sql")
+DEFAULT_DSN = os.environ.get("BENCH_DATABASE_URL", "postgresql://localhost/budget_bench")
+CHUNK_ROWS = 100_000
+
+CATEGORIES = {
+    "Groceries": 800,
+    "Restaurants": 400,
+    "Gas": 250,
+    "Shopping": 500,
+    "Utilities": 350,
+    "Entertainment": 150,
+    "Travel": 600,
+    "Health": 200,
+    "Subscriptions": 80,
+    "Home Improvement": 300,
+    "Kids": 250,
+    "Pets": 120,
+    # Excluded from every dashboard and chat query
+    "Installment": 0,
+    "Payments": 0,
+    "Refunds & Returns": 0,
+}
+
+MERCHANTS = {
+    "Groceries": ["COSTCO WHSE", "TRADER JOE'S", "WHOLE FOODS MKT", "SAFEWAY", "KROGER", "ALDI"],
+    "Restaurants": ["CHIPOTLE", "STARBUCKS", "MCDONALD'S", "PANERA BREAD", "LOCAL DINER", "SUSHI HOUSE"],
+    "Gas": ["SHELL OIL", "CHEVRON", "EXXONMOBIL", "COSTCO GAS"],
+    "Shopping": ["AMAZON.COM", "TARGET", "WALMART", "BEST BUY", "MACY'S"],
+    "Utilities": ["PG&E", "COMCAST", "CITY WATER", "VERIZON WIRELESS"],
+    "Entertainment": ["AMC THEATRES", "STEAM GAMES", "TICKETMASTER"],
+    "Travel": ["UNITED AIRLINES", "DELTA AIR", "MARRIOTT", "AIRBNB", "UBER"],
+    "Health": ["CVS PHARMACY", "WALGREENS", "KAISER PERMANENTE"],
+    "Subscriptions": ["NETFLIX.COM", "SPOTIFY", "APPLE.COM/BILL", "HULU"],
+    "Home Improvement": ["HOME DEPOT", "LOWE'S", "ACE HARDWARE"],
+    "Kids": ["KIDS SPORTS CLUB", "TOYS R US", "SCHOOL STORE"],
+    "Pets": ["PETCO", "PETSMART", "CHEWY.COM"],
+    "Installment": ["AFFIRM PAYMENT"],
+    "Payments": ["CREDIT CARD PAYMENT"],
+    "Refunds & Returns": ["AMAZON REFUND"],
+}
+
+# Card processor prefixes and store numbers make raw merchant names messy, like real statements
+MERCHANT_PREFIXES = ["", "", "", "SQ *", "TST* ", "PAYPAL *"]
+ACCOUNT_TYPES = ["credit", "credit", "debit", "checking"]
+FIRST_NAMES = ["Alex", "Jordan", "Taylor", "Sam", "Casey", "Morgan", "Riley", "Jamie", "Avery", "Quinn"]
+
+
+def _category_weights():
+    names = list(CATEGORIES)
+    weights = [12 if name in ("Groceries", "Restaurants") else 1 if name in ("Installment", "Payments", "Refunds & Returns") else 5
+               for name in names]
+    return names, weights
+
+
+def _merchant_name(rng, category):
+    base = rng.choice(MERCHANTS[category])
+    prefix = rng.choice(MERCHANT_PREFIXES)
+    suffix = f" #{rng.randint(1, 999):04d}" if rng.random() < 0.4 else ""
+    return f"{prefix}{base}{suffix}"
+
+
+def _amount(rng, category):
+    if category == "Refunds & Returns":
+        return -round(rng.lognormvariate(3.0, 0.8), 2)
+    return round(rng.lognormvariate(3.2, 0.9), 2)
+
+
+def _csv_field(value):
+    text = str(value)
+    if any(ch in text for ch in ',"\n'):
+        text = '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def _person_names(persons):
+    return [f"{FIRST_NAMES[i % len(FIRST_NAMES)]} Person{i + 1}" for i in range(persons)]
+
+
+def _generate_chunks(rng, rows, years, person_ids, category_ids):
+    """Yield lists of (date, merchant, amount, person_id, category_id, account_type) rows."""
+    names, weights = _category_weights()
+    end = date.today()
+    start = date(end.year - years + 1, 1, 1)
+    span_days = (end - start).days + 1
+
+    loaded = 0
+    while loaded < rows:
+        chunk = min(CHUNK_ROWS, rows - loaded)
+        categories = rng.choices(names, weights=weights, k=chunk)
+        yield [
+            ((start + timedelta(days=rng.randrange(span_days))).isoformat(), _merchant_name(rng, category),
+             _amount(rng, category), rng.choice(person_ids), category_ids[category], rng.choice(ACCOUNT_TYPES))
+            for category in categories
+        ]
+        loaded += chunk
+        print(f"  loaded {loaded:,}/{rows:,} rows", file=sys.stderr)
+
+
+def seed(dsn, rows, persons, years, random_seed, reset):
+    rng = random.Random(random_seed)
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cur:
+            if reset:
+                cur.execute("DROP SCHEMA IF EXISTS budget_app CASCADE")
+            with open(SCHEMA_FILE) as f:
+                cur.execute(f.read())
+        conn.commit()
+        # Same triggers and derived tables as production, so loading pays their cost too
+        apply_migrations(conn, verbose=False)
+
+        with conn.cursor() as cur:
+            person_ids = []
+            for name in _person_names(persons):
+                cur.execute(
+                    "INSERT INTO budget_app.persons (name) VALUES (%s) "
+                    "ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name RETURNING id",
+                    (name,),
+                )
+                person_ids.append(cur.fetchone()[0])
+
+            category_ids = {}
+            for name, limit in CATEGORIES.items():
+                cur.execute(
+                    "INSERT INTO budget_app.spending_categories (category_name, spending_limit) VALUES (%s, %s) "
+                    "ON CONFLICT (category_name) DO UPDATE SET spending_limit = EXCLUDED.spending_limit RETURNING id",
+                    (name, limit),
+                )
+                category_ids[name] = cur.fetchone()[0]
+        conn.commit()
+
+        copy_sql = (
+            "COPY budget_app.transactions "
+            "(transaction_date, merchant_name, amount, person_id, category_id, account_type) "
+            "FROM STDIN WITH (FORMAT csv)"
+        )
+        started = time.perf_counter()
+        for chunk in _generate_chunks(rng, rows, years, person_ids, category_ids):
+            buf = io.StringIO()
+            for row in chunk:
+                buf.write(",".join(_csv_field(value) for value in row) + "\n")
+            buf.seek(0)
+            with conn.cursor() as cur:
+                cur.copy_expert(copy_sql, buf)
+            conn.commit()
+
+        mapped = sync_merchants(conn)
+        print(f"  normalized {mapped['new_names']:,} merchant names", file=sys.stderr)
+
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE budget_app.transactions")
+        conn.commit()
+
+        elapsed = time.perf_counter() - started
+        print(f"Seeded {rows:,} transactions for {persons} persons over {years} years in {elapsed:.1f}s")
+    finally:
+        conn.close()
+
+
+def seed_sqlite(path, rows, persons, years, random_seed, reset):
+    """Same data as seed(), in a SQLite file for STORAGE_ENGINE=sqlite (no merchant normalization)."""
+    rng = random.Random(random_seed)
+    if reset and os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(":memory:")
+    try:
+        # Attached as budget_app, the way the backend opens it
+        conn.execute("ATTACH DATABASE ? AS budget_app", (path,))
+        with open(SQLITE_SCHEMA_FILE) as f:
+            conn.executescript(f.read())
+
+        person_ids = []
+        for name in _person_names(persons):
+            conn.execute("INSERT OR IGNORE INTO budget_app.persons (name) VALUES (?)", (name,))
+            person_ids.append(conn.execute("SELECT id FROM budget_app.persons WHERE name = ?", (name,)).fetchone()[0])
+
+        category_ids = {}
+        for name, limit in CATEGORIES.items():
+            conn.execute(
+                "INSERT INTO budget_app.spending_categories (category_name, spending_limit) VALUES (?, ?) "
+                "ON CONFLICT (category_name) DO UPDATE SET spending_limit = excluded.spending_limit",
+                (name, limit),
+            )
+            category_ids[name] = conn.execute(
+                "SELECT id FROM budget_app.spending_categories WHERE category_name = ?", (name,)
+            ).fetchone()[0]
+        conn.commit()
+
+        started = time.perf_counter()
+        for chunk in _generate_chunks(rng, rows, years, person_ids, category_ids):
+            conn.executemany(
+                "INSERT INTO budget_app.transactions "
+                "(transaction_date, merchant_name, amount, person_id, category_id, account_type) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                chunk,
+            )
+            conn.commit()
+
+        conn.execute("ANALYZE budget_app")
+        conn.commit()
+
+        elapsed = time.perf_counter() - started
+        print(f"Seeded {rows:,} transactions for {persons} persons over {years} years in {elapsed:.1f}s")
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a benchmark database with synthetic transactions")
+    parser.add_argument("--dsn", default=DEFAULT_DSN, help="Postgres DSN (default: $BENCH_DATABASE_URL)")
+    parser.add_argument("--sqlite", metavar="PATH", help="Seed this SQLite file instead of Postgres")
+    parser.add_argument("--rows", type=int, default=10_000, help="Number of transactions, e.g. 10000, 1000000, 10000000")
+    parser.add_argument("--persons", type=int, default=4)
+    parser.add_argument("--years", type=int, default=3, help="Years of history ending today")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate the budget_app schema first")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        seed_sqlite(args.sqlite, args.rows, args.persons, args.years, args.seed, args.reset)
+    else:
+        seed(args.dsn, args.rows, args.persons, args.years, args.seed, args.reset)
+
+
+if __name__ == "__main__":
+    main()
@@ -91,6 +91,11 @@ if [ ! -f ".env" ]; then
     fi
 fi
 
+# Apply database migrations (catalog tables, triggers, indexes)
+log_info "Applying database migrations..."
+python migrate.py
+python merchants.py
+
 # Modify main.py to listen on all interfaces
 log_info "Configuring backend for network access..."
 sed -i 's/host="localhost"/host="0.0.0.0"/g' main.py
@@ -143,6 +148,16 @@ server {
         }
     }
 
+    # Dashboard push updates (WebSocket upgrade)
+    location /budget/api/ws {
+        proxy_pass http://localhost:8000/ws;
+        proxy_http_version 1.1;
+        proxy_set_header Upgrade $http_upgrade;
+        proxy_set_header Connection "upgrade";
+        proxy_set_header Host $host;
+        proxy_read_timeout 3600s;
+    }
+
     # Proxy API requests to backend
     location /budget/api/ {
         proxy_pass http://localhost:8000/;
@@ -183,8 +198,8 @@ source venv/bin/activate
 # Stop existing PM2 process if running
 pm2 delete budget-backend 2>/dev/null || true
 
-# Start backend with PM2
-pm2 start main.py --name budget-backend --interpreter python3
+# Start backend with PM2 (server.py runs a gunicorn master with one uvicorn worker per core)
+pm2 start server.py --name budget-backend --interpreter python3 --kill-timeout 35000
 pm2 save
 
 # Setup PM2 startup
@@ -224,6 +239,7 @@ echo "Management commands:"
 echo "• Check status: pm2 status"
 echo "• View logs: pm2 logs budget-backend"
 echo "• Restart backend: pm2 restart budget-backend"
+echo "• Reload backend without downtime: ./manage-production.sh reload"
 echo "• Restart nginx: sudo systemctl reload nginx"
 echo ""
 echo "Log files:"
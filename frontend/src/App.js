@@ -8,6 +8,16 @@ import ChatBot from './components/ChatBot';
 import './App.css';
 
 const API_BASE_URL = process.env.NODE_ENV === 'production' ? '/budget/api' : 'http://localhost:8000';
+const WS_URL = API_BASE_URL.startsWith('http')
+  ? `${API_BASE_URL.replace(/^http/, 'ws')}/ws`
+  : `${window.location.protocol === 'https:' ? 'wss' : 'ws'}://${window.location.host}${API_BASE_URL}/ws`;
+const WS_RECONNECT_MS = 5000;
+
+// Send cookies to the API on another origin in development, so the replica pin
+// cookie set after a write keeps this browser's reads on the primary
+axios.defaults.withCredentials = true;
+
+const byCategoryName = (a, b) => String(a.spending_category).localeCompare(String(b.spending_category));
 
 function App() {
   const [transactions, setTransactions] = useState([]);
@@ -27,7 +37,11 @@ function App() {
   const [loadingTransactions, setLoadingTransactions] = useState(false);
   const [categoryLimitInfo, setCategoryLimitInfo] = useState(null);
   const [showCategoryManagement, setShowCategoryManagement] = useState(false);
+  const [wsOpen, setWsOpen] = useState(false);
+  const [liveConnected, setLiveConnected] = useState(false);
   const fetchInProgress = useRef(false);
+  const wsRef = useRef(null);
+  const liveMessageHandler = useRef(null);
 
   useEffect(() => {
     if (fetchInProgress.current) return;
@@ -38,6 +52,88 @@ function App() {
     });
   }, [period, year, month, user]);
 
+  // Push channel: the server sends deltas for the subscribed filters after any write
+  useEffect(() => {
+    let reconnectTimer = null;
+    let closed = false;
+
+    const connect = () => {
+      const ws = new WebSocket(WS_URL);
+      wsRef.current = ws;
+      ws.onopen = () => setWsOpen(true);
+      ws.onmessage = (event) => {
+        if (liveMessageHandler.current) {
+          liveMessageHandler.current(JSON.parse(event.data));
+        }
+      };
+      ws.onclose = () => {
+        setWsOpen(false);
+        setLiveConnected(false);
+        if (!closed) {
+          reconnectTimer = setTimeout(connect, WS_RECONNECT_MS);
+        }
+      };
+    };
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(reconnectTimer);
+      if (wsRef.current) {
+        wsRef.current.close();
+      }
+    };
+  }, []);
+
+  useEffect(() => {
+    if (wsOpen && wsRef.current) {
+      wsRef.current.send(JSON.stringify({ type: 'subscribe', period, year, month, user }));
+    }
+  }, [wsOpen, period, year, month, user]);
+
+  const applyDelta = (message) => {
+    const removed = new Set(message.removed_categories);
+    const patchByCategory = (prev, updates) => {
+      const byName = new Map(prev.map(item => [item.spending_category, item]));
+      removed.forEach(name => byName.delete(name));
+      updates.forEach(item => byName.set(item.spending_category, { ...byName.get(item.spending_category), ...item }));
+      return Array.from(byName.values()).sort(byCategoryName);
+    };
+
+    setCategories(prev => patchByCategory(prev, message.categories));
+    setTransactions(prev => patchByCategory(prev, message.categories.map(c => ({
+      spending_category: c.spending_category,
+      amount: c.total_amount,
+      period: summary.current_period
+    }))));
+    setSummary(prev => ({ ...prev, ...message.summary }));
+
+    // Replace the rows of every (month, category) pair the change touched
+    const months = new Set(message.months);
+    const affected = new Set(message.categories_affected);
+    setRawTransactions(prev => prev
+      .filter(t => !(months.has(String(t.transaction_date).slice(0, 7)) && affected.has(t.spending_category)))
+      .concat(message.rows)
+      .sort((a, b) => String(b.transaction_date).localeCompare(String(a.transaction_date))));
+
+    if (selectedCategory && affected.has(selectedCategory)) {
+      fetchCategoryTransactions(selectedCategory);
+    }
+  };
+
+  liveMessageHandler.current = (message) => {
+    if (message.type === 'subscribed') {
+      // Pushes only flow while the server's change feed listener is connected
+      setLiveConnected(Boolean(message.live));
+    } else if (message.type === 'delta') {
+      applyDelta(message);
+    } else if (message.type === 'limits') {
+      setCategoryLimits(message.categories || []);
+    } else if (message.type === 'resync') {
+      fetchData();
+    }
+  };
+
   const handleFiltersChange = (filters) => {
     flushSync(() => {
       setPeriod(filters.period);
@@ -146,7 +242,64 @@ function App() {
     setCategoryLimitInfo(null);
   };
 
-  const handleTransactionUpdate = () => {
+  // Patch the dashboard from a recategorization response; false if it doesn't cover the view
+  const applyRecategorization = (update) => {
+    if (!update || !update.result || period !== 'monthly' || !month) {
+      return false;
+    }
+    const scope = update.result.affected.find(a => a.month === month.slice(0, 7));
+    if (!scope || (user !== 'all' && scope.person.toLowerCase() !== user.toLowerCase())) {
+      return false;
+    }
+
+    // Moving into a category the dashboard doesn't show (e.g. Payments) changes the summary too
+    const shown = new Set(categories.map(c => c.spending_category));
+    if (!scope.categories.every(c => shown.has(c.category))) {
+      return false;
+    }
+
+    const [totalKey, countKey] = user === 'all'
+      ? ['total', 'transaction_count']
+      : ['person_total', 'person_transaction_count'];
+    const rows = scope.categories.map(c => ({
+      spending_category: c.category,
+      total_amount: c.after[totalKey],
+      transaction_count: c.after[countKey],
+      avg_amount: c.after[countKey] ? Math.round(c.after[totalKey] / c.after[countKey] * 100) / 100 : 0
+    }));
+    applyDelta({
+      months: [scope.month],
+      categories: rows.filter(r => r.transaction_count > 0),
+      removed_categories: rows.filter(r => r.transaction_count === 0).map(r => r.spending_category),
+      categories_affected: [],
+      summary: {},
+      rows: []
+    });
+
+    const { transaction, newCategory } = update;
+    setRawTransactions(prev => prev.map(t => (
+      String(t.transaction_date).slice(0, 10) === String(transaction.transaction_date).slice(0, 10) &&
+      t.merchant_name === transaction.merchant_name &&
+      Number(t.amount) === Number(transaction.amount) &&
+      t.person === transaction.person
+        ? { ...t, spending_category: newCategory }
+        : t
+    )));
+    if (selectedCategory) {
+      fetchCategoryTransactions(selectedCategory);
+    }
+    return true;
+  };
+
+  const handleTransactionUpdate = (update) => {
+    // With the push channel up, the server sends the changed totals and rows
+    if (liveConnected) {
+      return;
+    }
+    // The update response already carries the new totals for the month it touched
+    if (applyRecategorization(update)) {
+      return;
+    }
     // Refresh the category transactions after an update
     if (selectedCategory) {
       fetchCategoryTransactions(selectedCategory);
@@ -17,7 +17,7 @@ const CategoryEditModal = ({ transaction, onClose, onSuccess }) => {
 
     const fetchCategories = async () => {
         try {
-            const response = await fetch(`${API_BASE_URL}/categories-list`);
+            const response = await fetch(`${API_BASE_URL}/categories-list`, { credentials: 'include' });
             const data = await response.json();
             setCategories(data.categories || []);
             setLoadingCategories(false);
@@ -40,6 +40,7 @@ const CategoryEditModal = ({ transaction, onClose, onSuccess }) => {
         try {
             const response = await fetch(`${API_BASE_URL}/transaction/category`, {
                 method: 'PUT',
+                credentials: 'include',
                 headers: {
                     'Content-Type': 'application/json',
                 },
@@ -57,7 +58,11 @@ const CategoryEditModal = ({ transaction, onClose, onSuccess }) => {
             }
 
             const data = await response.json();
-            onSuccess(data.message || 'Category updated successfully');
+            onSuccess(data.message || 'Category updated successfully', {
+                transaction,
+                newCategory: selectedCategory,
+                result: data,
+            });
         } catch (err) {
             console.error('Error updating category:', err);
             setError('Failed to update category. Please try again.');
@@ -22,7 +22,7 @@ const CategoryManagement = ({ onClose }) => {
     const fetchCategories = async () => {
         setLoading(true);
         try {
-            const response = await fetch(`${API_BASE_URL}/categories-with-limits`);
+            const response = await fetch(`${API_BASE_URL}/categories-with-limits`, { credentials: 'include' });
             const data = await response.json();
             setCategories(data.categories || []);
         } catch (error) {
@@ -53,6 +53,7 @@ const CategoryManagement = ({ onClose }) => {
         try {
             const response = await fetch(`${API_BASE_URL}/category/limit`, {
                 method: 'PUT',
+                credentials: 'include',
                 headers: {
                     'Content-Type': 'application/json',
                 },
@@ -66,10 +67,16 @@ const CategoryManagement = ({ onClose }) => {
                 throw new Error('Failed to update limit');
             }
 
+            // The response carries the saved limit; patch the list instead of re-fetching it
+            const data = await response.json();
+            setCategories(prev => prev.map(category =>
+                category.category_name === categoryName
+                    ? { ...category, spending_limit: data.category.spending_limit }
+                    : category
+            ));
             showSuccess('Category limit updated successfully');
             setEditingCategory(null);
             setEditValue('');
-            fetchCategories();
         } catch (error) {
             console.error('Error updating limit:', error);
             showError('Failed to update category limit');
@@ -94,6 +101,7 @@ const CategoryManagement = ({ onClose }) => {
         try {
             const response = await fetch(`${API_BASE_URL}/category`, {
                 method: 'POST',
+                credentials: 'include',
                 headers: {
                     'Content-Type': 'application/json',
                 },
@@ -138,7 +138,7 @@ const TransactionTable = ({ transactions, category, onClose, limitInfo, onTransa
     setSelectedTransaction(null);
   };
 
-  const handleUpdateSuccess = (message) => {
+  const handleUpdateSuccess = (message, update) => {
     setSuccessMessage(message);
     setSelectedTransaction(null);
 
@@ -149,7 +149,7 @@ const TransactionTable = ({ transactions, category, onClose, limitInfo, onTransa
 
     // Notify parent to refresh data
     if (onTransactionUpdate) {
-      onTransactionUpdate();
+      onTransactionUpdate(update);
     }
   };
 
@@ -1,7 +1,7 @@
 #!/bin/bash
 
 # Money Review Page - Production Management Script
-# Usage: ./manage-production.sh [start|stop|restart|status|logs|update]
+# Usage: ./manage-production.sh [start|stop|restart|reload|status|logs|update]
 
 DEPLOY_DIR="/var/www/sites/budget"
 SERVER_IP="your-server.local"
@@ -32,6 +32,7 @@ show_usage() {
     echo "  start    - Start all services"
     echo "  stop     - Stop all services"
     echo "  restart  - Restart all services"
+    echo "  reload   - Zero-downtime backend reload (new workers replace old ones)"
     echo "  status   - Show service status"
     echo "  logs     - Show backend logs"
     echo "  update   - Update from git and redeploy"
@@ -45,7 +46,8 @@ start_services() {
     # Start backend
     cd $DEPLOY_DIR/backend
     source venv/bin/activate
-    pm2 start main.py --name budget-backend --interpreter python3 2>/dev/null || pm2 restart budget-backend
+    # server.py runs a gunicorn master with one uvicorn worker per core
+    pm2 start server.py --name budget-backend --interpreter python3 --kill-timeout 35000 2>/dev/null || pm2 restart budget-backend
     
     # Start nginx
     sudo systemctl start nginx
@@ -76,6 +78,16 @@ restart_services() {
     show_status
 }
 
+reload_backend() {
+    log_info "Reloading backend workers..."
+    
+    # SIGHUP makes the gunicorn master start fresh workers with the current code
+    # before gracefully stopping the old ones, so no requests are dropped
+    pm2 sendSignal SIGHUP budget-backend 2>/dev/null || log_error "Failed to reload backend"
+    
+    log_info "Backend reload signalled!"
+}
+
 show_status() {
     echo ""
     echo "=== Service Status ==="
@@ -120,14 +132,22 @@ update_deployment() {
     # Copy to production
     cp -r ~/deployment/budget/* $DEPLOY_DIR/
     
+    # Apply database migrations
+    log_info "Applying database migrations..."
+    cd $DEPLOY_DIR/backend
+    source venv/bin/activate
+    python migrate.py
+    python merchants.py
+    
     # Rebuild frontend
     log_info "Rebuilding frontend..."
     cd $DEPLOY_DIR/frontend
     npm install
     CI=false npm run build
     
-    # Restart services
-    restart_services
+    # Reload backend without downtime and pick up the new frontend build
+    reload_backend
+    sudo systemctl reload nginx
     
     log_info "Update completed!"
 }
@@ -177,6 +197,9 @@ case "$1" in
     restart)
         restart_services
         ;;
+    reload)
+        reload_backend
+        ;;
     status)
         show_status
         ;;